@@ -27,32 +27,13 @@ for sql_file in "$SQL_DIR"/*.sql; do
     new_password=$(docker exec domserver /opt/domjudge/domserver/webapp/bin/console domjudge:reset-user-password admin | grep -oP 'New password for admin is \K.*')
     echo "✅ New password: $new_password"
 
-    for contest_id in "${CONTEST_IDS[@]}"; do
-        echo "🌍 Downloading scoreboard for Contest ID $contest_id..."
-
-        if ./download-contest-scoreboard.sh <<< "$league_prefix"$'\n'"$contest_id"$'\n'"$new_password"; then
-            zip_file="${base_dir}/scoreboard_zips/contest-${league_prefix}-${contest_id}_unfrozen_scoreboard.zip"
-            temp_dir=$(mktemp -d)
-
-            if [[ -f "$zip_file" ]]; then
-                echo "📦 Unzipping $zip_file to $temp_dir..."
-                if unzip -q "$zip_file" -d "$temp_dir"; then
-                    output_file="${SCOREBOARD_DIR}/scoreboard-${league_prefix}-contest-${contest_id}.html"
-                    cp "$temp_dir/index.html" "$output_file"
-                    echo "✅ Saved scoreboard as $output_file"
-                else
-                    echo "❌ Failed to unzip $zip_file"
-                fi
-                rm -rf "$temp_dir"
-            else
-                echo "❌ Zip file not found even though download script reported success."
-                echo "❌ I was searching for ${zip_file}"
-                exit 1
-            fi
-        else
-            echo "⚠️ Scoreboard not available for $league_prefix Contest $contest_id — skipping."
-        fi
-    done
+    echo "🌍 Downloading scoreboards for contests ${CONTEST_IDS[*]}..."
+    # One login and all contests in parallel; contests without a scoreboard are skipped
+    if ! DOMJUDGE_USERNAME="admin" DOMJUDGE_PASSWORD="$new_password" \
+        python3 "$(dirname "$0")/download_scoreboards.py" --league "$league_prefix" \
+        --contest-ids "$(IFS=,; echo "${CONTEST_IDS[*]}")" --html-dir "$SCOREBOARD_DIR"; then
+        echo "⚠️ Some scoreboards are not available for $league_prefix — skipped."
+    fi
 
     echo "✅ Done with $league_prefix"
     echo "-----------------------------"
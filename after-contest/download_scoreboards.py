@@ -0,0 +1,112 @@
+"""Download the unfrozen scoreboard zips of several contests over one login.
+
+    python after-contest/download_scoreboards.py --league BCPC10 --contest-ids 1,2,3
+    python after-contest/download_scoreboards.py --league BCPC10 --contest-ids 1,2,3 --html-dir ~/scoreboard
+
+Logs in once through the jury /login form (common/domjudge_client.py keeps
+the session for the next run) and fetches all the contests' zips at the same
+time over the same connection pool, into
+~/scoreboard_zips/contest-<league>-<cid>_unfrozen_scoreboard.zip. --html-dir
+also saves each zip's index.html as scoreboard-<league>-contest-<cid>.html,
+the input of extract_excel_from_scoreboard_html.py. Contests without a
+scoreboard are reported and skipped; the exit status is 1 if any was.
+
+Uses DOMJUDGE_API_BASE (default https://bircpc.ir), DOMJUDGE_USERNAME
+(default admin) and DOMJUDGE_PASSWORD (asked for when not set).
+"""
+import argparse
+import getpass
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.domjudge_client import DomjudgeClient  # noqa: E402
+
+load_dotenv()
+
+BASE_URL = os.environ.get("DOMJUDGE_API_BASE", "https://bircpc.ir")
+USERNAME = os.environ.get("DOMJUDGE_USERNAME", "admin")
+ZIP_DIR = os.path.join(os.path.expanduser("~"), "scoreboard_zips")
+
+
+def wait_until_up(client, attempts=30, delay=2):
+    print("🌐 Waiting for domserver to be ready...")
+    for _ in range(attempts):
+        try:
+            # Public API endpoint: no login needed, and it goes through the client's pool and retries
+            if client.get(f"{client.base_url}/api/v4/info", timeout=10).status_code == 200:
+                print("✅ Domserver is up!")
+                return True
+        except requests.RequestException:
+            pass
+        print(f"⏳ Domserver not ready yet... retrying in {delay}s")
+        time.sleep(delay)
+    return False
+
+
+def zip_path(output_dir, league, contest_id):
+    return os.path.join(output_dir, f"contest-{league}-{contest_id}_unfrozen_scoreboard.zip")
+
+
+def download_scoreboard(client, league, contest_id, output_dir, html_dir=None):
+    """Worker: fetch one contest's zip; returns (path, bytes)."""
+    url = f"{client.base_url}/jury/contests/{contest_id}/scoreboard-zip/unfrozen/contest.zip"
+    path = zip_path(output_dir, league, contest_id)
+    size = client.download(url, path)
+    if html_dir:
+        with zipfile.ZipFile(path) as archive, open(
+                os.path.join(html_dir, f"scoreboard-{league}-contest-{contest_id}.html"), "wb") as f:
+            f.write(archive.read("index.html"))
+    return path, size
+
+
+def download_all(client, league, contest_ids, output_dir, html_dir=None, workers=4):
+    """Download every contest concurrently; returns the contest IDs that failed."""
+    os.makedirs(output_dir, exist_ok=True)
+    if html_dir:
+        os.makedirs(html_dir, exist_ok=True)
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(download_scoreboard, client, league, cid, output_dir, html_dir): cid
+                   for cid in contest_ids}
+        for future in as_completed(futures):
+            cid = futures[future]
+            try:
+                path, size = future.result()
+            except (requests.RequestException, zipfile.BadZipFile, KeyError) as e:
+                print(f"⚠️ Scoreboard not available for {league} contest {cid}: {e}")
+                failed.append(cid)
+                continue
+            print(f"✅ Contest {cid}: {path} ({size / 1024:.0f} KiB)")
+    return failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download unfrozen scoreboard zips for several contests.")
+    parser.add_argument("--league", required=True, help="League prefix used in the file names, e.g. BCPC10")
+    parser.add_argument("--contest-ids", required=True, help="Comma separated contest IDs, e.g. 1,2,3")
+    parser.add_argument("--output", default=ZIP_DIR, help=f"Zip directory. Default: {ZIP_DIR}")
+    parser.add_argument("--html-dir", help="Also save each scoreboard's index.html here")
+    parser.add_argument("--workers", type=int, default=4, help="Contests downloaded at the same time")
+    parser.add_argument("--no-wait", action="store_true", help="Don't wait for the domserver to come up")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    password = os.environ.get("DOMJUDGE_PASSWORD") or getpass.getpass(f"Enter {BASE_URL} password for {USERNAME}: ")
+    contest_ids = [c.strip() for c in args.contest_ids.split(",") if c.strip()]
+    client = DomjudgeClient(BASE_URL, USERNAME, password, pool_size=args.workers)
+
+    if not args.no_wait and not wait_until_up(client):
+        sys.exit("❌ Domserver did not come up.")
+    failed = download_all(client, args.league, contest_ids, args.output, args.html_dir, args.workers)
+    print(f"📦 {len(contest_ids) - len(failed)}/{len(contest_ids)} scoreboards downloaded "
+          f"({client.logins} login{'s' if client.logins != 1 else ''})")
+    sys.exit(1 if failed else 0)
@@ -1,19 +1,30 @@
+import os
+import sys
+
 import pandas as pd
-import requests
 
-DOMJUDGE_BASE_URL = "https://bircpc.ir"
-CONTEST_ID = 3
+import results_store
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.domjudge_client import DomjudgeClient  # noqa: E402
+
+CONTEST_ID = os.environ.get("DOMJUDGE_CONTEST_ID", 3)
+# Same league key as the HTML/SQL exporters (e.g. BCPC10), not the host, so a league isn't stored twice
+LEAGUE = os.environ.get("DOMJUDGE_LEAGUE")
+
+# Re-running within these windows reuses the last download; after that it revalidates
+session = DomjudgeClient.from_env(ttls={"scoreboard": 10, "teams": 300})
 
 # Step 1: Fetch scoreboard data
-scoreboard_url = f"{DOMJUDGE_BASE_URL}/api/v4/contests/{CONTEST_ID}/scoreboard"
-scoreboard_response = requests.get(scoreboard_url, params={"public": True})
+scoreboard_url = f"{session.base_url}/api/v4/contests/{CONTEST_ID}/scoreboard"
+scoreboard_response = session.get(scoreboard_url, params={"public": True})
 scoreboard_response.raise_for_status()
 scoreboard_data = scoreboard_response.json()
 scoreboard_rows = scoreboard_data.get("rows", [])
 
 # Step 2: Fetch all teams for the contest
-teams_url = f"{DOMJUDGE_BASE_URL}/api/v4/teams"
-teams_response = requests.get(teams_url, params={"cid": CONTEST_ID})
+teams_url = f"{session.base_url}/api/v4/teams"
+teams_response = session.get(teams_url, params={"cid": CONTEST_ID})
 teams_response.raise_for_status()
 teams_list = teams_response.json()
 
@@ -53,3 +64,10 @@ print(df)
 
 excel_file_path = './contest_scoreboard_from_api.xlsx'
 df.to_excel(excel_file_path, index=False, engine='openpyxl')
+
+# Step 5: Add to the season results store (RESULTS_STORE="" to skip)
+if results_store.STORE_DIR and not LEAGUE:
+    print("⚠️ Not added to the results store: set DOMJUDGE_LEAGUE (e.g. BCPC10) to store this contest")
+elif results_store.STORE_DIR:
+    path = results_store.append(df, LEAGUE, CONTEST_ID, source="api")
+    print(f"💾 Added to results store: {path}")
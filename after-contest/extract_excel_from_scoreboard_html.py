@@ -1,62 +1,162 @@
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.html
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 
-def fetch_scoreboard_from_html(url_or_path):
-    # Step 1: Load HTML
-    if url_or_path.startswith("http://") or url_or_path.startswith("https://"):
-        response = requests.get(url_or_path)
+import results_store
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import http_endpoint, metrics  # noqa: E402
+
+COLUMNS = ['Team name', 'University name', 'Rank', 'Count of correct answers', 'Count of first answers',
+           'Did they have any submissions']
+
+
+def has_class(element, name):
+    return name in (element.get("class") or "").split()
+
+
+def is_url(url_or_path):
+    return url_or_path.startswith("http://") or url_or_path.startswith("https://")
+
+
+def source_name(url_or_path):
+    return os.path.splitext(os.path.basename(url_or_path.rstrip("/")))[0]
+
+
+def load_html(url_or_path):
+    """Raw bytes of a scoreboard page; parse_scoreboard decodes them as UTF-8 (Persian names)."""
+    if is_url(url_or_path):
+        with metrics.timed("http", http_endpoint("GET", url_or_path)) as call:
+            response = requests.get(url_or_path)
+            call.status = response.status_code
+            call.bytes_in = len(response.content)
         response.raise_for_status()
-        response.encoding = 'utf-8'  # Ensure correct decoding for Persian/UTF-8
-        html = response.text
-    else:
-        with open(url_or_path, 'r', encoding='utf-8') as f:
-            html = f.read()
+        return response.content
+    with open(url_or_path, 'rb') as f:
+        return f.read()
 
-    soup = BeautifulSoup(html, 'html.parser')
-    table = soup.find("table", class_="scoreboard")
 
-    data = []
+def parse_scoreboard(html):
+    """Rows of a DOMjudge scoreboard page, selected by class on the lxml tree."""
+    doc = lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    tables = doc.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " scoreboard ")]')
+    if not tables:
+        raise ValueError("No scoreboard table found")
 
-    for row in table.find("tbody").find_all("tr"):
-        if not row or row.select("td.scoresummary"):
+    data = []
+    for row in tables[0].xpath('./tbody/tr | ./tr'):
+        cols = row.xpath('./td')
+        if any(has_class(col, "scoresummary") for col in cols):
             continue  # skip summary row
-
-        cols = row.find_all("td")
         if len(cols) < 5:
             continue  # skip malformed rows
 
-        rank = cols[0].text.strip()
-        team_name = cols[2].text.strip()
-        solved_count = cols[3].text.strip()
-        total_time = cols[4].text.strip()
+        rank = cols[0].text_content().strip()
+        team_cell = cols[2]
+        name_spans = [s for s in team_cell.iter("span") if has_class(s, "forceWidth") and not has_class(s, "univ")]
+        univ_spans = [s for s in team_cell.iter("span") if has_class(s, "univ")]
+        team_name = (name_spans[0] if name_spans else team_cell).text_content().strip()
+        university = univ_spans[0].text_content().strip() if univ_spans else "N/A"
+        solved_count = cols[3].text_content().strip()
 
-        problem_cells = cols[5:]
         count_first_answers = 0
         has_submissions = 0
-
-        for cell in problem_cells:
-            if "score_correct" in cell.decode():
+        for cell in cols[5:]:
+            correct = [e for e in cell.iter() if has_class(e, "score_correct")]
+            # As before: a team only counts as having submitted once a cell is correct
+            if correct:
                 has_submissions = 1
-                if "score_first" in cell.decode():
+                if any(has_class(e, "score_first") for e in correct):
                     count_first_answers += 1
 
         data.append({
             'Team name': team_name,
-            'University name': "N/A",  # No affiliation data in HTML
+            'University name': university or "N/A",
             'Rank': rank if rank else "N/A",
             'Count of correct answers': int(solved_count),
             'Count of first answers': count_first_answers,
             'Did they have any submissions': has_submissions
         })
+    return data
+
+
+def extract(source):
+    """Worker: (source name, rows) for one file, or for a (name, html) page already downloaded."""
+    name, html = source if isinstance(source, tuple) else (source_name(source), load_html(source))
+    return name, parse_scoreboard(html)
+
+
+def expand_inputs(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "**", "*.html"), recursive=True)))
+        else:
+            paths.append(item)
+    return paths
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract DOMjudge scoreboard HTML pages into one Excel table.")
+    parser.add_argument("inputs", nargs="*",
+                        help="HTML files, directories of them (e.g. ~/scoreboard) or URLs. "
+                             "Default: $SCOREBOARD_HTML")
+    parser.add_argument("--output", default='./contest-10-2_scoreboard_from_html.xlsx', help="Excel file to write")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parsing processes")
+    parser.add_argument("--league", help="League for the results store, single input only. "
+                                         "Default: from scoreboard-<league>-contest-<cid>")
+    parser.add_argument("--contest", help="Contest for the results store, single input only. "
+                                          "Default: from the file name")
+    results_store.add_store_args(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Replace with the path to your local HTML file or a URL
+    inputs = expand_inputs(args.inputs or [
+        os.environ.get("SCOREBOARD_HTML", "http://185.7.212.13:8585/scoreboard-BCPC10-contest-2.html")])
+    if len(inputs) > 1 and (args.league or args.contest):
+        # One league/contest for a whole batch would store every file under the same key
+        raise SystemExit("❌ --league/--contest only work with one input; a batch is stored by each "
+                         "scoreboard-<league>-contest-<cid> file name")
+    # URLs are fetched here, not in the workers, so their HTTP metrics are recorded by this process
+    inputs = [(source_name(item), load_html(item)) if is_url(item) else item for item in inputs]
+
+    if len(inputs) == 1:
+        results = [extract(inputs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(extract, inputs))
 
-    return pd.DataFrame(data)
+    frames = []
+    for name, rows in results:
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        if len(results) > 1:
+            # One combined table: say which scoreboard each row came from
+            frame.insert(0, 'Scoreboard', name)
+        frames.append(frame)
+        print(f"📄 {name}: {len(rows)} teams")
+    df = pd.concat(frames, ignore_index=True)
+    print(df)
 
-# Replace with the path to your local HTML file or a URL
-html_file_path = "http://185.7.212.13:8585/scoreboard-BCPC10-contest-2.html"
-df = fetch_scoreboard_from_html(html_file_path)
-print(df)
+    if not args.no_store:
+        for name, rows in results:
+            league, contest = results_store.split_scoreboard_name(name) or (None, None)
+            league, contest = args.league or league, args.contest or contest
+            if league is None or contest is None:
+                print(f"⚠️ Not stored: can't tell league/contest of '{name}' (use --league/--contest)")
+                continue
+            path = results_store.append(pd.DataFrame(rows, columns=COLUMNS), league, contest, source="html",
+                                        store_dir=args.store)
+            print(f"💾 Added to results store: {path}")
 
-# Save to Excel (UTF-8 supported by default with openpyxl)
-excel_file_path = './contest-10-2_scoreboard_from_html.xlsx'
-df.to_excel(excel_file_path, index=False, engine='openpyxl')
+    # Save to Excel (UTF-8 supported by default with openpyxl)
+    df.to_excel(args.output, index=False, engine='openpyxl')
+    print(f"💾 Written {args.output}")
@@ -0,0 +1,217 @@
+"""Season-wide results in one local Parquet store, one file per league x contest.
+
+    python after-contest/results_store.py add contest_scoreboard_from_api.xlsx --league BCPC10 --contest 2
+    python after-contest/results_store.py season --league BCPC10 --output season.xlsx
+    POINTS_RULES="solved=12,first=4" python after-contest/results_store.py season --league BCPC10
+
+The exporters (extract_excel_from_scoreboard_api.py, _html.py and
+scoreboard_from_sql.py) add their table here every time they run; a re-export
+of the same contest replaces its file, so the store always holds one row per
+league x contest x team. Points are computed from the stored counts with
+vectorized NumPy, so changing the rules and re-scoring the whole season is a
+local, milliseconds operation instead of a spreadsheet recalculation, and
+update_final_scoreboard_sheet.py writes the resulting values instead of a
+formula.
+
+Points per contest = solved * solved_weight + first * first_weight
+                     + submitted * submitted_weight
+                     + max(0, top + 1 - rank) * top_bonus
+There are no built-in weights: the rules come from POINTS_RULES
+("solved=10,first=3") and/or --rules (which wins), and a weight that isn't
+named is 0. Without either, scoring stops with an error rather than guessing.
+
+The league is the same identifier everywhere (e.g. BCPC10, as in
+scoreboard-BCPC10-contest-2 and the sql/zip file names): --league or
+DOMJUDGE_LEAGUE, so one league never ends up under two keys.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.environ.get("RESULTS_STORE", "./results")
+RULES = ("solved", "first", "submitted", "top", "top_bonus")
+
+# Exporter column -> store column
+FIELDS = {
+    'Team name': 'team',
+    'University name': 'university',
+    'Rank': 'rank',
+    'Count of correct answers': 'solved',
+    'Count of first answers': 'first',
+    'Did they have any submissions': 'submitted',
+}
+COUNTS = ['solved', 'first', 'submitted']
+SCOREBOARD_NAME_RE = re.compile(r"scoreboard-(.+)-contest-([^-]+)$")
+
+
+def parse_rules(value):
+    """"solved=12,first=4" -> {"solved": 12.0, "first": 4.0}."""
+    rules = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, weight = item.partition("=")
+        if name.strip() not in RULES:
+            raise ValueError(f"Unknown points rule '{name.strip()}' (known: {', '.join(RULES)})")
+        rules[name.strip()] = float(weight)
+    return rules
+
+
+def rules_from(value=None):
+    """POINTS_RULES overridden by `value`; ValueError if neither gives any weight."""
+    rules = {**parse_rules(os.environ.get("POINTS_RULES")), **parse_rules(value)}
+    if not rules:
+        raise ValueError("No points rules: set POINTS_RULES or pass --rules, e.g. solved=10,first=3,submitted=1")
+    return {**dict.fromkeys(RULES, 0.0), **rules}
+
+
+def split_scoreboard_name(name):
+    """"scoreboard-BCPC10-contest-2" -> ("BCPC10", "2"), else None."""
+    match = SCOREBOARD_NAME_RE.search(name)
+    return match.groups() if match else None
+
+
+def to_records(df, league, contest, source=""):
+    """An exporter table (Team name, Rank, ...) as store rows."""
+    records = df[list(FIELDS)].rename(columns=FIELDS)
+    records["team"] = records["team"].astype(str).str.strip()
+    records["university"] = records["university"].fillna("N/A").astype(str)
+    records["rank"] = pd.to_numeric(records["rank"], errors="coerce").astype("Int64")
+    for column in COUNTS:
+        records[column] = pd.to_numeric(records[column], errors="coerce").fillna(0).astype("int32")
+    records.insert(0, "contest", str(contest))
+    records.insert(0, "league", str(league))
+    records["source"] = source
+    records["exported_at"] = pd.Timestamp(time.time(), unit="s")
+    return records
+
+
+def to_exporter(records):
+    """Store rows back in the exporters' column names."""
+    return records.rename(columns={v: k for k, v in FIELDS.items()})
+
+
+def _path(store_dir, league, contest):
+    safe = re.sub(r"[^\w.-]", "_", f"{league}-contest-{contest}")
+    return os.path.join(store_dir, f"{safe}.parquet")
+
+
+def append(df, league, contest, source="", store_dir=STORE_DIR):
+    """Store one contest's exporter table, replacing an earlier export of the same contest."""
+    records = to_records(df, league, contest, source).drop_duplicates("team").reset_index(drop=True)
+    os.makedirs(store_dir, exist_ok=True)
+    path = _path(store_dir, league, contest)
+    tmp = f"{path}.tmp"
+    records.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load(store_dir=STORE_DIR, league=None, contest=None):
+    """Every stored row (optionally one league / contest) as one DataFrame."""
+    if league is not None and contest is not None:
+        paths = [_path(store_dir, league, contest)]
+        paths = [p for p in paths if os.path.exists(p)]
+    else:
+        paths = sorted(glob.glob(os.path.join(store_dir, "*.parquet")))
+    if not paths:
+        return pd.DataFrame(columns=["league", "contest", *FIELDS.values(), "source", "exported_at"])
+    # One dataset read across all files, much faster than concatenating per-file frames
+    records = pd.read_parquet(paths)
+    if league is not None:
+        records = records[records["league"] == str(league)].reset_index(drop=True)
+    return records
+
+
+def points(records, rules=None):
+    """Per-row contest points as a float array, all rows at once."""
+    rules = rules or rules_from()
+    rank = records["rank"].to_numpy(dtype=float, na_value=np.inf)
+    bonus = np.clip(rules["top"] + 1 - rank, 0, None) * rules["top_bonus"]
+    return (records["solved"].to_numpy(dtype=float) * rules["solved"]
+            + records["first"].to_numpy(dtype=float) * rules["first"]
+            + records["submitted"].to_numpy(dtype=float) * rules["submitted"]
+            + bonus)
+
+
+def season(records, rules=None):
+    """One row per league x team: points per contest, total and season rank."""
+    if records.empty:
+        return pd.DataFrame(columns=["league", "team", "university", "contests", "total", "season rank"])
+    records = records.assign(points=points(records, rules))
+    per_contest = records.pivot_table(index=["league", "team"], columns="contest", values="points",
+                                      aggfunc="sum", fill_value=0)
+    per_contest = per_contest[sorted(per_contest.columns, key=lambda c: (len(c), c))]  # "2" before "10"
+    per_contest.columns = [f"contest {c} points" for c in per_contest.columns]
+    grouped = records.groupby(["league", "team"])
+    table = pd.DataFrame({
+        "university": grouped["university"].last(),
+        "contests": grouped["contest"].nunique(),
+        "total": grouped["points"].sum(),
+    }).join(per_contest).reset_index()
+    table["season rank"] = table.groupby("league")["total"].rank(method="min", ascending=False).astype(int)
+    return table.sort_values(["league", "season rank", "team"]).reset_index(drop=True)
+
+
+def add_store_args(parser):
+    """--store / --no-store for the exporters."""
+    parser.add_argument("--store", default=STORE_DIR, help=f"Results store directory. Default: {STORE_DIR} "
+                                                           f"($RESULTS_STORE)")
+    parser.add_argument("--no-store", action="store_true", help="Don't add the results to the store")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cross-league results store and season points.")
+    parser.add_argument("--store", default=STORE_DIR, help=f"Default: {STORE_DIR} ($RESULTS_STORE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Add an exported scoreboard Excel file")
+    add.add_argument("excel")
+    add.add_argument("--league", default=os.environ.get("DOMJUDGE_LEAGUE"),
+                     help="Default: $DOMJUDGE_LEAGUE, else from a scoreboard-<league>-contest-<cid> file name")
+    add.add_argument("--contest", help="Default: from a scoreboard-<league>-contest-<cid> file name")
+
+    for name, help_text in (("season", "Season totals per league and team"), ("contests", "Stored contests")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--league")
+        command.add_argument("--rules", help="Override points rules, e.g. solved=12,first=4")
+        command.add_argument("--output", help="Also write the table to this Excel file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "add":
+        league, contest = args.league, args.contest
+        if league is None or contest is None:
+            parsed = split_scoreboard_name(os.path.splitext(os.path.basename(args.excel))[0])
+            if parsed is None:
+                raise SystemExit("❌ Give --league and --contest for this file name.")
+            league, contest = league or parsed[0], contest or parsed[1]
+        df = pd.read_excel(args.excel)
+        print(f"💾 {len(df)} teams → {append(df, league, contest, source=os.path.basename(args.excel), store_dir=args.store)}")
+    else:
+        started = time.perf_counter()
+        records = load(args.store, league=args.league)
+        try:
+            rules = rules_from(args.rules)
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+        if args.command == "season":
+            table = season(records, rules)
+        else:
+            table = (records.assign(points=points(records, rules))
+                     .groupby(["league", "contest"])
+                     .agg(teams=("team", "size"), submitted=("submitted", "sum"), points=("points", "sum"),
+                          exported_at=("exported_at", "max"), source=("source", "last"))
+                     .reset_index())
+        took = time.perf_counter() - started
+        print(table.to_string(index=False))
+        print(f"⏱️  {len(records)} rows in {took * 1000:.1f} ms with {', '.join(f'{k}={v:g}' for k, v in rules.items())}")
+        if args.output:
+            table.to_excel(args.output, index=False, engine='openpyxl')
+            print(f"💾 Written {args.output}")
@@ -0,0 +1,268 @@
+"""Compute DOMjudge scoreboards straight from SQL backup dumps, no MariaDB needed.
+
+    python after-contest/scoreboard_from_sql.py ~/sql-backup-files/*.sql --output all_scoreboards.xlsx
+
+Each dump is read once, line by line, keeping only the INSERT rows of the
+tables a scoreboard needs; everything else (submission files, judging runs,
+event log, ...) is skipped without being parsed. The unfrozen (jury) ICPC
+scoreboard of every contest is then computed in memory: solved count,
+penalty time, first-to-solve and rank, with ties sharing a rank and teams
+ranked within their category's sort order, like DOMjudge. Dumps are handled
+in parallel, one per process.
+
+The output has the columns of the API/HTML exporters plus a Scoreboard
+column named like the old HTML files (scoreboard-<league>-contest-<cid>),
+and every scoreboard is also added to the season results store
+(results_store.py) unless --no-store is given.
+"""
+import argparse
+import gzip
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import results_store
+
+TABLES = {
+    "contest", "contestproblem", "contestteam", "contestteamcategory", "configuration", "judging",
+    "problem", "submission", "team", "team_affiliation", "team_category",
+}
+COLUMNS = ['Team name', 'University name', 'Rank', 'Count of correct answers', 'Count of first answers',
+           'Did they have any submissions']
+
+CREATE_RE = re.compile(r"CREATE TABLE `(\w+)`")
+COLUMN_RE = re.compile(r"\s+`(\w+)`")
+INSERT_RE = re.compile(r"INSERT INTO `(\w+)`(?: \(([^)]*)\))? VALUES ")
+VALUE_RE = re.compile(r"""
+    '((?:[^'\\]|\\.|'')*)'      # quoted string
+  | (NULL)
+  | (0x[0-9A-Fa-f]*)            # hex literal
+  | ([-+]?[0-9][0-9.eE+-]*)     # number
+  | ([(),])
+""", re.X | re.S)
+UNESCAPE_RE = re.compile(r"\\(.)|''", re.S)
+ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def unescape(value):
+    return UNESCAPE_RE.sub(lambda m: "'" if m.group(1) is None else ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def number(text):
+    return float(text) if any(c in text for c in ".eE") else int(text)
+
+
+def iter_tuples(values):
+    """Rows of an extended INSERT's VALUES part, as lists of str/int/float/None."""
+    row = None
+    for string, null, hexa, num, punct in VALUE_RE.findall(values):
+        if punct == "(":
+            row = []
+        elif punct == ")":
+            yield row
+            row = None
+        elif punct == ",":
+            continue
+        elif null:
+            row.append(None)
+        elif hexa:
+            row.append(bytes.fromhex(hexa[2:]).decode("utf-8", "replace"))
+        elif num:
+            row.append(number(num))
+        else:
+            row.append(unescape(string))
+
+
+def read_dump(path, tables=TABLES):
+    """{table: [row dict]} for the wanted tables, reading the dump line by line."""
+    opener = gzip.open if path.endswith(".gz") else open
+    columns = {}
+    rows = {table: [] for table in tables}
+    creating = None
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if creating is not None:
+                match = COLUMN_RE.match(line)
+                if match:
+                    columns[creating].append(match.group(1))
+                elif line.startswith(")"):
+                    creating = None
+                continue
+            if line.startswith("CREATE TABLE"):
+                table = CREATE_RE.match(line).group(1)
+                if table in tables:
+                    creating = table
+                    columns[table] = []
+                continue
+            if not line.startswith("INSERT INTO"):
+                continue
+            match = INSERT_RE.match(line)
+            if not match or match.group(1) not in tables:
+                continue
+            table, explicit = match.groups()
+            names = [c.strip(" `") for c in explicit.split(",")] if explicit else columns[table]
+            rows[table].extend(dict(zip(names, row)) for row in iter_tuples(line[match.end():]))
+    return rows
+
+
+def config_value(tables, name, default):
+    for row in tables["configuration"]:
+        if row.get("name") == name:
+            value = str(row.get("value")).strip('"')
+            return {"true": 1, "false": 0}.get(value, value)
+    return default
+
+
+def scoreboard(tables, contest):
+    """Unfrozen scoreboard rows for one contest, in the exporters' format, ranked."""
+    cid = contest["cid"]
+    penalty_minutes = int(config_value(tables, "penalty_time", 20))
+    compile_penalty = bool(int(config_value(tables, "compile_penalty", 0)))
+    start, end = float(contest["starttime"]), float(contest["endtime"])
+
+    categories = {c["categoryid"]: c for c in tables["team_category"]}
+    affiliations = {a["affilid"]: a for a in tables["team_affiliation"]}
+    problems = {p["probid"] for p in tables["contestproblem"] if p["cid"] == cid}
+    teams = {}
+    open_to_all = contest.get("open_to_all_teams", 1) in (1, None)
+    contest_teams = {t["teamid"] for t in tables["contestteam"] if t["cid"] == cid}
+    contest_categories = {c["categoryid"] for c in tables["contestteamcategory"] if c["cid"] == cid}
+    for team in tables["team"]:
+        category = categories.get(team.get("categoryid")) or {}
+        if not team.get("enabled", 1) or not category.get("visible", 1):
+            continue
+        if not open_to_all and team["teamid"] not in contest_teams and team.get("categoryid") not in contest_categories:
+            continue
+        teams[team["teamid"]] = team
+
+    verdicts = {}
+    for judging in sorted(tables["judging"], key=lambda j: j["judgingid"]):
+        if judging.get("cid") == cid and judging.get("valid", 1):
+            verdicts[judging["submitid"]] = judging.get("result")
+
+    cells = {}
+    for submission in sorted(tables["submission"], key=lambda s: (float(s["submittime"]), s["submitid"])):
+        if (submission["cid"] != cid or not submission.get("valid", 1) or submission["teamid"] not in teams
+                or submission["probid"] not in problems or float(submission["submittime"]) >= end):
+            continue
+        cell = cells.setdefault((submission["teamid"], submission["probid"]),
+                                {"judged": 0, "pending": 0, "wrong": 0, "solved_at": None})
+        if cell["solved_at"] is not None:
+            continue
+        result = verdicts.get(submission["submitid"])
+        if result is None:
+            cell["pending"] += 1
+        elif result == "correct":
+            cell["judged"] += 1
+            cell["solved_at"] = float(submission["submittime"]) - start
+        else:
+            cell["judged"] += 1
+            if result != "compiler-error" or compile_penalty:
+                cell["wrong"] += 1
+
+    first = {}
+    for (team_id, problem_id), cell in cells.items():
+        if cell["solved_at"] is not None and (problem_id not in first or cell["solved_at"] < first[problem_id][0]):
+            first[problem_id] = (cell["solved_at"], team_id)
+
+    rows = []
+    for team_id, team in teams.items():
+        solved = penalty = last = first_count = 0
+        submitted = 0
+        for problem_id in problems:
+            cell = cells.get((team_id, problem_id))
+            if cell is None:
+                continue
+            submitted |= int(cell["judged"] > 0 or cell["pending"] > 0)
+            if cell["solved_at"] is not None:
+                minutes = int(cell["solved_at"] // 60)
+                solved += 1
+                penalty += minutes + penalty_minutes * cell["wrong"]
+                last = max(last, minutes)
+                first_count += int(first[problem_id][1] == team_id)
+        affiliation = affiliations.get(team.get("affilid")) or {}
+        rows.append({
+            "sortorder": (categories.get(team.get("categoryid")) or {}).get("sortorder", 0),
+            "key": (-solved, penalty, last),
+            'Team name': team.get("display_name") or team["name"],
+            'University name': affiliation.get("name") or "N/A",
+            'Count of correct answers': solved,
+            'Count of first answers': first_count,
+            'Did they have any submissions': submitted,
+        })
+
+    rows.sort(key=lambda r: (r["sortorder"], r["key"], r["Team name"]))
+    previous = None
+    for position, row in enumerate(rows, 1):
+        group = (row["sortorder"], row["key"])
+        if group != previous:
+            rank, previous = position, group
+        row["Rank"] = rank
+    return [{column: row[column] for column in COLUMNS} for row in rows]
+
+
+def process_dump(args):
+    """Worker: [(scoreboard name, rows)] for every wanted contest in one dump."""
+    path, contest_ids, league = args
+    tables = read_dump(path)
+    league = league or os.path.basename(path).split(".sql")[0]
+    results = []
+    for contest in sorted(tables["contest"], key=lambda c: c["cid"]):
+        if contest_ids and contest["cid"] not in contest_ids:
+            continue
+        if contest.get("starttime") is None or contest.get("endtime") is None:
+            continue
+        results.append((f"scoreboard-{league}-contest-{contest['cid']}", scoreboard(tables, contest)))
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compute contest scoreboards from DOMjudge SQL dumps.")
+    parser.add_argument("dumps", nargs="+", help=".sql or .sql.gz backup files")
+    parser.add_argument("--contest-ids", help="Comma separated contest IDs (cid). Default: every contest")
+    parser.add_argument("--output", default="./scoreboards_from_sql.xlsx", help="Combined Excel file")
+    parser.add_argument("--split-dir", help="Also write one Excel file per scoreboard into this directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Dumps parsed in parallel")
+    parser.add_argument("--league", help="League name (e.g. BCPC10) when giving a single dump. "
+                                         "Default: the dump's file name")
+    results_store.add_store_args(parser)
+    args = parser.parse_args()
+    if args.league and len(args.dumps) > 1:
+        parser.error("--league only works with one dump; the league comes from each dump's file name")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    contest_ids = {int(c) for c in args.contest_ids.split(",")} if args.contest_ids else set()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = [r for rs in executor.map(process_dump, [(d, contest_ids, args.league) for d in args.dumps]) for r in rs]
+
+    # Same league x cid twice would overwrite one store file / --split-dir file with the other
+    names = [name for name, _ in results]
+    clashes = sorted({name for name in names if names.count(name) > 1})
+    if clashes:
+        raise SystemExit(f"❌ Several dumps give the same scoreboard: {', '.join(clashes)}. "
+                         f"Rename the dumps so each league's file name is different.")
+
+    frames = []
+    for name, rows in results:
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        print(f"📄 {name}: {len(rows)} teams")
+        if args.split_dir:
+            os.makedirs(args.split_dir, exist_ok=True)
+            frame.to_excel(os.path.join(args.split_dir, f"{name}.xlsx"), index=False, engine='openpyxl')
+        if not args.no_store:
+            league, contest = results_store.split_scoreboard_name(name)
+            results_store.append(frame, league, contest, source="sql", store_dir=args.store)
+        frame.insert(0, 'Scoreboard', name)
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Scoreboard', *COLUMNS])
+    print(df)
+    df.to_excel(args.output, index=False, engine='openpyxl')
+    print(f"💾 Written {args.output}")
+    if not args.no_store and results:
+        print(f"💾 Added {len(results)} scoreboards to the results store in {args.store}")
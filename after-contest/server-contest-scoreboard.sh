@@ -1,26 +1,19 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
-zip_file="$1"
+# Usage: server-contest-scoreboard.sh contest-BCPC10-2_unfrozen_scoreboard.zip [more.zip | prefix=file.zip ...]
+# Serves the archives as they are (no unzip); several zips are mounted under /<league-cid>/.
 
-if [[ ! -f "$zip_file" ]]; then
-  echo "❌ File '$zip_file' does not exist."
+if [[ $# -eq 0 ]]; then
+  echo "❌ Usage: $0 <scoreboard.zip> [more zips...]"
   exit 1
 fi
 
-serve_dir=$(mktemp -d)
+for zip_file in "$@"; do
+  if [[ ! -f "${zip_file#*=}" ]]; then
+    echo "❌ File '${zip_file#*=}' does not exist."
+    exit 1
+  fi
+done
 
-cleanup() {
-  echo "🧹 Cleaning up temporary files..."
-  rm -rf "$serve_dir"
-  echo "✅ Done. Goodbye!"
-}
-trap cleanup EXIT INT TERM
-
-echo "📦 Unzipping '$zip_file' into '$serve_dir'..."
-unzip -q "$zip_file" -d "$serve_dir"
-echo "✅ Unzipped successfully."
-
-echo "🚀 Serving on http://localhost:3838 ..."
-cd "$serve_dir"
-python3 -m http.server 3838
+exec python3 "$(dirname "$0")/zip_scoreboard_server.py" --port 3838 "$@"
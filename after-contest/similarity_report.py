@@ -0,0 +1,296 @@
+"""Rank likely-copied submission pairs without comparing every pair.
+
+Reads one or more submission mirrors made by during-contest/download_submitions.py
+(blobs + index.sqlite). Every source is tokenized (identifiers, numbers and
+strings normalized, comments dropped), reduced to winnowed k-gram
+fingerprints and a MinHash signature. Signatures are bucketed per problem
+with LSH, so only submissions that share a bucket are compared exactly
+(Jaccard of their fingerprint sets). Pairs from the same team are ignored.
+
+Fingerprints and signatures are cached by blob hash in similarity_cache.sqlite,
+so adding the next league's mirror only processes its new sources.
+
+    python after-contest/similarity_report.py --store league1/submitions --store league2/submitions
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "during-contest"))
+from submission_store import SubmissionStore  # noqa: E402
+
+KGRAM = 5
+WINDOW = 4
+NUM_PERM = 64
+LSH_RECALL = 0.99  # chance that a pair exactly at --threshold still shares a band
+CACHE_FILE = "similarity_cache.sqlite"
+REPORT_FILE = "similarity_report.csv"
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+# a < 2^32 and fingerprints < 2^32, so a * x fits in uint64 before the first reduction
+PERM_A = _rng.randint(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.randint(0, (1 << 61) - 1, NUM_PERM, dtype=np.uint64)
+
+KEYWORDS = set("""
+auto bool break case catch char class const continue default delete do double else enum extern false float for
+friend goto if inline int long namespace new operator private protected public return short signed sizeof static
+struct switch template this throw true try typedef typename union unsigned using virtual void volatile while
+boolean extends final finally implements import instanceof interface package super synchronized
+and as assert def del elif except from global in is lambda None nonlocal not or pass print raise range with yield
+""".split())
+
+C_COMMENTS = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+HASH_COMMENTS = re.compile(r"#[^\n]*")
+TOKEN_RE = re.compile(r"""
+    (?P<str>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+  | (?P<num>\b\d[\w.]*)
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<op>\S)
+""", re.X)
+
+
+def comment_style(filename):
+    return "hash" if filename.endswith((".py", ".rb", ".sh")) else "c"
+
+
+def tokenize(text, style="c"):
+    """Tokens with names/literals collapsed, so renaming variables does not hide a copy."""
+    if style == "hash":
+        text = HASH_COMMENTS.sub(" ", text)
+    else:
+        text = C_COMMENTS.sub(" ", text)
+        # Preprocessor lines are boilerplate (#include <bits/stdc++.h> in every C++ source)
+        text = re.sub(r"^\s*#[^\n]*", " ", text, flags=re.M)
+    tokens = []
+    for match in TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "str":
+            tokens.append("S")
+        elif kind == "num":
+            tokens.append("N")
+        elif kind == "word":
+            tokens.append(value if value in KEYWORDS else "V")
+        else:
+            tokens.append(value)
+    return tokens
+
+
+def winnow(tokens, k=KGRAM, window=WINDOW):
+    """Winnowed k-gram hashes (Schleimer et al.): the minimum hash of every window."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + k]).encode(), digest_size=4).digest(), "little")
+        for i in range(len(tokens) - k + 1)
+    ]
+    if len(hashes) <= window:
+        return set(hashes)
+    return {min(hashes[i:i + window]) for i in range(len(hashes) - window + 1)}
+
+
+def minhash(fingerprints):
+    """(a * x + b) mod 2^61-1 per permutation, reduced in two steps so nothing overflows uint64."""
+    if not fingerprints:
+        return np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    values = np.fromiter(fingerprints, dtype=np.uint64, count=len(fingerprints))
+    hashed = (np.outer(PERM_A, values) % MERSENNE_PRIME + PERM_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+    return hashed.min(axis=1)
+
+
+def fingerprint_blob(args):
+    """Worker: (digest, style, path) -> (digest, style, fingerprints bytes, signature bytes)."""
+    digest, style, path = args
+    with open(path, "rb") as f:
+        text = f.read().decode("utf-8", "replace")
+    fingerprints = winnow(tokenize(text, style))
+    packed = np.array(sorted(fingerprints), dtype=np.uint32).tobytes()
+    return digest, style, packed, minhash(fingerprints).astype(np.uint32).tobytes()
+
+
+class SignatureCache:
+    """Per-blob fingerprints and MinHash signatures, keyed by blob hash and tokenizer style."""
+
+    PARAMS = f"k{KGRAM}-w{WINDOW}-p{NUM_PERM}-mod61"
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            "blob TEXT, style TEXT, params TEXT, fingerprints BLOB, minhash BLOB, PRIMARY KEY (blob, style, params))"
+        )
+
+    def get_many(self, keys):
+        found = {}
+        for blob, style, fingerprints, signature in self.db.execute(
+                "SELECT blob, style, fingerprints, minhash FROM signatures WHERE params = ?", (self.PARAMS,)):
+            if (blob, style) in keys:
+                found[(blob, style)] = (fingerprints, signature)
+        return found
+
+    def put_many(self, rows):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO signatures VALUES (?, ?, ?, ?, ?)",
+                [(blob, style, self.PARAMS, fingerprints, signature) for blob, style, fingerprints, signature in rows],
+            )
+
+    def close(self):
+        self.db.close()
+
+
+def load_signatures(stores, cache, workers):
+    """Fingerprint every blob the stores reference, computing only the ones not cached yet."""
+    wanted = {}
+    for store in stores:
+        for submission in store.submissions():
+            for filename, digest in submission["files"]:
+                wanted[(digest, comment_style(filename))] = store.blob_path(digest)
+
+    known = cache.get_many(wanted)
+    missing = [(digest, style, path) for (digest, style), path in wanted.items() if (digest, style) not in known]
+    print(f"🔎 {len(wanted)} distinct sources, {len(known)} cached, {len(missing)} to fingerprint")
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = list(executor.map(fingerprint_blob, missing, chunksize=64))
+        cache.put_many(computed)
+        known.update({(digest, style): (fp, sig) for digest, style, fp, sig in computed})
+    return {
+        key: (set(np.frombuffer(fp, dtype=np.uint32).tolist()), np.frombuffer(sig, dtype=np.uint32))
+        for key, (fp, sig) in known.items()
+    }
+
+
+def submission_signature(submission, signatures):
+    """Multi-file submissions: union of fingerprints, element-wise min of signatures."""
+    fingerprints = set()
+    signature = None
+    for filename, digest in submission["files"]:
+        fp, sig = signatures[(digest, comment_style(filename))]
+        fingerprints |= fp
+        signature = sig if signature is None else np.minimum(signature, sig)
+    return fingerprints, signature
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM, recall=LSH_RECALL):
+    """Most rows per band (fewest candidates) that still catch a pair at `threshold` with `recall`.
+
+    A pair with similarity s shares some band with probability 1 - (1 - s^r)^b,
+    e.g. 32 bands x 2 rows at 0.5 (16 x 4 would miss 36% of such pairs).
+    """
+    for rows in sorted((r for r in range(1, num_perm + 1) if num_perm % r == 0), reverse=True):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands
+    return num_perm
+
+
+def candidate_pairs(entries, bands):
+    """Index pairs sharing at least one LSH band bucket."""
+    rows = NUM_PERM // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        for i, (_, _, signature) in enumerate(entries):
+            buckets.setdefault(signature[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                pairs.update(combinations(members, 2))
+    return pairs
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def similar_pairs(store_label, problem, submissions, signatures, threshold):
+    entries = []
+    for submission in submissions:
+        fingerprints, signature = submission_signature(submission, signatures)
+        if fingerprints:
+            entries.append((submission, fingerprints, signature))
+
+    best = {}
+    compared = 0
+    for i, j in candidate_pairs(entries, lsh_bands(threshold)):
+        a, fp_a, _ = entries[i]
+        b, fp_b, _ = entries[j]
+        if a["team_id"] == b["team_id"]:
+            continue
+        compared += 1
+        score = jaccard(fp_a, fp_b)
+        if score < threshold:
+            continue
+        a, b = sorted((a, b), key=lambda s: (len(s["id"]), s["id"]))
+        # Keep the closest pair of submissions per pair of teams
+        key = tuple(sorted((a["team_id"], b["team_id"])))
+        if key not in best or score > best[key]["similarity"]:
+            best[key] = {
+                "store": store_label, "problem": problem, "similarity": round(score, 3),
+                "submission_a": a["id"], "team_a": a["team"] or a["team_id"], "language_a": a["language_id"],
+                "submission_b": b["id"], "team_b": b["team"] or b["team_id"], "language_b": b["language_id"],
+            }
+    return list(best.values()), len(entries), compared
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report likely-copied submission pairs per problem.")
+    parser.add_argument("--store", action="append", dest="stores",
+                        help="Submission mirror directory, repeatable. Default: submitions")
+    parser.add_argument("--cache", default=CACHE_FILE, help=f"Signature cache. Default: {CACHE_FILE}")
+    parser.add_argument("--output", default=REPORT_FILE, help=f"CSV report. Default: {REPORT_FILE}")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="Minimum fingerprint Jaccard similarity to report. Default: 0.5")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Fingerprinting processes")
+    parser.add_argument("--top", type=int, default=20, help="Pairs to print. Default: 20")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start = time.time()
+    stores = [SubmissionStore(path) for path in args.stores or ["submitions"]]
+    cache = SignatureCache(args.cache)
+    signatures = load_signatures(stores, cache, args.workers)
+    cache.close()
+
+    report = []
+    total = compared = 0
+    for path, store in zip(args.stores or ["submitions"], stores):
+        by_problem = {}
+        for submission in store.submissions():
+            by_problem.setdefault(submission["problem"] or submission["problem_id"], []).append(submission)
+        for problem, submissions in sorted(by_problem.items()):
+            pairs, count, n_compared = similar_pairs(path, problem, submissions, signatures, args.threshold)
+            report.extend(pairs)
+            total += count * (count - 1) // 2
+            compared += n_compared
+        store.close()
+
+    report.sort(key=lambda r: -r["similarity"])
+    with open(args.output, "w", encoding="utf8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["store", "problem", "similarity", "submission_a", "team_a",
+                                               "language_a", "submission_b", "team_b", "language_b"])
+        writer.writeheader()
+        writer.writerows(report)
+
+    for row in report[:args.top]:
+        print(f"{row['similarity']:.2f}  {row['problem']}: {row['team_a']} #{row['submission_a']}"
+              f"  ~  {row['team_b']} #{row['submission_b']}")
+    print(f"\n✅ {len(report)} pairs ≥ {args.threshold} written to {args.output}; "
+          f"compared {compared} of {total} possible pairs in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,124 +1,233 @@
+import argparse
+import math
+import os
+
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-
-# Load scoreboard data
-print("📥 Loading scoreboard data...")
-df = pd.read_excel('./contest_scoreboard_from_api.xlsx')
-
-# New contest columns
-prefix = "7th"
-columns = {
-    'Rank': f'{prefix} rank',
-    'Count of first answers': f'{prefix} First Ans',
-    'Count of correct answers': f'{prefix} True Ans',
-    'Did they have any submissions': f'{prefix} did submit',
-    'Points': f'{prefix} Points'
-}
-
-# Authenticate
-print("🔐 Authenticating with Google Sheets API...")
+
+import results_store
+
+SCOREBOARD_FILE = './contest_scoreboard_from_api.xlsx'
 SHEET_ID = "18Xmrbqb4uE-5lj3mDgEEBFMW6_rc9-HFvnDDzaku_68"
 RANGE_NAME = "Sheet1"
-creds = Credentials.from_service_account_file(
-    "./chatbot-book-scrapper-ac99a3d0f899.json",
-    scopes=["https://www.googleapis.com/auth/spreadsheets"]
-)
-client = gspread.authorize(creds)
-sheet = client.open_by_key(SHEET_ID).worksheet(RANGE_NAME)
-
-# Read current sheet
-print("📄 Reading current data from sheet...")
-existing_data = sheet.get_all_values()
-headers = existing_data[0]
-rows = existing_data[1:]
-
-# Team name → row index (1-based)
-print("🔍 Indexing existing teams...")
-team_column_index = headers.index("Team name")
-team_row_map = {row[team_column_index].strip(): idx + 2 for idx, row in enumerate(rows)}
-
-# Insert new contest columns before "Total PTR"
-print(f"🧱 Inserting new columns for {prefix} contest before 'Total PTR'...")
-insert_at = headers.index("Total PTR")
-new_headers = list(columns.values())
-headers = headers[:insert_at] + new_headers + headers[insert_at:]
-sheet.update(values=[headers], range_name='A1')
-
-# Update existing teams
-print("🔁 Updating existing teams with new contest data...")
-updated_teams = set()
-
-for _, row in df.iterrows():
-    team = row['Team name'].strip()
-    updated_teams.add(team)
-
-    if team in team_row_map:
+CREDENTIALS_FILE = "./chatbot-book-scrapper-ac99a3d0f899.json"
+PREFIX = "7th"
+INSERT_BEFORE = "Total PTR"
+
+
+def contest_columns(prefix):
+    """Scoreboard column -> sheet column for one contest, in sheet order."""
+    return {
+        'Rank': f'{prefix} rank',
+        'Count of first answers': f'{prefix} First Ans',
+        'Count of correct answers': f'{prefix} True Ans',
+        'Did they have any submissions': f'{prefix} did submit',
+        'Points': f'{prefix} Points'
+    }
+
+
+def a1(row, col):
+    """1-based (row, col) -> A1 notation, e.g. (2, 28) -> "AB2"."""
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return f"{letters}{row}"
+
+
+def cell_value(value):
+    """Plain Python value for a sheet cell (numpy ints, digit strings and NaN normalized)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return value
+
+
+def target_values(row, columns):
+    return [cell_value(row.get(key, "")) for key in columns]
+
+
+def with_points(df, rules=None):
+    """df plus a 'Points' column computed locally (see results_store.py), so the sheet gets values."""
+    records = results_store.to_records(df, league="", contest="")
+    return df.assign(Points=results_store.points(records, rules))
+
+
+def plan_sync(grid, df, columns, insert_before=INSERT_BEFORE):
+    """Work out every change locally from the current grid (formulas, not rendered values).
+
+    Returns (insert_at, updates, new_rows): the 0-based column where the
+    contest columns must be inserted (None if they already exist), the
+    changed blocks as [{"range", "values"}] and the rows to append.
+    """
+    headers = list(grid[0])
+    rows = [list(r) for r in grid[1:]]
+    new_headers = list(columns.values())
+
+    insert_at = None
+    if not set(new_headers) <= set(headers):
+        # Insert new contest columns before "Total PTR"
+        insert_at = headers.index(insert_before)
+        headers = headers[:insert_at] + new_headers + headers[insert_at:]
+        rows = [(r + [""] * (insert_at - len(r)))[:insert_at] + [""] * len(new_headers) + r[insert_at:]
+                for r in rows]
+
+    team_column_index = headers.index("Team name")
+    col_indexes = [headers.index(h) for h in new_headers]
+    # Team name → row index (1-based)
+    team_row_map = {str(row[team_column_index]).strip(): idx + 2 for idx, row in enumerate(rows)
+                    if len(row) > team_column_index}
+
+    changed = {}
+    new_rows = []
+    seen = set()
+    for _, row in df.iterrows():
+        team = str(row['Team name']).strip()
+        if team in seen:
+            continue
+        seen.add(team)
+        values = target_values(row, columns)
+        if team not in team_row_map:
+            new_row = [''] * len(headers)
+            new_row[team_column_index] = team
+            for col_index, value in zip(col_indexes, values):
+                new_row[col_index] = value
+            new_rows.append(new_row)
+            continue
         row_idx = team_row_map[team]
-
-        # Only update the new contest columns
-        for key in columns:
-            col_name = columns[key]
-            col_index = headers.index(col_name) + 1  # 1-based index for gspread
-
-            value = "=CALC_CONTEST_POINTS()" if key == "Points" else row.get(key, "")
-            sheet.update_cell(row_idx, col_index, value)
-
-        print(f"✅ Updated: {team}")
-
-# Append new teams
-print("➕ Checking for new teams to append...")
-current_row_count = len(rows) + 1
-for _, row in df.iterrows():
-    team = row['Team name'].strip()
-    if team not in team_row_map:
-        new_row = [''] * len(headers)
-        new_row[team_column_index] = team
-
-        for key in columns:
-            col_index = headers.index(columns[key])
-            if key == "Points":
-                new_row[col_index] = "=CALC_CONTEST_POINTS()"
-            else:
-                value = row.get(key, "")
-                try:
-                    new_row[col_index] = int(value) if str(value).isdigit() else value
-                except:
-                    new_row[col_index] = value
-
-        sheet.append_row(new_row, value_input_option="USER_ENTERED")
-        print(f"🆕 Added new team to sheet: {team}")
-
-print("✅ All teams processed.")
-
-# Group non-Points columns
-print("📊 Grouping non-Points columns...")
-service = build('sheets', 'v4', credentials=creds)
-group_column_titles = [v for k, v in columns.items() if "Points" not in v]
-group_start = headers.index(group_column_titles[0])
-group_end = group_start + len(group_column_titles) - 1
-sheet_id = sheet._properties['sheetId']
-
-group_request = {
-    "requests": [
-        {
-            "addDimensionGroup": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": group_start,
-                    "endIndex": group_end + 1
-                }
-            }
-        }
+        current = rows[row_idx - 2]
+        for col_index, value in zip(col_indexes, values):
+            old = cell_value(current[col_index]) if col_index < len(current) else ""
+            if str(old) != str(value):
+                changed.setdefault(row_idx, {})[col_index] = value
+
+    return insert_at, blocks(changed, rows, col_indexes), new_rows
+
+
+def blocks(changed, rows, col_indexes):
+    """Merge changed cells into rectangles: one span per row, consecutive rows with the same span joined."""
+    spans = []
+    for row_idx in sorted(changed):
+        cols = changed[row_idx]
+        first, last = min(cols), max(cols)
+        current = rows[row_idx - 2]
+        values = [cols.get(c, current[c] if c < len(current) else "") for c in range(first, last + 1)]
+        if spans and spans[-1]["cols"] == (first, last) and spans[-1]["end"] == row_idx - 1:
+            spans[-1]["end"] = row_idx
+            spans[-1]["values"].append(values)
+        else:
+            spans.append({"start": row_idx, "end": row_idx, "cols": (first, last), "values": [values]})
+    return [
+        {"range": f"{a1(s['start'], s['cols'][0] + 1)}:{a1(s['end'], s['cols'][1] + 1)}", "values": s["values"]}
+        for s in spans
     ]
-}
 
-service.spreadsheets().batchUpdate(
-    spreadsheetId=SHEET_ID,
-    body=group_request
-).execute()
 
-print(f"📦 Grouped columns: {group_column_titles[0]} to {group_column_titles[-1]}")
-print("✅ Script finished successfully.")
+def sync(sheet, df, columns, insert_before=INSERT_BEFORE, dry_run=False):
+    """Bring the worksheet in line with `df` in at most a handful of API calls."""
+    # Read with formulas so cells still holding the old =CALC_CONTEST_POINTS() get replaced by values
+    # (only ever computed from explicitly configured rules, see with_points)
+    print("📄 Reading current data from sheet...")
+    grid = sheet.get_all_values(value_render_option="FORMULA")
+    insert_at, updates, new_rows = plan_sync(grid, df, columns, insert_before)
+    changed_cells = sum(len(u["values"]) * len(u["values"][0]) for u in updates)
+    print(f"🔍 {changed_cells} cells to update in {len(updates)} ranges, {len(new_rows)} new teams"
+          + (f", {len(columns)} columns to insert" if insert_at is not None else ""))
+    if dry_run:
+        return insert_at, updates, new_rows
+
+    if insert_at is not None:
+        print(f"🧱 Inserting new columns before '{insert_before}'...")
+        sheet.insert_cols([[header] for header in columns.values()], col=insert_at + 1,
+                          value_input_option="USER_ENTERED")
+    if updates:
+        print("🔁 Updating existing teams with new contest data...")
+        sheet.batch_update(updates, value_input_option="USER_ENTERED")
+    if new_rows:
+        print(f"➕ Appending {len(new_rows)} new teams...")
+        sheet.append_rows(new_rows, value_input_option="USER_ENTERED")
+    if insert_at is not None:
+        group_columns(sheet, insert_at, columns)
+    return insert_at, updates, new_rows
+
+
+def group_columns(sheet, insert_at, columns):
+    """Group the new non-Points columns (only when they were just inserted, so re-runs don't nest groups)."""
+    group_column_titles = [v for k, v in columns.items() if "Points" not in v]
+    sheet.spreadsheet.batch_update({
+        "requests": [
+            {
+                "addDimensionGroup": {
+                    "range": {
+                        "sheetId": sheet._properties['sheetId'],
+                        "dimension": "COLUMNS",
+                        "startIndex": insert_at,
+                        "endIndex": insert_at + len(group_column_titles)
+                    }
+                }
+            }
+        ]
+    })
+    print(f"📦 Grouped columns: {group_column_titles[0]} to {group_column_titles[-1]}")
+
+
+def open_worksheet(sheet_id, worksheet, credentials_file):
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_file(
+        credentials_file,
+        scopes=["https://www.googleapis.com/auth/spreadsheets"]
+    )
+    client = gspread.authorize(creds)
+    return client.open_by_key(sheet_id).worksheet(worksheet)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Add one contest's results to the final scoreboard sheet.")
+    parser.add_argument("--input", default=SCOREBOARD_FILE, help=f"Scoreboard Excel file. Default: {SCOREBOARD_FILE}")
+    parser.add_argument("--league", default=os.environ.get("DOMJUDGE_LEAGUE"),
+                        help="Take the contest from the results store instead of --input (with --contest). "
+                             "Default: $DOMJUDGE_LEAGUE")
+    parser.add_argument("--contest", help="Contest ID in the results store")
+    parser.add_argument("--store", default=results_store.STORE_DIR, help="Results store directory")
+    parser.add_argument("--rules", help="Points rules, e.g. solved=10,first=3,submitted=1 (required unless "
+                                        "POINTS_RULES is set, see results_store.py)")
+    parser.add_argument("--prefix", default=PREFIX, help=f"Contest column prefix. Default: {PREFIX}")
+    parser.add_argument("--sheet-id", default=SHEET_ID)
+    parser.add_argument("--worksheet", default=RANGE_NAME)
+    parser.add_argument("--credentials", default=CREDENTIALS_FILE, help="Service account JSON file")
+    parser.add_argument("--before", default=INSERT_BEFORE, help=f"Insert the new columns before this one. "
+                                                              f"Default: {INSERT_BEFORE}")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Load scoreboard data
+    print("📥 Loading scoreboard data...")
+    if args.league and args.contest:
+        df = results_store.to_exporter(results_store.load(args.store, args.league, args.contest))
+        if df.empty:
+            raise SystemExit(f"❌ No results for {args.league} contest {args.contest} in {args.store}")
+    else:
+        df = pd.read_excel(args.input)
+    try:
+        rules = results_store.rules_from(args.rules)
+    except ValueError as e:
+        # Never overwrite the sheet's points with weights nobody chose
+        raise SystemExit(f"❌ {e}")
+    df = with_points(df, rules)
+
+    # Authenticate
+    print("🔐 Authenticating with Google Sheets API...")
+    sheet = open_worksheet(args.sheet_id, args.worksheet, args.credentials)
+
+    sync(sheet, df, contest_columns(args.prefix), args.before, args.dry_run)
+    print("✅ Script finished successfully.")
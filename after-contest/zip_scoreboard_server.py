@@ -0,0 +1,240 @@
+"""Serve scoreboard zips as static sites straight out of the archives.
+
+    python after-contest/zip_scoreboard_server.py contest-BCPC10-2_unfrozen_scoreboard.zip
+    python after-contest/zip_scoreboard_server.py ~/scoreboard_zips/*.zip    # /BCPC10-2/, /BCPC10-3/, ...
+    python after-contest/zip_scoreboard_server.py finals=final.zip league1=contest-L1-3_unfrozen_scoreboard.zip
+
+Each archive's central directory is read once at startup; nothing is
+extracted. A deflated member goes to gzip-capable clients as-is, wrapped in
+a gzip header and trailer (the zip already stores the CRC and size gzip
+needs), so serving it costs one pread and no compression work. Responses
+carry an ETag built from the member's CRC and honour If-None-Match with 304,
+and recently served members are kept in an in-memory LRU. A single archive
+is mounted at /, several under a prefix each.
+"""
+import argparse
+import mimetypes
+import os
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+PORT = 3838
+CACHE_MB = 64
+ZIP_NAME_RE = re.compile(r"contest-(.+)_unfrozen_scoreboard$")
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+class Member:
+    def __init__(self, archive, info):
+        self.archive = archive
+        self.name = info.filename
+        self.deflated = info.compress_type == zipfile.ZIP_DEFLATED
+        self.stored = info.compress_type == zipfile.ZIP_STORED
+        self.crc = info.CRC
+        self.size = info.file_size
+        self.compress_size = info.compress_size
+        self.header_offset = info.header_offset
+        self.mtime = time.mktime(info.date_time + (0, 0, -1))
+        self.etag = f'"{self.crc:08x}-{self.size:x}"'
+        self.content_type = mimetypes.guess_type(self.name)[0] or "application/octet-stream"
+        self._data_offset = None
+
+    def raw(self):
+        """The member's bytes exactly as stored in the zip (deflated or not)."""
+        if self._data_offset is None:
+            header = os.pread(self.archive.fd, LOCAL_HEADER.size, self.header_offset)
+            name_length, extra_length = LOCAL_HEADER.unpack(header)[-2:]
+            self._data_offset = self.header_offset + LOCAL_HEADER.size + name_length + extra_length
+        return os.pread(self.archive.fd, self.compress_size, self._data_offset)
+
+    def gzipped(self):
+        """A gzip stream around the stored deflate data, no recompression."""
+        header = b"\x1f\x8b\x08\x00" + struct.pack("<L", int(self.mtime)) + b"\x00\xff"
+        return header + self.raw() + struct.pack("<LL", self.crc, self.size & 0xFFFFFFFF)
+
+    def plain(self):
+        data = self.raw()
+        if self.deflated:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        if self.stored:
+            return data
+        with self.archive.zip.open(self.name) as f:
+            return f.read()
+
+
+class Archive:
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path)
+        self.fd = os.open(path, os.O_RDONLY)
+        self.members = {}
+        for info in self.zip.infolist():
+            if not info.is_dir():
+                self.members[info.filename.lstrip("/")] = Member(self, info)
+
+    def lookup(self, path):
+        path = path.lstrip("/")
+        member = self.members.get(path)
+        if member is None and (path == "" or path.endswith("/")):
+            member = self.members.get(path + "index.html")
+        return member
+
+
+class LRU:
+    """Bytes cache bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def mount_name(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = ZIP_NAME_RE.match(stem)
+    return match.group(1) if match else stem
+
+
+class ScoreboardHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mounts = {}
+    cache = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def resolve(self, path):
+        if "" in self.mounts:
+            return self.mounts[""].lookup(path)
+        prefix, _, rest = path.lstrip("/").partition("/")
+        archive = self.mounts.get(prefix)
+        if archive is None:
+            return None
+        if rest == "" and not path.endswith("/"):
+            return "redirect"
+        return archive.lookup(rest)
+
+    def send_index(self, head):
+        links = "".join(f'<li><a href="/{name}/">{name}</a></li>' for name in sorted(self.mounts))
+        body = f"<html><body><h1>Scoreboards</h1><ul>{links}</ul></body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def serve(self, head=False):
+        path = unquote(urlparse(self.path).path)
+        if path == "/" and "" not in self.mounts:
+            return self.send_index(head)
+        member = self.resolve(path)
+        if member == "redirect":
+            self.send_response(301)
+            self.send_header("Location", path + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if member is None:
+            self.send_error(404)
+            return
+
+        gzip_ok = member.deflated and "gzip" in self.headers.get("Accept-Encoding", "")
+        etag = member.etag[:-1] + '-gz"' if gzip_ok else member.etag
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        key = (member.archive.path, member.name, gzip_ok)
+        body = self.cache.get(key)
+        if body is None:
+            body = member.gzipped() if gzip_ok else member.plain()
+            self.cache.put(key, body)
+
+        self.send_response(200)
+        content_type = member.content_type
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        self.send_header("Content-Type", content_type)
+        if gzip_ok:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(member.mtime, usegmt=True))
+        self.send_header("Cache-Control", "public, max-age=60")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.serve()
+
+    def do_HEAD(self):
+        self.serve(head=True)
+
+
+def build_server(specs, port=PORT, cache_mb=CACHE_MB, host="0.0.0.0"):
+    """specs are "path.zip" or "prefix=path.zip"; one plain path is mounted at /."""
+    mounts = {}
+    for spec in specs:
+        prefix, _, path = spec.rpartition("=") if "=" in spec else ("", "", spec)
+        if not prefix and len(specs) > 1:
+            prefix = mount_name(path)
+        if prefix in mounts:
+            raise ValueError(f"Two archives would be mounted at /{prefix}/")
+        mounts[prefix] = Archive(path)
+    handler = type("Handler", (ScoreboardHandler,), {"mounts": mounts, "cache": LRU(cache_mb * 1024 * 1024)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve one or more scoreboard zips without extracting them.")
+    parser.add_argument("zips", nargs="+", help="Zip files, optionally as prefix=file.zip")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Default: {PORT}")
+    parser.add_argument("--cache-mb", type=int, default=CACHE_MB, help=f"In-memory cache size. Default: {CACHE_MB}")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = build_server(args.zips, args.port, args.cache_mb)
+    mounts = server.RequestHandlerClass.mounts
+    for prefix, archive in sorted(mounts.items()):
+        print(f"📦 /{prefix + '/' if prefix else ''} → {archive.path} ({len(archive.members)} files)")
+    print(f"🚀 Serving on http://localhost:{args.port} ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        print("✅ Done. Goodbye!")
@@ -1,12 +1,22 @@
+import argparse
 import json
 import os
 import random
 import string
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
+from urllib.parse import urlparse
 
-import requests
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.domjudge_client import DomjudgeClient  # noqa: E402
+from id_allocator import IdAllocator
+from ingest import RowIndex, iter_sheet_users, iter_tsv_users
+
 print("Init...")
 
 # Load environment variables
@@ -20,72 +30,149 @@ DOMJUDGE_PASSWORD = os.environ["DOMJUDGE_PASSWORD"]
 CONTEST_BASE_DIR = os.environ["CONTEST_BASE_DIR"]
 CONTEST_STATE_NAME = os.environ["CONTEST_STATE_NAME"]
 
+# Concurrency knobs, overridable with --workers / --rate-limit
+MAX_WORKERS = int(os.environ.get("DOMJUDGE_MAX_WORKERS", 8))
+RATE_LIMIT = float(os.environ.get("DOMJUDGE_RATE_LIMIT", 0))  # requests/second per host, 0 = unlimited
+BULK_CHUNK_SIZE = int(os.environ.get("DOMJUDGE_BULK_CHUNK_SIZE", 500))
+
 DRY = False
 
-# Prepare session with Basic Auth for API calls
-session = requests.Session()
-session.auth = (DOMJUDGE_USERNAME, DOMJUDGE_PASSWORD)
+# Prepare session with Basic Auth for API calls. Lists are cached for a minute; any
+# POST we make marks them stale, so a run never trusts a list from before its own writes.
+# GETs are retried on 5xx/timeouts; POSTs only when they never reached the server.
+session = DomjudgeClient(API_BASE, DOMJUDGE_USERNAME, DOMJUDGE_PASSWORD,
+                         ttls={"teams": 60, "users": 60, "organizations": 60})
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host so that at most `rate` start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def acquire(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = HostRateLimiter(RATE_LIMIT)
+
+
+def configure_session(max_workers, rate_limit):
+    """Size the connection pool for the worker count and install the rate limiter."""
+    global rate_limiter
+    session.resize_pool(max_workers)
+    rate_limiter = HostRateLimiter(rate_limit)
+
+
+def api_get(url, **kwargs):
+    rate_limiter.acquire(url)
+    return session.get(url, **kwargs)
+
+
+def api_post(url, **kwargs):
+    rate_limiter.acquire(url)
+    return session.post(url, **kwargs)
+
+
+class ProvisionJournal:
+    """Append-only JSONL log of completed operations, fsync'd after every line.
+
+    Record types:
+      init  - server state (unis, ids, usernames, team names) seen by the first run
+      plan  - ID, username and password drawn for a team, written before its POST
+      org / team / user - an organization, team or user the server confirmed
+
+    Replaying it gives back everything a crashed run knew, including the
+    generated passwords, without listing teams and users on the server again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self.init = None
+        self.plans = {}
+        self.orgs = {}
+        self.teams = {}
+        self.users = {}
+
+    def replay(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last line can be torn by a crash mid-write
+                    continue
+                op = record.pop("op")
+                if op == "init":
+                    self.init = record
+                elif op == "plan":
+                    self.plans[record["team"]] = record
+                elif op == "org":
+                    self.orgs[record["uni"]] = record["id"]
+                elif op == "team":
+                    self.teams[record["team"]] = record["id"]
+                elif op == "user":
+                    self.users[record["team"]] = record["user"]
+        return self.init is not None
+
+    def rotate(self):
+        """Move a previous run's journal aside instead of overwriting its passwords."""
+        if os.path.exists(self.path):
+            backup_path = f"{self.path}.{int(time.time())}"
+            os.replace(self.path, backup_path)
+            print(f"📦 Moved previous journal to '{backup_path}'")
+
+    def record(self, op, **fields):
+        self.record_many([dict(op=op, **fields)])
+
+    def record_many(self, records):
+        if not records:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf8")
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+journal = ProvisionJournal(f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_provision_journal.jsonl")
 
 
 # Function to download and parse sheet
 def get_sheet_users(sheet_id):
-    url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
-    print(f"📄 Downloading sheet data from {url}")
-    resp = requests.get(url)
-    resp.raise_for_status()
-
-    users_data = resp.content.decode()
-    # Save raw sheet data for inspection
-    sheet_raw_path = f"{CONTEST_BASE_DIR}/sheet_raw.csv"
-    with open(sheet_raw_path, "w", encoding="utf-8") as raw_file:
-        raw_file.write(users_data)
-    print(f"💾 Saved raw sheet data to '{sheet_raw_path}' for review")
-
-    lines = users_data.splitlines()[2:]
-    print(f"🧮 Retrieved {len(lines)} records from sheet")
-    users = []
-    for idx, line in enumerate(lines, start=1):
-        if not line.strip():
-            continue
-        parts = line.split(",")
-        if len(parts) < 9:
-            print(f"⚠️ Skipping malformed line #{idx}: {line}")
-            continue
-        # ts, email, team, uni, count, user_name, extra1, extra2, phone
-        ts, email, team, uni, count, name1, name2, name3, phone = parts[:9]
-        names = ", ".join(
-            name.strip() for name in [name1, name2, name3] if name.strip()
-        )
-        users.append(
-            {
-                "team": team.strip(),
-                "uni": uni.strip(),
-                "email": email.strip(),
-                "names": names,
-                "phone": phone.strip(),
-            }
-        )
-        print(
-            f"  • [{idx}] Parsed row: team='{team}', email='{email}', phone='{phone}'"
-        )
+    index = RowIndex()
+    users = list(iter_sheet_users(sheet_id, f"{CONTEST_BASE_DIR}/sheet_raw.csv", index))
+    print(f"🧮 Retrieved {len(users)} records from sheet ({index.summary()})")
     return users
 
 
 def get_users_from_source(source_type, source_path) -> List[Dict]:
     users = []
     if source_type == "tsv":
-        with open(source_path, encoding="utf8") as f:
-            f.readline()
-            for l in f.readlines():
-                team_name, username, password, uni = [item.strip() for item in l.split("\t")]
-                users.append(
-                    {
-                        "team": team_name,
-                        "username": username,
-                        "password": password,
-                        "uni": uni,
-                    }
-                )
+        index = RowIndex()
+        users = list(iter_tsv_users(source_path, index))
+        print(f"🧮 Read {len(users)} records from '{source_path}' ({index.summary()})")
     return users
 
 
@@ -93,7 +180,7 @@ def get_users_from_source(source_type, source_path) -> List[Dict]:
 def get_existing_unis_and_ids():
     url = f"{API_BASE}/api/v4/contests/{CONTEST_ID}/organizations"
     print(f"🔍 Fetching existing unis from {url}")
-    resp = session.get(url)
+    resp = api_get(url)
     resp.raise_for_status()
     unis = resp.json()
     print(f"🧮 Found {len(unis)} existing unis")
@@ -104,7 +191,7 @@ def get_existing_unis_and_ids():
 def get_existing_teams_and_ids():
     url = f"{API_BASE}/api/v4/contests/{CONTEST_ID}/teams"
     print(f"🔍 Fetching existing teams from {url}")
-    resp = session.get(url)
+    resp = api_get(url)
     resp.raise_for_status()
     teams = resp.json()
     print(f"🧮 Found {len(teams)} existing teams")
@@ -115,175 +202,444 @@ def get_existing_teams_and_ids():
 def get_existing_users_and_ids():
     url = f"{API_BASE}/api/v4/users"
     print(f"🔍 Fetching existing users from {url}")
-    resp = session.get(url)
+    resp = api_get(url)
     resp.raise_for_status()
     users = resp.json()
     print(f"🧮 Found {len(users)} existing users")
     return {u["username"]: u["id"] for u in users}
 
 
-# Helper to generate unique numeric ID
-def generate_unique_id(existing_ids, lower=10000, upper=99999):
-    while True:
-        new_id = random.randint(lower, upper)
-        if new_id not in existing_ids:
-            existing_ids.add(new_id)
-            return new_id
-
-
-def create_or_ignore_uni(entry):
+def create_or_ignore_uni(entry, log=print):
     if entry["uni"] in existing_uni_names:
-        print(f"Skipping uni: {entry['uni']}")
+        log(f"Skipping uni: {entry['uni']}")
         return existing_unis[entry["uni"]]
     
     # Create uni
-    affiliation_payload = {
-        "id": entry["uni"],
-        "shortname": entry["uni"],
-        "name": entry["uni"],
-        "formal_name": entry["uni"],
-        "country": "IRN",
-    }
-    print(
+    affiliation_payload = build_uni_payload(entry["uni"])
+    log(
         f"🚀 Creating uni '{entry['uni']}'"
     )
     if DRY:
-        print("Skipped do to dry")
+        log("Skipped do to dry")
         return
-    uni_resp = session.post(
+    uni_resp = api_post(
         f"{API_BASE}/api/v4/contests/{CONTEST_ID}/organizations",
         json=affiliation_payload,
     )
     if uni_resp.status_code != 201:
-        print(
+        log(
             f"❌ Failed team '{entry['uni']}': {uni_resp.status_code} - {uni_resp.text}"
         )
         return
     university_id = uni_resp.json()["id"]
     existing_unis[entry["uni"]] = university_id
     existing_uni_names.add(entry["uni"])
-    print(f"✅ University '{entry['uni']}' created with ID {unique_id}")
+    journal.record("org", uni=entry["uni"], id=university_id)
+    log(f"✅ University '{entry['uni']}' created with ID {university_id}")
     return university_id
 
 
-if __name__ == "__main__":
-    # Main script
-    sheet_users = get_users_from_source("tsv", f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_credentials.tsv")
-    existing_unis = get_existing_unis_and_ids()
-    existing_teams = get_existing_teams_and_ids()
-    existing_users = get_existing_users_and_ids()
-
-    # Prepare uniqueness sets
-    existing_uni_names = set(existing_unis.keys())
-    existing_team_names = set(existing_teams.keys())
-    existing_ids = set(existing_teams.values()) | set(existing_users.values())
-    existing_usernames = set(existing_users.keys())
+def build_uni_payload(uni):
+    return {
+        "id": uni,
+        "shortname": uni,
+        "name": uni,
+        "formal_name": uni,
+        "country": "IRN",
+    }
 
-    # Determine which teams to create
-    total_rows = len(sheet_users)
-    to_create = [u for u in sheet_users if u["team"] not in existing_team_names]
-    print(f"⏳ {len(to_create)} new teams to create out of {total_rows} sheet rows")
 
-    # Save preview file
-    teams_to_create_path = f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_teams_to_create.json"
-    with open(teams_to_create_path, "w", encoding="utf8") as f:
-        json.dump(to_create, f, indent=2, ensure_ascii=False)
-    print(f"💾 Written {teams_to_create_path}. Verify before proceeding.")
+def build_team_payload(entry, unique_id):
+    return {
+        "id": unique_id,
+        "name": entry["team"],
+        "display_name": entry["team"],
+        "description": f"{entry.get('names', '')} | {entry.get('phone', '')}",
+        "organization_id": entry["uni"],
+        "group_ids": ["3"],
+    }
 
-    confirm = input(
-        f"Check '{teams_to_create_path}': found {len(to_create)} non-existing teams. Create them and users? (y/n): "
-    )
-    if confirm.lower() != "y":
-        print("❌ Aborting.")
-        exit(0)
 
-    # Accumulate created user info for emailing later
-    created_users = []
+def build_user_payload(entry, unique_id, rand_user, rand_pass, team_id):
+    return {
+        "id": unique_id,
+        "username": rand_user,
+        "name": entry["team"],
+        "email": entry.get("email"),
+        "password": rand_pass,
+        "enabled": True,
+        "team_id": team_id,
+        "roles": ["team"],
+    }
 
-    # Create teams and corresponding users
-    for idx, entry in enumerate(to_create, start=1):
-        # Generate a single unique numeric ID
-        unique_id = generate_unique_id(existing_ids)
-        # Derive username from the same ID
-        if entry.get("username"):
-            rand_user = entry.get("username")
-        else:
-            rand_user = f"T{unique_id}"
 
-        # Ensure username uniqueness
-        if rand_user in existing_usernames:
-            rand_user = f"T{unique_id}{idx}"
-        existing_usernames.add(rand_user)
+def created_user_record(entry, user_id, rand_user, rand_pass):
+    return {
+        "team": entry["team"],
+        "uni": entry.get("uni"),
+        "id": user_id,
+        "username": rand_user,
+        "names": entry.get("names"),
+        "email": entry.get("email"),
+        "phone": entry.get("phone"),
+        "password": rand_pass,
+    }
 
-        # Generate random password
-        if entry.get("password"):
-            rand_pass = entry.get("password")
-        else:
-            rand_pass = "".join(random.choices(string.ascii_letters + string.digits, k=10))
 
-        university_id = create_or_ignore_uni(entry)
+def find_existing(url):
+    """Return the JSON object at `url`, or None if the server does not have it."""
+    resp = api_get(url)
+    return resp.json() if resp.status_code == 200 else None
+
+
+def provision_entry(idx, total, entry, unique_id, rand_user, rand_pass, uni_turn, uni_done):
+    """Create org -> team -> user for one entry.
+
+    Runs on a worker thread. Log lines are buffered and returned so the main
+    thread can print them in sheet order. `uni_turn` is set once the previous
+    entry of the same university finished its uni step (None for the first),
+    which keeps org creation identical to a sequential run: the first entry
+    creates it, the rest skip it, and a failed creation is retried by the next.
+
+    Steps already in the journal are skipped. A planned entry with no team or
+    user line was in flight when the previous run died and may have reached
+    the server, so it is looked up by ID before being POSTed again.
+    """
+    lines = []
+    log = lines.append
+    planned_before = entry["team"] in journal.plans
+
+    team_id = journal.teams.get(entry["team"])
+    if team_id is None and planned_before:
+        existing_team = find_existing(f"{API_BASE}/api/v4/contests/{CONTEST_ID}/teams/{unique_id}")
+        if existing_team is not None:
+            team_id = existing_team["id"]
+            journal.record("team", team=entry["team"], id=team_id)
+
+    if team_id is not None:
+        uni_done.set()
+        log(f"⏭️ [{idx}/{total}] Team '{entry['team']}' already created with ID {team_id}")
+    else:
+        if uni_turn is not None:
+            uni_turn.wait()
+        try:
+            university_id = create_or_ignore_uni(entry, log)
+        finally:
+            uni_done.set()
         if university_id is None:
-            continue
+            return lines, None
 
         # Create team with shared ID and description as name and phone
-        team_payload = {
-            "id": unique_id,
-            "name": entry["team"],
-            "display_name": entry["team"],
-            "description": f"{entry.get('names', '')} | {entry.get('phone', '')}",
-            "organization_id": entry["uni"],
-            "group_ids": ["3"],
-        }
-        print(
-            f"🚀 [{idx}/{len(to_create)}] Creating team '{entry['team']}' with ID {unique_id}"
+        team_payload = build_team_payload(entry, unique_id)
+        log(
+            f"🚀 [{idx}/{total}] Creating team '{entry['team']}' with ID {unique_id}"
         )
         if DRY:
-            print("Skipped do to dry")
-            continue
-        team_resp = session.post(
+            log("Skipped do to dry")
+            return lines, None
+        if not planned_before:
+            journal.record_many([plan_record(entry, unique_id, rand_user, rand_pass)])
+        team_resp = api_post(
             f"{API_BASE}/api/v4/contests/{CONTEST_ID}/teams", json=team_payload
         )
         if team_resp.status_code != 201:
-            print(
+            log(
                 f"❌ Failed team '{entry['team']}': {team_resp.status_code} - {team_resp.text}"
             )
-            continue
+            return lines, None
         team_id = team_resp.json()["id"]
-        print(f"✅ Team '{entry['team']}' created with ID {unique_id}")
-
-        # Create user with same ID and email
-        user_payload = {
-            "id": unique_id,
-            "username": rand_user,
-            "name": entry["team"],
-            "email": entry.get("email"),
-            "password": rand_pass,
-            "enabled": True,
-            "team_id": team_id,
-            "roles": ["team"],
-        }
-        print(f"👤 Creating user '{rand_user}' with ID {unique_id} for team ID {unique_id}")
-        if DRY:
+        journal.record("team", team=entry["team"], id=team_id)
+        log(f"✅ Team '{entry['team']}' created with ID {unique_id}")
+
+    if planned_before:
+        existing_user = find_existing(f"{API_BASE}/api/v4/users/{unique_id}")
+        if existing_user is not None:
+            created_user = created_user_record(entry, existing_user["id"], rand_user, rand_pass)
+            journal.record("user", team=entry["team"], user=created_user)
+            log(f"⏭️ User '{rand_user}' already created")
+            return lines, created_user
+
+    # Create user with same ID and email
+    user_payload = build_user_payload(entry, unique_id, rand_user, rand_pass, team_id)
+    log(f"👤 Creating user '{rand_user}' with ID {unique_id} for team ID {unique_id}")
+    user_resp = api_post(f"{API_BASE}/api/v4/users", json=user_payload)
+    if user_resp.status_code != 201:
+        log(
+            f"❌ Failed user '{rand_user}': {user_resp.status_code} - {user_resp.text}"
+        )
+        return lines, None
+    created_user = created_user_record(entry, user_resp.json()["id"], rand_user, rand_pass)
+    journal.record("user", team=entry["team"], user=created_user)
+    log(f"✅ User '{rand_user}' created with password '{rand_pass}'")
+    return lines, created_user
+
+
+def plan_credentials(to_create):
+    """Draw ID, username and password for every entry, in sheet order.
+
+    This stays on the main thread so the values come out the same whichever
+    mode or worker count is used afterwards.
+    """
+    plans = []
+    for idx, entry in enumerate(to_create, start=1):
+        planned = journal.plans.get(entry["team"])
+        if planned is not None:
+            plans.append((idx, entry, planned["id"], planned["username"], planned["password"]))
             continue
-        user_resp = session.post(f"{API_BASE}/api/v4/users", json=user_payload)
-        if user_resp.status_code == 201:
-            print(f"✅ User '{rand_user}' created with password '{rand_pass}'")
-            created_users.append(
-                {
-                    "team": entry["team"],
-                    "id": user_resp.json()["id"],
-                    "username": rand_user,
-                    "names": entry.get("names"),
-                    "email": entry.get("email"),
-                    "phone": entry.get("phone"),
-                    "password": rand_pass,
-                }
+
+        # A T<id> username from rand_pass.py keeps its ID; anything else gets the next one
+        rand_user = entry.get("username")
+        unique_id = allocator.claim(rand_user) if rand_user else None
+        if unique_id is None:
+            unique_id = allocator.allocate()
+        if not rand_user or rand_user in existing_usernames:
+            rand_user = f"T{unique_id}"
+        existing_usernames.add(rand_user)
+
+        # Generate random password
+        if entry.get("password"):
+            rand_pass = entry.get("password")
+        else:
+            rand_pass = "".join(random.choices(string.ascii_letters + string.digits, k=10))
+
+        plans.append((idx, entry, unique_id, rand_user, rand_pass))
+    return plans
+
+
+def plan_record(entry, unique_id, rand_user, rand_pass):
+    return {"op": "plan", "team": entry["team"], "id": unique_id, "username": rand_user, "password": rand_pass}
+
+
+def provision_concurrently(plans, workers):
+    created_users = []
+    uni_gates = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for idx, entry, unique_id, rand_user, rand_pass in plans:
+            if entry["team"] in journal.users:
+                futures.append(None)
+                continue
+            uni_turn = uni_gates.get(entry["uni"])
+            uni_done = uni_gates[entry["uni"]] = threading.Event()
+            futures.append(
+                executor.submit(
+                    provision_entry, idx, len(plans), entry,
+                    unique_id, rand_user, rand_pass, uni_turn, uni_done,
+                )
             )
+
+        # Print and collect in submission order while later entries are still in flight
+        for (idx, entry, _, rand_user, _), future in zip(plans, futures):
+            if future is None:
+                print(f"⏭️ [{idx}/{len(plans)}] Team '{entry['team']}' and user '{rand_user}' already created")
+                created_users.append(journal.users[entry["team"]])
+                continue
+            lines, created_user = future.result()
+            for line in lines:
+                print(line)
+            if created_user is not None:
+                created_users.append(created_user)
+    return created_users
+
+
+def bulk_import(kind, records, chunk_size):
+    """Upload `records` to /api/v4/users/{kind} as JSON files of `chunk_size` records.
+
+    Returns the number of records in chunks the server rejected.
+    """
+    import_path = f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_bulk_{kind}.json"
+    with open(import_path, "w", encoding="utf8") as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    print(f"💾 Written {import_path} ({len(records)} {kind})")
+    if DRY:
+        print("Skipped do to dry")
+        return 0
+
+    url = f"{API_BASE}/api/v4/users/{kind}"
+    rejected = 0
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        body = json.dumps(chunk, ensure_ascii=False).encode("utf-8")
+        resp = api_post(url, files={"json": (f"{kind}.json", body, "application/json")})
+        label = f"{kind} {start + 1}-{start + len(chunk)}/{len(records)}"
+        if resp.status_code in (200, 201):
+            print(f"📦 Imported {label}: {resp.text.strip()}")
         else:
-            print(
-                f"❌ Failed user '{rand_user}': {user_resp.status_code} - {user_resp.text}"
+            rejected += len(chunk)
+            print(f"❌ Failed importing {label}: {resp.status_code} - {resp.text}")
+    return rejected
+
+
+def provision_bulk(plans, chunk_size):
+    """Create everything through the import endpoints, then reconcile with the server.
+
+    The import endpoints only answer with a summary message, so what was
+    actually created is found by listing teams and users once afterwards.
+    """
+    new_unis = []
+    for _, entry, _, _, _ in plans:
+        if entry["uni"] not in existing_uni_names and entry["uni"] not in new_unis:
+            new_unis.append(entry["uni"])
+
+    if not DRY:
+        journal.record_many(
+            [plan_record(entry, unique_id, rand_user, rand_pass)
+             for _, entry, unique_id, rand_user, rand_pass in plans
+             if entry["team"] not in journal.plans]
+        )
+    bulk_import("organizations", [build_uni_payload(uni) for uni in new_unis], chunk_size)
+    bulk_import(
+        "teams",
+        [build_team_payload(entry, unique_id) for _, entry, unique_id, _, _ in plans
+         if entry["team"] not in journal.teams],
+        chunk_size,
+    )
+    accounts = []
+    for _, entry, unique_id, rand_user, rand_pass in plans:
+        if entry["team"] in journal.users:
+            continue
+        account = build_user_payload(entry, unique_id, rand_user, rand_pass, unique_id)
+        account["type"] = "team"
+        accounts.append(account)
+    bulk_import("accounts", accounts, chunk_size)
+    if DRY:
+        return []
+
+    print("🔁 Reconciling with server state...")
+    server_unis = get_existing_unis_and_ids()
+    server_teams = get_existing_teams_and_ids()
+    server_users = get_existing_users_and_ids()
+
+    created_users = []
+    missing = []
+    confirmed = []
+    for uni in new_unis:
+        if uni not in server_unis:
+            print(f"❌ Missing uni after import: '{uni}'")
+        else:
+            confirmed.append({"op": "org", "uni": uni, "id": server_unis[uni]})
+    for idx, entry, unique_id, rand_user, rand_pass in plans:
+        if entry["team"] in journal.users:
+            created_users.append(journal.users[entry["team"]])
+        elif entry["team"] not in server_teams:
+            missing.append({"team": entry["team"], "username": rand_user, "reason": "team not created"})
+            print(f"❌ [{idx}/{len(plans)}] Missing team after import: '{entry['team']}'")
+        elif rand_user not in server_users:
+            missing.append({"team": entry["team"], "username": rand_user, "reason": "user not created"})
+            print(f"❌ [{idx}/{len(plans)}] Missing user after import: '{rand_user}'")
+        else:
+            created_user = created_user_record(entry, server_users[rand_user], rand_user, rand_pass)
+            created_users.append(created_user)
+            if entry["team"] not in journal.teams:
+                confirmed.append({"op": "team", "team": entry["team"], "id": server_teams[entry["team"]]})
+            confirmed.append({"op": "user", "team": entry["team"], "user": created_user})
+    journal.record_many(confirmed)
+    print(f"✅ {len(created_users)}/{len(plans)} teams and users confirmed on the server")
+
+    if missing:
+        missing_path = f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_bulk_missing.json"
+        with open(missing_path, "w", encoding="utf8") as f:
+            json.dump(missing, f, indent=2, ensure_ascii=False)
+        print(f"💾 Written {missing_path} with {len(missing)} entries to re-run.")
+    return created_users
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create DOMjudge organizations, teams and users.")
+    parser.add_argument(
+        "--workers", type=int, default=MAX_WORKERS,
+        help="Entries provisioned in parallel (1 = sequential). Default: $DOMJUDGE_MAX_WORKERS or 8",
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=RATE_LIMIT,
+        help="Max requests per second to the DOMjudge host, 0 = unlimited. Default: $DOMJUDGE_RATE_LIMIT or 0",
+    )
+    parser.add_argument(
+        "--bulk", action="store_true",
+        help="Use DOMjudge's import endpoints (/api/v4/users/...) instead of one POST per entity",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=BULK_CHUNK_SIZE,
+        help="Records per import request in --bulk mode. Default: $DOMJUDGE_BULK_CHUNK_SIZE or 500",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue an interrupted run from its journal instead of listing teams and users again",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_session(args.workers, args.rate_limit)
+
+    # Main script
+    sheet_users = get_users_from_source("tsv", f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_credentials.tsv")
+
+    if args.resume and journal.replay():
+        # Server state as the interrupted run saw it, plus what it created since
+        print(
+            f"📒 Resuming from '{journal.path}': {len(journal.teams)} teams and "
+            f"{len(journal.users)} users already created"
+        )
+        existing_unis = {**journal.init["unis"], **journal.orgs}
+        existing_team_names = set(journal.init["team_names"])
+        existing_ids = set(journal.init["ids"]) | {p["id"] for p in journal.plans.values()}
+        existing_usernames = set(journal.init["usernames"]) | {p["username"] for p in journal.plans.values()}
+        existing_uni_names = set(existing_unis.keys())
+    else:
+        if args.resume:
+            print(f"⚠️ No journal at '{journal.path}', starting a fresh run")
+        existing_unis = get_existing_unis_and_ids()
+        existing_teams = get_existing_teams_and_ids()
+        existing_users = get_existing_users_and_ids()
+
+        # Prepare uniqueness sets
+        existing_uni_names = set(existing_unis.keys())
+        existing_team_names = set(existing_teams.keys())
+        existing_ids = set(existing_teams.values()) | set(existing_users.values())
+        existing_usernames = set(existing_users.keys())
+
+        if not DRY:
+            journal.rotate()
+            journal.record(
+                "init",
+                unis=existing_unis,
+                team_names=list(existing_team_names),
+                ids=list(existing_ids),
+                usernames=list(existing_usernames),
             )
 
+    # Determine which teams to create
+    total_rows = len(sheet_users)
+    to_create = [u for u in sheet_users if u["team"] not in existing_team_names]
+    print(f"⏳ {len(to_create)} new teams to create out of {total_rows} sheet rows")
+
+    # Save preview file
+    teams_to_create_path = f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_teams_to_create.json"
+    with open(teams_to_create_path, "w", encoding="utf8") as f:
+        json.dump(to_create, f, indent=2, ensure_ascii=False)
+    print(f"💾 Written {teams_to_create_path}. Verify before proceeding.")
+
+    confirm = input(
+        f"Check '{teams_to_create_path}': found {len(to_create)} non-existing teams. Create them and users? (y/n): "
+    )
+    if confirm.lower() != "y":
+        print("❌ Aborting.")
+        exit(0)
+
+    allocator = IdAllocator.load(f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_id_allocator.json", CONTEST_STATE_NAME)
+    allocator.reserve(existing_ids)
+    allocator.reserve(existing_usernames)
+    plans = plan_credentials(to_create)
+    if not DRY:
+        allocator.save()
+    if args.bulk:
+        created_users = provision_bulk(plans, args.chunk_size)
+    else:
+        created_users = provision_concurrently(plans, args.workers)
+    journal.close()
+
     # Save created user info for emailing
     created_users_path = f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_created_users.json"
 
@@ -1,16 +1,22 @@
+import argparse
+import json
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.domjudge_client import DomjudgeClient  # noqa: E402
+
 load_dotenv()
 
 BASE_URL = os.environ["DOMJUDGE_API_BASE"]
-PHPSESSID = os.environ["PHPSESSID"]
+MAX_WORKERS = int(os.environ.get("DOMJUDGE_MAX_WORKERS", 8))
 
-cookies = {
-    "PHPSESSID": PHPSESSID,
-}
+# Users with any of these roles are never deleted (admin, judgehosts, jury accounts)
+PROTECTED_ROLES = {"admin", "jury", "judgehost", "api_reader", "api_writer", "api_source_reader", "balloon"}
 
 headers = {
     "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36",
@@ -20,41 +26,126 @@ params = {
     "_": "1743686975009",
 }
 
-users_start, users_end = 4, 300
-teams_start, teams_end = 4, 300
-unis_start, unis_end = 1000, 1000
+# No TTLs: lists are always revalidated, the cache only saves the body on a 304.
+# The jury delete pages log in with DOMJUDGE_USERNAME/PASSWORD (or use a pasted PHPSESSID).
+session = DomjudgeClient.from_env()
+session.headers.update(headers)
 
-for i in range(users_start, users_end):
-    url = f"{BASE_URL}/jury/users/{i}/delete"
-    response = requests.post(
-        url,
-        params=params,
-        cookies=cookies,
-        headers=headers,
-    )
-    print(f"User {i}/{users_end} deleted.", end="\r")
-print("All Users have been Deleted")
 
-for i in range(teams_start, teams_end):
-    url = f"{BASE_URL}/jury/teams/{i}/delete"
-    response = requests.post(
-        url,
-        params=params,
-        cookies=cookies,
-        headers=headers,
-    )
-    print(f"Team {i}/{teams_end} deleted.", end="\r")
+def list_api(path):
+    print(f"🔍 Fetching {BASE_URL}/api/v4/{path}")
+    return session.api(path)
+
+
+def plan_deletions(group_ids):
+    """Work out exactly which users, teams and affiliations exist and should go.
 
-print("All Teams have been Deleted")
+    Teams are those in `group_ids` (the participants category create_teams.py
+    uses); users are team accounts (role "team", none of the protected roles)
+    whose team is one of those, so jury and staff accounts are never touched
+    even if their role isn't listed in PROTECTED_ROLES; affiliations are the
+    ones a deleted team uses and no remaining team points to. IDs are the
+    ones the jury pages use, which is what the API returns with DOMjudge's
+    default local data source.
+    """
+    users = list_api("users")
+    teams = list_api("teams")
+    organizations = list_api("organizations")
 
-for i in range(unis_start, unis_end):
-    url = f"{BASE_URL}/jury/affiliations/{i}/delete"
-    response = requests.post(
+    doomed_teams = [t for t in teams if set(map(str, t.get("group_ids") or [])) & group_ids]
+    doomed_team_ids = {str(t["id"]) for t in doomed_teams}
+    doomed_users = [
+        u for u in users
+        if "team" in (u.get("roles") or []) and not set(u.get("roles") or []) & PROTECTED_ROLES
+        and u.get("team_id") is not None and str(u["team_id"]) in doomed_team_ids
+    ]
+    kept_orgs = {str(t.get("organization_id")) for t in teams if str(t["id"]) not in doomed_team_ids}
+    doomed_team_orgs = {str(t.get("organization_id")) for t in doomed_teams}
+    doomed_orgs = [o for o in organizations if str(o["id"]) in doomed_team_orgs - kept_orgs]
+
+    return [
+        ("users", [(str(u["id"]), u.get("username")) for u in doomed_users]),
+        ("teams", [(str(t["id"]), t.get("name")) for t in doomed_teams]),
+        ("affiliations", [(str(o["id"]), o.get("name")) for o in doomed_orgs]),
+    ]
+
+
+def delete_one(kind, entity_id):
+    url = f"{BASE_URL}/jury/{kind}/{entity_id}/delete"
+    # Deleting twice is harmless, so a failed attempt may be retried like a GET
+    response = session.post(
         url,
         params=params,
-        cookies=cookies,
-        headers=headers,
+        retry=True,
     )
-    print(f"University {i}/{unis_end} deleted.", end="\r")
+    if response.url.rstrip("/").endswith("/login"):
+        return False, "not logged in (redirected to login)"
+    if response.status_code >= 400:
+        return False, f"HTTP {response.status_code}"
+    return True, None
+
+
+def delete_all(kind, entities, workers):
+    """Delete one entity type in parallel; returns the (id, name, reason) failures."""
+    failures = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(delete_one, kind, entity_id): (entity_id, name) for entity_id, name in entities}
+        for future in as_completed(futures):
+            entity_id, name = futures[future]
+            try:
+                ok, reason = future.result()
+            except requests.RequestException as e:
+                ok, reason = False, str(e)
+            if not ok:
+                failures.append((entity_id, name, reason))
+            done += 1
+            print(f"{kind.capitalize()} {done}/{len(entities)} deleted.", end="\r")
+    print()
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Delete all participant users, teams and affiliations.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be deleted")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Parallel delete requests. Default: $DOMJUDGE_MAX_WORKERS or 8")
+    parser.add_argument("--group-ids", default="3",
+                        help="Comma separated team category IDs whose teams are deleted. Default: 3")
+    parser.add_argument("--report", help="Also write the summary as JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    session.resize_pool(args.workers)
+
+    plan = plan_deletions(set(args.group_ids.split(",")))
+    report = {}
+    for kind, entities in plan:
+        print(f"🗑️ {len(entities)} {kind} to delete")
+        if args.dry_run:
+            for entity_id, name in entities:
+                print(f"  • {kind[:-1]} {entity_id}: {name}")
+            report[kind] = {"planned": len(entities), "deleted": 0, "failed": []}
+            continue
+        # Users before teams before affiliations: each phase finishes before the next starts
+        failures = delete_all(kind, entities, args.workers)
+        for entity_id, name, reason in failures:
+            print(f"❌ Failed {kind[:-1]} {entity_id} ({name}): {reason}")
+        print(f"All {kind.capitalize()} have been Deleted" if not failures else f"⚠️ {len(failures)} {kind} left")
+        report[kind] = {
+            "planned": len(entities),
+            "deleted": len(entities) - len(failures),
+            "failed": [{"id": i, "name": n, "reason": r} for i, n, r in failures],
+        }
 
-print("All Unis have been Deleted")
+    print("\n=== Summary ===")
+    for kind, counts in report.items():
+        print(f"{kind.capitalize()}: {counts['deleted']}/{counts['planned']} deleted, {len(counts['failed'])} failed")
+    if args.dry_run:
+        print("Dry run: nothing was deleted")
+    if args.report:
+        with open(args.report, "w", encoding="utf8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Written {args.report}")
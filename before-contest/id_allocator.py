@@ -0,0 +1,114 @@
+"""Collision-free team/user ID allocator shared by rand_pass.py and create_teams.py.
+
+IDs come from a keyed Feistel permutation of the 10000..99999 range: the n-th
+allocation is permute(n), so every value is issued at most once, in an order
+that looks random but is fixed for a given key (the contest). Only the cursor
+and the set of IDs known to be taken on the server are persisted, so
+rand_pass.py and create_teams.py continue the same sequence.
+
+    allocator = IdAllocator.load(f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_id_allocator.json", CONTEST_STATE_NAME)
+    allocator.reserve(existing_ids)      # IDs / usernames already on the server
+    unique_id = allocator.allocate()
+    allocator.save()
+"""
+import hashlib
+import json
+import os
+import re
+
+USERNAME_RE = re.compile(r"^T(\d+)$")
+
+HALF_BITS = 9  # 2 ** 18 = 262144 >= 90000 values
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+
+class IdAllocator:
+    def __init__(self, key, lower=10000, upper=99999, cursor=0, reserved=(), state_path=None):
+        self.key = key
+        self.lower = lower
+        self.size = upper - lower + 1
+        if self.size > 1 << (2 * HALF_BITS):
+            raise ValueError(f"ID range of {self.size} values does not fit in {2 * HALF_BITS} bits")
+        self.cursor = cursor
+        self.reserved = set(reserved)
+        self.state_path = state_path
+        # IDs handed out or claimed by this process; kept out of the saved state so a
+        # re-run can claim the T<id> usernames rand_pass.py wrote from the same cursor
+        self._taken = set()
+        digest = hashlib.sha256(str(key).encode("utf-8")).digest()
+        self._round_keys = [int.from_bytes(digest[4 * i:4 * i + 4], "big") for i in range(ROUNDS)]
+
+    @classmethod
+    def load(cls, state_path, key, lower=10000, upper=99999):
+        """Restore the cursor and reserved IDs saved for `key`, or start a fresh allocator."""
+        if os.path.exists(state_path):
+            with open(state_path, encoding="utf8") as f:
+                state = json.load(f)
+            if state.get("key") == str(key):
+                return cls(key, lower, upper, state["cursor"], state["reserved"], state_path)
+            print(f"⚠️ '{state_path}' belongs to '{state.get('key')}', starting a fresh allocator for '{key}'")
+        return cls(key, lower, upper, state_path=state_path)
+
+    def save(self):
+        if self.state_path is None:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump({"key": str(self.key), "cursor": self.cursor, "reserved": sorted(self.reserved)}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _round(self, value, round_key):
+        value = ((value ^ round_key) * 0x45D9F3B) & 0xFFFFFFFF
+        return (value ^ (value >> 16)) & HALF_MASK
+
+    def _permute(self, index):
+        # Balanced Feistel network on 18 bits, cycle-walked down to [0, size).
+        # Each walk step is a bijection, so this always lands in range after a
+        # few steps (about 3 on average) and never maps two indexes together.
+        value = index
+        while True:
+            left, right = value >> HALF_BITS, value & HALF_MASK
+            for round_key in self._round_keys:
+                left, right = right, left ^ self._round(right, round_key)
+            value = (left << HALF_BITS) | right
+            if value < self.size:
+                return value
+
+    @staticmethod
+    def parse(value):
+        """Return the numeric ID in 12345, "12345" or "T12345", or None."""
+        if isinstance(value, int):
+            return value
+        match = USERNAME_RE.match(str(value)) or re.match(r"^(\d+)$", str(value))
+        return int(match.group(1)) if match else None
+
+    def reserve(self, values):
+        """Mark IDs (or T<id> usernames) that exist elsewhere so they are never handed out."""
+        for value in values:
+            parsed = self.parse(value)
+            if parsed is not None and self.lower <= parsed < self.lower + self.size:
+                self.reserved.add(parsed)
+
+    def claim(self, value):
+        """Take a specific ID, e.g. the one behind a T<id> username from rand_pass.py.
+
+        Returns the ID, or None if it is out of range or already reserved.
+        """
+        parsed = self.parse(value)
+        if parsed is None or not self.lower <= parsed < self.lower + self.size:
+            return None
+        if parsed in self.reserved or parsed in self._taken:
+            return None
+        self._taken.add(parsed)
+        return parsed
+
+    def allocate(self):
+        """Return the next unused ID. Reserved values are stepped over, each at most once."""
+        while self.cursor < self.size:
+            value = self.lower + self._permute(self.cursor)
+            self.cursor += 1
+            if value not in self.reserved and value not in self._taken:
+                self._taken.add(value)
+                return value
+        raise RuntimeError(f"ID space {self.lower}..{self.lower + self.size - 1} exhausted for '{self.key}'")
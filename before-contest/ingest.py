@@ -0,0 +1,145 @@
+"""Streaming readers for the registration sheet export and the credentials TSV.
+
+Rows are parsed with the csv module as they arrive, so quoted commas and
+newlines inside team or university names are handled, and nothing holds the
+whole export in memory. Every accepted row goes through a RowIndex that
+catches duplicates and malformed rows in the same pass.
+"""
+import csv
+import io
+import os
+import sys
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import http_endpoint, metrics  # noqa: E402
+
+SHEET_FIELDS = 9  # ts, email, team, uni, count, name1, name2, name3, phone
+TSV_FIELDS = 4  # TeamName, Username, Password, UniName
+
+
+class RowIndex:
+    """Hashed indexes on team name, email and username, filled as rows arrive.
+
+    A repeated team name or username would collide on the server, so such rows
+    are rejected. A repeated email is only flagged, one person may register
+    several teams.
+    """
+
+    def __init__(self):
+        self.by_team = {}
+        self.by_email = {}
+        self.by_username = {}
+        self.duplicates = []
+        self.malformed = []
+
+    @staticmethod
+    def _key(field, value):
+        # Team names are shown as typed; usernames and emails are matched case-insensitively
+        value = value or ""
+        return value if field == "team" else value.casefold()
+
+    def flag_malformed(self, line_no, raw, reason):
+        self.malformed.append({"line": line_no, "reason": reason, "row": raw})
+        print(f"⚠️ Skipping malformed line #{line_no}: {reason}: {raw}")
+
+    def add(self, line_no, row):
+        """Index `row` and return True, or record why it is a duplicate and return False."""
+        for field, index in (("team", self.by_team), ("username", self.by_username)):
+            key = self._key(field, row.get(field))
+            if key and key in index:
+                self.duplicates.append({"line": line_no, "field": field, "value": row[field], "first_line": index[key]})
+                print(f"⚠️ Skipping duplicate {field} '{row[field]}' on line #{line_no} (first seen on line #{index[key]})")
+                return False
+
+        email = (row.get("email") or "").casefold()
+        if email and email in self.by_email:
+            self.duplicates.append({"line": line_no, "field": "email", "value": row["email"],
+                                    "first_line": self.by_email[email]})
+            print(f"⚠️ Email '{row['email']}' on line #{line_no} also used on line #{self.by_email[email]}")
+        elif email:
+            self.by_email[email] = line_no
+
+        for field, index in (("team", self.by_team), ("username", self.by_username)):
+            key = self._key(field, row.get(field))
+            if key:
+                index[key] = line_no
+        return True
+
+    def summary(self):
+        return f"{len(self.by_team)} unique teams, {len(self.duplicates)} duplicates, {len(self.malformed)} malformed rows"
+
+
+def _tee(lines, sink):
+    for line in lines:
+        sink.write(line)
+        yield line
+
+
+def iter_sheet_users(sheet_id, raw_path, index, skip_rows=2):
+    """Stream the Google Sheet CSV export, snapshotting it to `raw_path` on the way."""
+    url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
+    print(f"📄 Downloading sheet data from {url}")
+    with metrics.timed("http", http_endpoint("GET", url)) as call:
+        resp = requests.get(url, stream=True)
+        call.status = resp.status_code
+        call.bytes_in = int(resp.headers.get("Content-Length") or 0)
+    with resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        resp.raw.auto_close = False  # let TextIOWrapper see EOF instead of a closed file
+        with open(raw_path, "w", encoding="utf-8", newline="") as raw_file:
+            text = io.TextIOWrapper(resp.raw, encoding="utf-8", newline="")
+            reader = csv.reader(_tee(text, raw_file))
+            for record_no, parts in enumerate(reader, start=1):
+                if record_no <= skip_rows:
+                    continue
+                line_no = reader.line_num
+                if not any(part.strip() for part in parts):
+                    continue
+                if len(parts) < SHEET_FIELDS:
+                    index.flag_malformed(line_no, ",".join(parts), f"expected {SHEET_FIELDS} columns, got {len(parts)}")
+                    continue
+                ts, email, team, uni, count, name1, name2, name3, phone = parts[:SHEET_FIELDS]
+                names = ", ".join(
+                    name.strip() for name in [name1, name2, name3] if name.strip()
+                )
+                row = {
+                    "team": team.strip(),
+                    "uni": uni.strip(),
+                    "email": email.strip(),
+                    "names": names,
+                    "phone": phone.strip(),
+                }
+                if not row["team"]:
+                    index.flag_malformed(line_no, ",".join(parts), "empty team name")
+                    continue
+                if index.add(line_no, row):
+                    print(
+                        f"  • [{line_no}] Parsed row: team='{team}', email='{email}', phone='{phone}'"
+                    )
+                    yield row
+    print(f"💾 Saved raw sheet data to '{raw_path}' for review")
+
+
+def iter_tsv_users(path, index):
+    """Stream the `TeamName\\tUsername\\tPassword\\tUniName` credentials file written by rand_pass.py."""
+    with open(path, encoding="utf8", newline="") as f:
+        f.readline()
+        for line_no, line in enumerate(f, start=2):
+            if not line.strip():
+                continue
+            parts = [item.strip() for item in line.rstrip("\r\n").split("\t")]
+            if len(parts) != TSV_FIELDS or not parts[0]:
+                index.flag_malformed(line_no, line.rstrip("\r\n"), f"expected {TSV_FIELDS} tab separated columns")
+                continue
+            team_name, username, password, uni = parts
+            row = {
+                "team": team_name,
+                "username": username,
+                "password": password,
+                "uni": uni,
+            }
+            if index.add(line_no, row):
+                yield row
@@ -0,0 +1,158 @@
+"""Compile-once rendering of the credentials emails.
+
+Everything that is the same for every recipient is prepared a single time:
+the body templates are split into literal/field pieces, the HTML part is
+derived from the text template when no HTML file is given, and the From /
+Subject / MIME-Version headers are parsed (and the Persian subject RFC 2047
+encoded) into header objects that every EmailMessage reuses as-is. Per
+recipient only the To header and the two filled-in bodies are new.
+"""
+import csv
+import html
+import json
+import os
+import re
+import string
+from email.message import EmailMessage
+from email.policy import SMTP
+
+URL_RE = re.compile(r"(https?://[^\s<]+)")
+
+
+class CompiledBody:
+    """A str.format-style template pre-split into (literal, field, spec) pieces."""
+
+    def __init__(self, template, escape=None):
+        self.escape = escape or str
+        self.pieces = []
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if conversion:
+                raise ValueError(f"Conversions like '!{conversion}' are not supported in mail templates")
+            self.pieces.append((literal, field, spec or ""))
+        self.fields = {field for _, field, _ in self.pieces if field}
+
+    def render(self, values):
+        out = []
+        for literal, field, spec in self.pieces:
+            out.append(literal)
+            if field:
+                out.append(self.escape(format(values.get(field, ""), spec)))
+        return "".join(out)
+
+
+def text_to_html(template):
+    """Derive an RTL HTML template from the plain-text one (placeholders are kept)."""
+    pieces = []
+    for literal, field, spec, _ in string.Formatter().parse(template):
+        literal = html.escape(literal).replace("{", "{{").replace("}", "}}")
+        literal = URL_RE.sub(r'<a href="\1">\1</a>', literal).replace("\n", "<br>\n")
+        pieces.append(literal)
+        if field:
+            pieces.append("{" + field + (":" + spec if spec else "") + "}")
+    return (
+        '<html><body><div dir="rtl" style="font-family: Tahoma, sans-serif; line-height: 1.8">\n'
+        + "".join(pieces)
+        + "\n</div></body></html>\n"
+    )
+
+
+class MessageTemplate:
+    """Pre-built headers plus compiled text and HTML bodies for one site."""
+
+    def __init__(self, sender, subject, text_template, html_template=None):
+        self.text = CompiledBody(text_template)
+        self.html = CompiledBody(html_template or text_to_html(text_template), escape=html.escape)
+        # Parsed once; assigning a header object with a matching name skips re-parsing
+        self.headers = [
+            SMTP.header_factory("From", sender),
+            SMTP.header_factory("Subject", subject),
+            SMTP.header_factory("MIME-Version", "1.0"),
+        ]
+
+    def render(self, user):
+        msg = EmailMessage(policy=SMTP)
+        for header in self.headers:
+            msg[header.name] = header
+        msg["To"] = user["email"]
+        msg.set_content(self.text.render(user), cte="base64")
+        msg.add_alternative(self.html.render(user), subtype="html", cte="base64")
+        return msg
+
+
+class TemplateSet:
+    """The default template plus optional per-site overrides from a directory.
+
+    `templates_dir` may contain `default.txt` / `default.html` and
+    `<site>.txt` / `<site>.html`, where <site> is the user's "site" (or "uni")
+    value. Each file is compiled the first time it is needed, then reused.
+    """
+
+    def __init__(self, sender, subject, default_text, templates_dir=None):
+        self.sender = sender
+        self.subject = subject
+        self.templates_dir = templates_dir
+        # Site names come from the sheet: only files that really are in templates_dir can be opened
+        self._files = set(os.listdir(templates_dir)) if templates_dir and os.path.isdir(templates_dir) else set()
+        self._compiled = {}
+        self.default = self._load("default") or MessageTemplate(sender, subject, default_text)
+
+    def _read(self, name):
+        if name not in self._files:
+            return None
+        with open(os.path.join(self.templates_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    def _load(self, site):
+        if site not in self._compiled:
+            text = self._read(f"{site}.txt")
+            self._compiled[site] = (
+                MessageTemplate(self.sender, self.subject, text, self._read(f"{site}.html")) if text else None
+            )
+        return self._compiled[site]
+
+    def for_user(self, user):
+        site = user.get("site") or user.get("uni")
+        return (site and self._load(site)) or self.default
+
+    def render(self, users):
+        """Yield (user, EmailMessage) pairs lazily."""
+        for user in users:
+            yield user, self.for_user(user).render(user)
+
+
+def iter_created_users(path):
+    """Users from create_teams.py's `{CONTEST_STATE_NAME}_created_users.json`."""
+    with open(path, encoding="utf-8") as f:
+        yield from json.load(f)
+
+
+def iter_credentials_tsv(path):
+    """Users from a credentials TSV, columns picked by header name.
+
+    Emails can only be sent with an Email column, which rand_pass.py's TSV
+    doesn't have; without one this raises ValueError right away instead of
+    skipping every user.
+    """
+    f = open(path, encoding="utf8", newline="")
+    reader = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+    header = [h.strip().lower() for h in next(reader, [])]
+    if "email" not in header:
+        f.close()
+        raise ValueError(f"{path} has no Email column: add one, or send from create_teams.py's "
+                         f"created users (--source json)")
+    return _credential_rows(f, reader, header)
+
+
+def _credential_rows(f, reader, header):
+    with f:
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            record = dict(zip(header, (cell.strip() for cell in row)))
+            yield {
+                "team": record.get("teamname"),
+                "username": record.get("username"),
+                "password": record.get("password"),
+                "uni": record.get("uniname"),
+                "email": record.get("email"),
+            }
@@ -1,37 +1,115 @@
+import argparse
 import os
-import random
+import secrets
 import string
-from pprint import pprint
 
 from dotenv import load_dotenv
 
+from id_allocator import IdAllocator
+
 load_dotenv()
 
 CONTEST_BASE_DIR = os.environ.get("CONTEST_BASE_DIR", "")
 CONTEST_STATE_NAME = os.environ.get("CONTEST_STATE_NAME", "")
+PASSWORD_ALPHABET = os.environ.get("PASSWORD_ALPHABET", string.ascii_lowercase + string.digits)
+PASSWORD_LENGTH = int(os.environ.get("PASSWORD_LENGTH", 5))
+
+
+def build_translation(alphabet):
+    """Byte -> character table for bytes.translate, plus the bytes to drop.
+
+    Only the largest multiple of len(alphabet) below 256 is kept, so every
+    character is equally likely (no modulo bias).
+    """
+    if len(set(alphabet)) != len(alphabet) or not 1 < len(alphabet) <= 128:
+        raise ValueError("Alphabet needs 2-128 distinct characters")
+    if not alphabet.isascii():
+        raise ValueError("Alphabet must be ASCII")
+    limit = 256 - 256 % len(alphabet)
+    table = bytes(ord(alphabet[b % len(alphabet)]) if b < limit else 0 for b in range(256))
+    return table, bytes(range(limit, 256)), limit
+
+
+def random_chars(count, table, delete, limit):
+    """`count` characters from one urandom buffer, mapped with bytes.translate."""
+    chars = b""
+    while len(chars) < count:
+        missing = count - len(chars)
+        # Oversize the draw for the dropped bytes so one round is almost always enough
+        buffer = secrets.token_bytes(missing * 256 // limit + 64)
+        chars += buffer.translate(table, delete)
+    return chars[:count].decode("ascii")
+
+
+def generate_passwords(count, alphabet=PASSWORD_ALPHABET, length=PASSWORD_LENGTH):
+    """Return `count` distinct random passwords."""
+    if len(alphabet) ** length < count:
+        raise ValueError(f"{len(alphabet)}^{length} possible passwords cannot cover {count} teams")
+    table, delete, limit = build_translation(alphabet)
+    chars = random_chars(count * length, table, delete, limit)
+    passwords = [chars[i:i + length] for i in range(0, count * length, length)]
+
+    # Birthday collisions are rare; redraw just those slots until the batch is unique
+    seen = set()
+    duplicates = []
+    for i, password in enumerate(passwords):
+        if password in seen:
+            duplicates.append(i)
+        seen.add(password)
+    while duplicates:
+        chars = random_chars(len(duplicates) * length, table, delete, limit)
+        retry = []
+        for n, i in enumerate(duplicates):
+            password = chars[n * length:(n + 1) * length]
+            if password in seen:
+                retry.append(i)
+            else:
+                seen.add(password)
+                passwords[i] = password
+        duplicates = retry
+    return passwords
+
+
+def read_team_uni_names(path):
+    team_uni_names = []
+    with open(path, encoding="utf8") as f:
+        for l in f:
+            if not l.strip():
+                continue
+            # Real tabs, or the literal "\t" older files were written with
+            parts = l.strip().split("\t") if "\t" in l else l.strip().split(r"\t")
+            team_uni_names.append((parts[0], parts[1]))
+    return team_uni_names
+
 
-os.makedirs(CONTEST_BASE_DIR, exist_ok=True)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate usernames and passwords for every team.")
+    parser.add_argument("--alphabet", default=PASSWORD_ALPHABET,
+                        help="Password characters. Default: $PASSWORD_ALPHABET or a-z0-9")
+    parser.add_argument("--length", type=int, default=PASSWORD_LENGTH,
+                        help="Password length. Default: $PASSWORD_LENGTH or 5")
+    return parser.parse_args()
 
 
-with open(f"{CONTEST_BASE_DIR}/team_uni_names.tsv", encoding="utf8")as f:
-    team_uni_names = [l.strip().split(r"\t") for l in f.readlines() if l.strip()]
-    
-user_names = set()
-with open(f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_credentials.tsv", "w", encoding="utf8") as f:
-    f.write("TeamName\tUsername\tPassword\tUniName\n")
+if __name__ == "__main__":
+    args = parse_args()
+    os.makedirs(CONTEST_BASE_DIR, exist_ok=True)
 
-    for team_name, uni_name in team_uni_names:
-        lower = 10000
-        upper = 99999
+    team_uni_names = read_team_uni_names(f"{CONTEST_BASE_DIR}/team_uni_names.tsv")
 
-        while True:
-            user_name = random.randint(lower, upper)
-            if not user_name in user_names:
-                user_names.add(user_name)
-                break
+    # Same allocator state as create_teams.py, so the T<id> written here is the team ID it uses
+    allocator = IdAllocator.load(f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_id_allocator.json", CONTEST_STATE_NAME)
+    user_names = [allocator.allocate() for _ in team_uni_names]
+    passwords = generate_passwords(len(team_uni_names), args.alphabet, args.length)
 
-        rand_pass = "".join(
-            random.choices(string.ascii_letters + string.digits, k=5)
-        ).lower()
+    rows = ["TeamName\tUsername\tPassword\tUniName\n"]
+    rows.extend(
+        f"{team_name.strip()}\tT{user_name}\t{rand_pass}\t{uni_name.strip()}\n"
+        for (team_name, uni_name), user_name, rand_pass in zip(team_uni_names, user_names, passwords)
+    )
+    credentials_path = f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_credentials.tsv"
+    with open(credentials_path, "w", encoding="utf8") as f:
+        f.write("".join(rows))
 
-        f.write(f"{team_name.strip()}\tT{user_name}\t{rand_pass.strip()}\t{uni_name.strip()}\n")
+    allocator.save()
+    print(f"💾 Written {len(passwords)} credentials to '{credentials_path}'")
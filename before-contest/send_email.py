@@ -1,9 +1,19 @@
+import argparse
 import json
 import os
 import smtplib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from dotenv import load_dotenv
 
+from mail_templates import TemplateSet, iter_created_users, iter_credentials_tsv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import metrics  # noqa: E402
+
 # Load environment variables for SMTP
 load_dotenv()
 SENDER_EMAIL = os.environ.get("SENDER_EMAIL_ADDRESS")
@@ -14,6 +24,20 @@ if SENDER_EMAIL is None or SENDER_PASSWORD is None:
 
 SMTP_SERVER = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", 3))
+SMTP_MESSAGES_PER_MINUTE = float(os.environ.get("SMTP_MESSAGES_PER_MINUTE", 60))
+SMTP_MESSAGES_PER_CONNECTION = int(os.environ.get("SMTP_MESSAGES_PER_CONNECTION", 90))
+CONTEST_BASE_DIR = os.environ.get("CONTEST_BASE_DIR", ".")
+CONTEST_STATE_NAME = os.environ.get("CONTEST_STATE_NAME", "")
+
+# Next to the other contest state files, so a run from another directory still skips what was sent
+EMAIL_DELIVERY_LOG = os.environ.get("EMAIL_DELIVERY_LOG",
+                                    f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_email_delivery.jsonl")
+EMAIL_TEMPLATES_DIR = os.environ.get("EMAIL_TEMPLATES_DIR")
+
+# Replies that mean "try again on a fresh connection" (Gmail throttling, server shutting down)
+RECONNECT_CODES = {421, 451}
+MAX_ATTEMPTS = 4
 
 # Email body template
 BODY_TEMPLATE = """سلام بچه ها،
@@ -35,44 +59,219 @@ https://blog.bircpc.ir/
 انجمن علمی کامپیوتر دانشگاه بیرجند
 """
 
-# Function to send a single email
 
-def send_email(sender_email: str, sender_password: str, recipient: str, subject: str, body: str):
-    headers = [
-        f"From: {sender_email}",
-        f"To: {recipient}",
-        f"Subject: {subject}",
-        "Content-Type: text/plain; charset=utf-8"
-    ]
-    message = "\r\n".join(headers) + "\r\n\r\n" + body
+class RateLimiter:
+    """Spaces sends so at most `per_minute` messages start each minute, across all threads."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SMTPPool:
+    """One authenticated SMTP connection per worker thread, reused for many messages.
+
+    A connection is dropped and re-opened after `messages_per_connection`
+    messages, when the server disconnects, or when it answers 421/451 (for the
+    whole message, or a temporary 4xx for the recipient).
+    """
+
+    def __init__(self, host, port, username, password, messages_per_connection=SMTP_MESSAGES_PER_CONNECTION):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.messages_per_connection = messages_per_connection
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self.connects = 0
+
+    def _connect(self):
+        with metrics.timed("smtp", "connect"):
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+            server.ehlo()
+            if server.has_extn("starttls"):
+                server.starttls()
+                server.ehlo()
+            if server.has_extn("auth"):
+                server.login(self.username, self.password)
+        with self._lock:
+            self._connections.append(server)
+            self.connects += 1
+        self._local.server = server
+        self._local.sent = 0
+        return server
+
+    def _drop(self):
+        server = getattr(self._local, "server", None)
+        self._local.server = None
+        if server is None:
+            return
+        with self._lock:
+            if server in self._connections:
+                self._connections.remove(server)
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def send(self, sender, recipient, message: bytes):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            server = getattr(self._local, "server", None)
+            if server is not None and self._local.sent >= self.messages_per_connection:
+                self._drop()
+                server = None
+            try:
+                if server is None:
+                    server = self._connect()
+                with metrics.timed("smtp", "send") as call:
+                    call.bytes_out = len(message)
+                    server.sendmail(sender, recipient, message)
+                self._local.sent += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._drop()
+            except smtplib.SMTPRecipientsRefused as e:
+                # Per-recipient replies: 4xx (e.g. 421/451 throttling, 450 mailbox busy) is worth another try
+                if not all(400 <= code < 500 for code, _ in e.recipients.values()):
+                    raise
+                self._drop()
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code not in RECONNECT_CODES:
+                    raise
+                self._drop()
+            except OSError:
+                self._drop()
+            if attempt < MAX_ATTEMPTS:
+                metrics.retry("smtp", "send")
+                time.sleep(2 ** attempt)
+        raise smtplib.SMTPException(f"giving up on {recipient} after {MAX_ATTEMPTS} attempts")
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for server in connections:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+
+class DeliveryLog:
+    """Append-only JSONL of delivered (email, username) pairs, so re-runs only send the rest."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.delivered = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.delivered.add((record["email"], record["username"]))
+
+    def __contains__(self, user):
+        return (user["email"], user["username"]) in self.delivered
+
+    def record(self, user):
+        line = json.dumps({"email": user["email"], "username": user["username"], "sent_at": time.time()},
+                          ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.delivered.add((user["email"], user["username"]))
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.ehlo()
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.sendmail(sender_email, recipient, message.encode('utf-8'))
-        print(f"✅ Email sent to {recipient}")
 
 # Load created users info
-def load_created_users(path: str = 'created_users.json'):
-    with open(path, encoding='utf-8') as f:
-        return json.load(f)
+def load_created_users(source: str = "json", path: str = None):
+    """Stream users from create_teams.py's created-users JSON or from the credentials TSV."""
+    if source == "tsv":
+        return iter_credentials_tsv(path or f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_credentials.tsv")
+    return iter_created_users(path or f"{CONTEST_BASE_DIR}/{CONTEST_STATE_NAME}_created_users.json")
 
-if __name__ == '__main__':
-    users = load_created_users()
-    subject = "دسترسی به لیگ BCPC"
 
+def send_all(users, templates, pool_size=SMTP_POOL_SIZE, per_minute=SMTP_MESSAGES_PER_MINUTE,
+             delivery_log_path=EMAIL_DELIVERY_LOG, host=SMTP_SERVER, port=SMTP_PORT):
+    delivery_log = DeliveryLog(delivery_log_path)
+    pending = []
+    skipped = 0
     for user in users:
-        recipient = user['email']
-        username = user['username']
-        password = user['password']
-        try:
-            send_email(
-                sender_email=SENDER_EMAIL,
-                sender_password=SENDER_PASSWORD,
-                recipient=recipient,
-                subject=subject,
-                body=BODY_TEMPLATE.format(username=username, password=password)
-            )
-        except Exception as e:
-            print(f"❌ Failed to send to {recipient}: {e}")
+        if user.get("email") and user not in delivery_log:
+            pending.append(user)
+        else:
+            skipped += 1
+    if skipped:
+        print(f"⏭️ Skipping {skipped} users already emailed or without an email (see '{delivery_log_path}')")
+
+    pool = SMTPPool(host, port, SENDER_EMAIL, SENDER_PASSWORD)
+    limiter = RateLimiter(per_minute)
+
+    def deliver(user):
+        message = templates.for_user(user).render(user).as_bytes()
+        limiter.acquire()
+        pool.send(SENDER_EMAIL, user['email'], message)
+        delivery_log.record(user)
+
+    sent = failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            futures = {executor.submit(deliver, user): user for user in pending}
+            for future in as_completed(futures):
+                recipient = futures[future]['email']
+                try:
+                    future.result()
+                    sent += 1
+                    print(f"✅ Email sent to {recipient}")
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Failed to send to {recipient}: {e}")
+    finally:
+        pool.close()
+    print(f"📬 Sent {sent}, failed {failed}, skipped {skipped} ({pool.connects} SMTP connections)")
+    return sent, failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Email login credentials to every created team.")
+    parser.add_argument("--pool-size", type=int, default=SMTP_POOL_SIZE,
+                        help="Parallel SMTP connections. Default: $SMTP_POOL_SIZE or 3")
+    parser.add_argument("--per-minute", type=float, default=SMTP_MESSAGES_PER_MINUTE,
+                        help="Max messages per minute, 0 = unlimited. Default: $SMTP_MESSAGES_PER_MINUTE or 60")
+    parser.add_argument("--delivery-log", default=EMAIL_DELIVERY_LOG,
+                        help="Addresses already sent to. Default: $EMAIL_DELIVERY_LOG or "
+                             "$CONTEST_BASE_DIR/${CONTEST_STATE_NAME}_email_delivery.jsonl")
+    parser.add_argument("--source", choices=["json", "tsv"], default="json",
+                        help="Read users from {CONTEST_STATE_NAME}_created_users.json (default) or _credentials.tsv "
+                             "(which needs an Email column)")
+    parser.add_argument("--users-file", help="Override the path of the users file")
+    parser.add_argument("--templates-dir", default=EMAIL_TEMPLATES_DIR,
+                        help="Directory with default/<site> .txt/.html templates. Default: $EMAIL_TEMPLATES_DIR")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        users = load_created_users(args.source, args.users_file)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    subject = "دسترسی به لیگ BCPC"
+    templates = TemplateSet(SENDER_EMAIL, subject, BODY_TEMPLATE, args.templates_dir)
+    send_all(users, templates, args.pool_size, args.per_minute, args.delivery_log)
@@ -1,92 +1,219 @@
+import argparse
+import asyncio
 import ipaddress
-import socket
+import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import paramiko
 from tqdm import tqdm
 
+import ssh_fleet
+
 USERNAME = "user"
 PASSWORD = "password"
 PORT = 22
 TIMEOUT = 3
-MAX_WORKERS = 30
+PROBE_TIMEOUT = 0.5
+SSH_CONCURRENCY = 200
+PROBE_CONCURRENCY = 1000
 SUCCESS_FILE = "ssh_success.txt"
+RESULTS_FILE = "ssh_results.jsonl"
 
 # The remote command to run after successful login
 REMOTE_COMMAND = '''loginctl unlock-session $(loginctl list-sessions | grep rayan | awk '{print $1}') && loginctl activate $(loginctl list-sessions | grep rayan | awk '{print $1}')'''
 # REMOTE_COMMAND = '''echo 'password' | sudo -S passwd 123'''
 # REMOTE_COMMAND = '''echo 1'''
 
-# Generate IP list from CIDR, excluding .1
-LOAD_FROM_FILE = False
-if LOAD_FROM_FILE:
-    with open(SUCCESS_FILE) as f:
-        ip_list = [l.strip() for l in f.readlines()]
-else:
-    ip_range = ipaddress.IPv4Network("172.100.191.0/24")
-    ip_list = [str(ip) for ip in ip_range.hosts() if str(ip) != "172.100.191.1"]
-# ip_list = ["172.100.191.3"]
-total_ips = len(ip_list)
-
-def check_and_run_ssh(ip):
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-    try:
-        client.connect(hostname=ip, port=PORT, username=USERNAME, password=PASSWORD, timeout=TIMEOUT)
-        stdin, stdout, stderr = client.exec_command(REMOTE_COMMAND)
-        stdout.channel.recv_exit_status()  # Wait for command to finish
-        return (ip, True)
-    except Exception:
-        return (ip, False)
-    finally:
-        client.close()
+DEFAULT_CIDRS = ["172.100.191.0/24"]
+DEFAULT_EXCLUDES = ["172.100.191.1"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Log in to every lab machine over SSH and run a command.")
+    parser.add_argument("--cidr", action="append", dest="cidrs",
+                        help="Network to sweep, repeatable. Default: 172.100.191.0/24")
+    parser.add_argument("--exclude", action="append", dest="excludes",
+                        help="IP or CIDR to skip, repeatable. Default: 172.100.191.1")
+    parser.add_argument("--hosts-file", help="Check the IPs listed in this file (e.g. ssh_success.txt) instead")
+    parser.add_argument("--command", default=REMOTE_COMMAND, help="Remote command to run")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="SSH connect timeout in seconds")
+    parser.add_argument("--probe-timeout", type=float, default=PROBE_TIMEOUT,
+                        help="TCP port 22 pre-probe timeout in seconds")
+    parser.add_argument("--concurrency", type=int, default=SSH_CONCURRENCY, help="SSH sessions in flight")
+    parser.add_argument("--probe-concurrency", type=int, default=PROBE_CONCURRENCY, help="TCP probes in flight")
+    parser.add_argument("--results", default=RESULTS_FILE,
+                        help=f"Append every host result to this JSONL file. Default: {RESULTS_FILE}")
+    parser.add_argument("--only-failed", action="store_true",
+                        help="Re-check only hosts whose last recorded status was not ok")
+    parser.add_argument("--since", help="With --only-failed (implied), only consider results newer than "
+                                        "this: a duration like 30m / 2h or an ISO date-time")
+    parser.add_argument("--interactive", action="store_true",
+                        help="Keep the sessions open and run each command read from stdin on every host")
+    parser.add_argument("--command-timeout", type=float, default=None,
+                        help="In --interactive mode, give up on a command after this many seconds")
+    return parser.parse_args()
+
+
+def select_targets(args, store):
+    """The IPs to check: the sweep range, or just the recently failed hosts within it."""
+    explicit = args.hosts_file or args.cidrs
+    if args.hosts_file:
+        with open(args.hosts_file) as f:
+            ip_list = ssh_fleet.expand_targets([], args.excludes or [], f)
+    else:
+        ip_list = ssh_fleet.expand_targets(args.cidrs or DEFAULT_CIDRS,
+                                           DEFAULT_EXCLUDES if args.excludes is None else args.excludes)
+    if not (args.only_failed or args.since):
+        return ip_list
+
+    since = ssh_fleet.parse_since(args.since) if args.since else None
+    failed = store.failed(since)
+    if explicit:
+        return [ip for ip in ip_list if ip in failed]
+    # No range given: re-check every failed host on record, not just the default subnet
+    excluded = args.excludes or []
+    return ssh_fleet.expand_targets([], excluded, sorted(failed, key=ipaddress.ip_address))
+
+
+def read_command():
+    """Next command from stdin, or None at EOF. Prompts only when stdin is a terminal."""
+    if sys.stdin.isatty():
+        try:
+            return input("fleet> ")
+        except EOFError:
+            return None
+    line = sys.stdin.readline()
+    return line if line else None
+
+
+def print_broadcast(results, took, verbose=False):
+    """Group identical outcomes so 300 hosts answering "1" is one line, not 300."""
+    groups = {}
+    for result in results:
+        key = (result["status"], result["exit_status"], result["stdout"].strip(), result["error"])
+        groups.setdefault(key, []).append(result["ip"])
+    for (status, exit_status, stdout, error), ips in sorted(groups.items(), key=lambda g: -len(g[1])):
+        label = {"ok": "✅", "exit": f"⚠️ exit {exit_status}"}.get(status, f"❌ {status}")
+        shown = ips if verbose or len(ips) <= 5 else ips[:5] + [f"... +{len(ips) - 5}"]
+        print(f"{label} on {len(ips)} hosts: {', '.join(shown)}")
+        detail = stdout or error
+        if detail:
+            print("    " + detail.replace("\n", "\n    "))
+    print(f"Took: {took:.2f}s")
+
+
+async def interactive(ip_list, args, store):
+    pool = ssh_fleet.SSHSessionPool(
+        ip_list, USERNAME, PASSWORD, PORT,
+        probe_timeout=args.probe_timeout, timeout=args.timeout,
+        probe_concurrency=args.probe_concurrency, ssh_concurrency=args.concurrency,
+    )
+    start_time = time.time()
+    run_id = store.new_run_id()
+    async with pool:
+        print(f"🔌 {len(pool.connected())}/{len(ip_list)} hosts connected in {time.time() - start_time:.1f}s")
+        print("Type a command to run it on every host; :hosts lists connections, :verbose toggles full IP lists, :quit exits.")
+        loop = asyncio.get_running_loop()
+        verbose = False
+        while True:
+            line = await loop.run_in_executor(None, read_command)
+            if line is None:
+                break
+            command = line.strip()
+            if not command:
+                continue
+            if command in (":quit", ":q", ":exit"):
+                break
+            if command == ":verbose":
+                verbose = not verbose
+                continue
+            if command == ":hosts":
+                down = [ip for ip in ip_list if not pool.is_connected(ip)]
+                print(f"Connected: {len(ip_list) - len(down)}, not connected: {len(down)}")
+                for ip in down:
+                    print(f"  {ip}: {pool.last_error.get(ip, ('dropped', None))[0]}")
+                continue
+            start_time = time.time()
+            results = await pool.broadcast(command, timeout=args.command_timeout,
+                                           on_result=lambda r: store.append(run_id, command, r))
+            print_broadcast(results, time.time() - start_time, verbose)
+
 
 def main():
+    args = parse_args()
+    store = ssh_fleet.ResultsStore(args.results)
+    ip_list = select_targets(args, store)
+    total_ips = len(ip_list)
+    if not ip_list:
+        print("Nothing to check.")
+        return
+
+    if args.interactive:
+        try:
+            asyncio.run(interactive(ip_list, args, store))
+        finally:
+            store.close()
+        return
+
     print(f"Starting SSH health check and command run on {total_ips} hosts...\n")
-    success_count = 0
-    failure_count = 0
-    checked = 0
+    counts = {"success": 0, "failed": 0}
     start_time = time.time()
     successful_hosts = []
+    run_id = store.new_run_id()
+
+    with tqdm(total=total_ips, desc="Checking", unit="host") as pbar:
+        def on_result(result):
+            store.append(run_id, args.command, result)
+            # Like before, a host counts once the command ran, whatever its exit code
+            if result["status"] in ("ok", "exit"):
+                counts["success"] += 1
+                successful_hosts.append(result["ip"])
+            else:
+                if args.hosts_file:
+                    print(result["ip"])
+                counts["failed"] += 1
+
+            checked = counts["success"] + counts["failed"]
+            elapsed = time.time() - start_time
+            eta = elapsed / checked * (total_ips - checked)
+            pbar.set_postfix({
+                "Success": counts["success"],
+                "Failed": counts["failed"],
+                "ETA": f"{int(eta)}s"
+            })
+            pbar.update(1)
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(check_and_run_ssh, ip): ip for ip in ip_list}
-
-        with tqdm(total=total_ips, desc="Checking", unit="host") as pbar:
-            for future in as_completed(futures):
-                ip, success = future.result()
-                checked += 1
-                if success:
-                    success_count += 1
-                    successful_hosts.append(ip)
-                else:
-                    if LOAD_FROM_FILE:
-                        print(ip)
-                    failure_count += 1
-
-                elapsed = time.time() - start_time
-                avg_time = elapsed / checked
-                remaining = total_ips - checked
-                eta = avg_time * remaining
-
-                pbar.set_postfix({
-                    "Success": success_count,
-                    "Failed": failure_count,
-                    "ETA": f"{int(eta)}s"
-                })
-                pbar.update(1)
+        results = asyncio.run(ssh_fleet.sweep(
+            ip_list, args.command, USERNAME, PASSWORD, PORT,
+            probe_timeout=args.probe_timeout, timeout=args.timeout,
+            probe_concurrency=args.probe_concurrency, ssh_concurrency=args.concurrency,
+            on_result=on_result,
+        ))
+    store.close()
+
+    if args.only_failed or args.since:
+        # A re-check only covers the failed hosts; keep the ones that were already fine
+        try:
+            with open(SUCCESS_FILE) as f:
+                previous = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            previous = []
+        known = set(previous)
+        successful_hosts = previous + [ip for ip in successful_hosts if ip not in known]
 
     with open(SUCCESS_FILE, "w") as f:
         for ip in successful_hosts:
             f.write(ip + "\n")
 
+    by_status = {}
+    for result in results:
+        by_status[result["status"]] = by_status.get(result["status"], 0) + 1
+
     print("\n=== Summary ===")
-    print(f"Total Checked: {checked}")
-    print(f"Successful: {success_count}")
-    print(f"Failed: {failure_count}")
-    print(f"Successful IPs saved to {SUCCESS_FILE}")
+    print(f"Total Checked: {len(results)}")
+    print(f"Successful: {counts['success']} (non-zero exit: {by_status.get('exit', 0)})")
+    print(f"Failed: {counts['failed']} ({', '.join(f'{k}: {v}' for k, v in sorted(by_status.items()) if k not in ('ok', 'exit'))})")
+    print(f"Took: {time.time() - start_time:.1f}s")
+    print(f"Successful IPs saved to {SUCCESS_FILE}, every result appended to {args.results} (run {run_id})")
 
 if __name__ == "__main__":
     main()
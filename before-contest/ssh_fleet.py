@@ -0,0 +1,356 @@
+"""asyncio SSH engine for sweeping contest-hall machines.
+
+Every host first gets a plain TCP connect to port 22 with a short timeout;
+only hosts that answer are handed to asyncssh for login and the command.
+Dead IPs cost one probe timeout instead of a full SSH timeout, and hundreds
+of connections stay in flight on a single thread.
+
+For running several commands against the same hall during a contest,
+SSHSessionPool keeps the logins open between commands instead, and
+ResultsStore keeps every host's outcome so follow-up sweeps can target only
+the machines that failed.
+"""
+import asyncio
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import asyncssh
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import metrics  # noqa: E402
+
+PROBE_TIMEOUT = 0.5
+CONNECT_TIMEOUT = 3
+PROBE_CONCURRENCY = 1000
+SSH_CONCURRENCY = 200
+
+# Statuses a re-check leaves alone; everything else (including a non-zero exit) is retried
+GOOD_STATUSES = {"ok"}
+
+
+def expand_targets(cidrs, excludes=(), hosts=()):
+    """IPs from CIDR blocks and explicit hosts, minus excluded IPs/CIDRs, in a stable order."""
+    excluded = [ipaddress.ip_network(e, strict=False) for e in excludes]
+    seen = set()
+    targets = []
+    candidates = [str(ip) for cidr in cidrs for ip in ipaddress.ip_network(cidr, strict=False).hosts()]
+    candidates.extend(h.strip() for h in hosts if h.strip())
+    for ip in candidates:
+        address = ipaddress.ip_address(ip)
+        if ip in seen or any(address in network for network in excluded):
+            continue
+        seen.add(ip)
+        targets.append(ip)
+    return targets
+
+
+async def probe_port(ip, port=22, timeout=PROBE_TIMEOUT):
+    """True if something accepts a TCP connection on `port` within `timeout`."""
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        metrics.observe("ssh", "probe", time.perf_counter() - start, "closed")
+        return False
+    metrics.observe("ssh", "probe", time.perf_counter() - start, "open")
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+def classify_error(error):
+    if isinstance(error, asyncssh.PermissionDenied):
+        return "auth"
+    if isinstance(error, ConnectionRefusedError):
+        return "refused"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    return "error"
+
+
+async def connect(ip, username, password, port=22, timeout=CONNECT_TIMEOUT):
+    start = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(
+            asyncssh.connect(ip, port=port, username=username, password=password,
+                             known_hosts=None, connect_timeout=timeout),
+            timeout,
+        )
+    except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+        metrics.observe("ssh", "connect", time.perf_counter() - start, classify_error(e))
+        raise
+    metrics.observe("ssh", "connect", time.perf_counter() - start)
+    return conn
+
+
+async def run_command(conn, command, timeout=None):
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(conn.run(command, check=False), timeout)
+    except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+        metrics.observe("ssh", "run", time.perf_counter() - start, type(e).__name__)
+        raise
+    stdout = result.stdout or ""
+    metrics.observe("ssh", "run", time.perf_counter() - start, "ok" if result.exit_status == 0 else "exit",
+                    bytes_in=len(stdout.encode("utf-8", "replace")), bytes_out=len(command))
+    return result.exit_status, stdout
+
+
+async def check_host(ip, command, username, password, port=22, probe_timeout=PROBE_TIMEOUT,
+                     timeout=CONNECT_TIMEOUT, probe_limit=None, ssh_limit=None):
+    """Probe, log in, run `command` once. Returns a result dict for the host.
+
+    status is one of: ok, exit (command exited non-zero), closed (port 22
+    did not answer the probe), refused, timeout, auth, error.
+    """
+    start = time.monotonic()
+    result = {"ip": ip, "status": "error", "exit_status": None, "stdout": "", "error": None}
+    probe_limit = probe_limit or asyncio.Semaphore(PROBE_CONCURRENCY)
+    ssh_limit = ssh_limit or asyncio.Semaphore(SSH_CONCURRENCY)
+
+    async with probe_limit:
+        reachable = await probe_port(ip, port, probe_timeout)
+    if not reachable:
+        result["status"] = "closed"
+    else:
+        async with ssh_limit:
+            try:
+                conn = await connect(ip, username, password, port, timeout)
+                async with conn:
+                    exit_status, stdout = await run_command(conn, command)
+                result["exit_status"] = exit_status
+                result["stdout"] = stdout
+                result["status"] = "ok" if exit_status == 0 else "exit"
+            except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+                result["status"] = classify_error(e)
+                result["error"] = str(e) or type(e).__name__
+    result["latency"] = round(time.monotonic() - start, 3)
+    return result
+
+
+async def sweep(ips, command, username, password, port=22, probe_timeout=PROBE_TIMEOUT, timeout=CONNECT_TIMEOUT,
+                probe_concurrency=PROBE_CONCURRENCY, ssh_concurrency=SSH_CONCURRENCY, on_result=None):
+    """Check every IP concurrently; `on_result(result)` is called as each host finishes."""
+    probe_limit = asyncio.Semaphore(probe_concurrency)
+    ssh_limit = asyncio.Semaphore(ssh_concurrency)
+    tasks = [
+        asyncio.create_task(check_host(ip, command, username, password, port, probe_timeout, timeout,
+                                       probe_limit, ssh_limit))
+        for ip in ips
+    ]
+    results = []
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return results
+
+
+class SSHSessionPool:
+    """Authenticated connections to a fleet, kept open between commands.
+
+    `open()` probes and logs in to every host once; `broadcast(command)` then
+    runs the command over the already-open connections concurrently, so a
+    pass over the hall costs about one round trip instead of a handshake per
+    host. Hosts whose connection dropped (or never came up) are reconnected
+    lazily on the next broadcast, at most once per `retry_interval` seconds
+    so unreachable machines don't slow every command down.
+    """
+
+    def __init__(self, ips, username, password, port=22, probe_timeout=PROBE_TIMEOUT, timeout=CONNECT_TIMEOUT,
+                 probe_concurrency=PROBE_CONCURRENCY, ssh_concurrency=SSH_CONCURRENCY, retry_interval=30):
+        self.ips = list(ips)
+        self.username = username
+        self.password = password
+        self.port = port
+        self.probe_timeout = probe_timeout
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.probe_limit = asyncio.Semaphore(probe_concurrency)
+        self.ssh_limit = asyncio.Semaphore(ssh_concurrency)
+        self.connections = {}
+        self.last_error = {}
+        self._last_attempt = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def is_connected(self, ip):
+        conn = self.connections.get(ip)
+        return conn is not None and not conn.is_closed()
+
+    def connected(self):
+        return [ip for ip in self.ips if self.is_connected(ip)]
+
+    async def _connect(self, ip):
+        """(Re)connect one host; returns the connection or None, recording why it failed."""
+        self._last_attempt[ip] = time.monotonic()
+        async with self.probe_limit:
+            reachable = await probe_port(ip, self.port, self.probe_timeout)
+        if not reachable:
+            self.last_error[ip] = ("closed", None)
+            return None
+        async with self.ssh_limit:
+            try:
+                conn = await connect(ip, self.username, self.password, self.port, self.timeout)
+            except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+                self.last_error[ip] = (classify_error(e), str(e) or type(e).__name__)
+                return None
+        self.connections[ip] = conn
+        self.last_error.pop(ip, None)
+        return conn
+
+    async def _ensure(self, ip, force=False):
+        if self.is_connected(ip):
+            return self.connections[ip]
+        self.connections.pop(ip, None)
+        last = self._last_attempt.get(ip)
+        if not force and last is not None and time.monotonic() - last < self.retry_interval:
+            return None
+        return await self._connect(ip)
+
+    async def open(self):
+        """Connect to every host; returns the IPs that are now connected."""
+        await asyncio.gather(*(self._ensure(ip, force=True) for ip in self.ips))
+        return self.connected()
+
+    async def _run_on(self, ip, command, timeout):
+        start = time.monotonic()
+        result = {"ip": ip, "status": "error", "exit_status": None, "stdout": "", "error": None}
+        conn = await self._ensure(ip)
+        for attempt in range(2):
+            if conn is None:
+                result["status"], result["error"] = self.last_error.get(ip, ("error", None))
+                break
+            try:
+                exit_status, stdout = await run_command(conn, command, timeout)
+            except (asyncssh.ChannelOpenError, asyncssh.ConnectionLost, asyncssh.DisconnectError,
+                    BrokenPipeError, ConnectionResetError) as e:
+                # The host dropped since the last command: reconnect once and retry
+                conn.close()
+                self.connections.pop(ip, None)
+                result["error"] = str(e) or type(e).__name__
+                if attempt == 0:
+                    metrics.retry("ssh", "run")
+                conn = await self._connect(ip) if attempt == 0 else None
+                continue
+            except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+                result["status"] = classify_error(e)
+                result["error"] = str(e) or type(e).__name__
+                break
+            result.update(exit_status=exit_status, stdout=stdout, error=None,
+                          status="ok" if exit_status == 0 else "exit")
+            break
+        result["latency"] = round(time.monotonic() - start, 3)
+        return result
+
+    async def broadcast(self, command, timeout=None, on_result=None):
+        """Run `command` on every host over the pooled connections; returns one result dict per host."""
+        tasks = [asyncio.create_task(self._run_on(ip, command, timeout)) for ip in self.ips]
+        results = []
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return results
+
+    async def close(self):
+        conns = list(self.connections.values())
+        self.connections.clear()
+        for conn in conns:
+            conn.close()
+        await asyncio.gather(*(conn.wait_closed() for conn in conns), return_exceptions=True)
+
+
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()[:16]
+
+
+def parse_since(value, now=None):
+    """Epoch seconds from a duration like "45s", "30m", "2h", "1d", or an ISO date/time."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value.strip())
+    if match:
+        seconds = float(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+        return (now or time.time()) - seconds
+    return datetime.fromisoformat(value.strip()).timestamp()
+
+
+class ResultsStore:
+    """Append-only JSONL history of every host result from every run.
+
+    One line per host per command:
+      {"run", "ts", "cmd", "ip", "status", "latency", "exit", "stdout", "error"}
+    where "cmd" and "stdout" are short sha256 digests (commands may contain
+    passwords; outputs can be large), so "did every machine print the same
+    thing" is a cheap comparison. The newest line for an IP is its current
+    state, which is what --only-failed re-checks are built on.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @staticmethod
+    def new_run_id():
+        return datetime.now().strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+
+    def append(self, run_id, command, result):
+        record = {
+            "run": run_id,
+            "ts": round(time.time(), 3),
+            "cmd": digest(command),
+            "ip": result["ip"],
+            "status": result["status"],
+            "latency": result.get("latency"),
+            "exit": result["exit_status"],
+            "stdout": digest(result["stdout"]) if result["stdout"] else None,
+            "error": result["error"],
+        }
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last line can be torn by an interrupted run
+                    continue
+
+    def latest(self, since=None):
+        """{ip: newest record} over the records at or after `since` (epoch seconds)."""
+        latest = {}
+        for record in self.records():
+            if since is None or record["ts"] >= since:
+                latest[record["ip"]] = record
+        return latest
+
+    def failed(self, since=None):
+        """IPs whose newest result (within the window) was not a clean success."""
+        return {ip for ip, record in self.latest(since).items() if record["status"] not in GOOD_STATUSES}
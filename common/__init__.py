@@ -0,0 +1 @@
+"""Helpers shared by the before-, during- and after-contest scripts."""
@@ -0,0 +1,206 @@
+"""One authenticated, pooled, retrying DOMjudge session for every script.
+
+    client = DomjudgeClient.from_env(ttls={"teams": 300})
+    client.api(f"contests/{cid}/teams")                          # JSON over HTTP Basic auth
+    client.post(f"{client.base_url}/jury/users/5/delete")         # logs in through /login first
+    client.download(f"{client.base_url}/jury/contests/{cid}/scoreboard-zip/unfrozen/contest.zip", path)
+
+API calls use HTTP Basic auth. Jury pages need a web session, so the first
+non-API request logs in through the /login form (with its CSRF token) and the
+session cookie is saved under SESSION_DIR per host and user: the next
+contest, league or script reuses it instead of logging in again. A 401 or a
+redirect to /login logs in again, once, and repeats the request; threads that
+hit an expired session together share a single new login.
+
+Connection errors, timeouts and 5xx answers are retried RETRIES times with
+exponential backoff (BACKOFF seconds, doubling, with jitter). Non-idempotent
+requests (POST, PATCH) are only retried when the connection was never
+made, unless the caller passes retry=True. The connection pool is sized for
+the number of threads sharing the client, and GETs are cached like any
+CachedSession (see http_cache.py).
+"""
+import html
+import json
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .http_cache import CachedSession
+from .metrics import http_endpoint, metrics
+
+SESSION_DIR = os.path.expanduser(os.environ.get("DOMJUDGE_SESSION_DIR", "~/.cache/domjudge-automation/sessions"))
+POOL_SIZE = int(os.environ.get("DOMJUDGE_MAX_WORKERS", 8))
+RETRIES = int(os.environ.get("DOMJUDGE_RETRIES", 3))
+BACKOFF = float(os.environ.get("DOMJUDGE_BACKOFF", 0.5))
+TIMEOUT = (10, 120)
+
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+CSRF_RE = re.compile(r'name="_csrf_token"\s+value="([^"]*)"')
+
+
+class DomjudgeLoginError(requests.RequestException):
+    pass
+
+
+def is_login_page(resp):
+    """True when DOMjudge sent us to the login form instead of the page we asked for."""
+    location = resp.headers.get("Location", "") if resp.is_redirect else resp.url
+    return urlparse(location).path.rstrip("/").endswith("/login")
+
+
+class DomjudgeClient(CachedSession):
+    def __init__(self, base_url, username=None, password=None, ttls=None, pool_size=POOL_SIZE,
+                 retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT, session_cookie=None,
+                 session_dir=SESSION_DIR, **cache_options):
+        super().__init__(ttls, **cache_options)
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        if username and password:
+            self.auth = (username, password)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session_dir = session_dir
+        self.logins = 0
+        self.retried = 0
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+        self.resize_pool(pool_size)
+        self._restore_session()
+        if session_cookie:
+            # A PHPSESSID pasted from the browser still works; it is replaced if it expires
+            self.cookies.set("PHPSESSID", session_cookie, domain=urlparse(self.base_url).hostname)
+
+    @classmethod
+    def from_env(cls, **options):
+        """DOMJUDGE_API_BASE, DOMJUDGE_USERNAME / DOMJUDGE_PASSWORD and an optional PHPSESSID."""
+        return cls(os.environ.get("DOMJUDGE_API_BASE", "https://bircpc.ir"),
+                   os.environ.get("DOMJUDGE_USERNAME"), os.environ.get("DOMJUDGE_PASSWORD"),
+                   session_cookie=os.environ.get("PHPSESSID"), **options)
+
+    def resize_pool(self, pool_size):
+        """Keep-alive connections for `pool_size` threads sharing this client."""
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    # -- web login -----------------------------------------------------------
+
+    def _session_path(self):
+        host = urlparse(self.base_url).netloc.replace(":", "_")
+        return os.path.join(self.session_dir, f"{host}_{self.username}.json")
+
+    def _restore_session(self):
+        if not self.password:
+            return
+        try:
+            with open(self._session_path(), encoding="utf8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for cookie in saved:
+            self.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+
+    def _save_session(self):
+        os.makedirs(self.session_dir, exist_ok=True)
+        path = self._session_path()
+        cookies = [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path} for c in self.cookies]
+        fd = os.open(f"{path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            json.dump(cookies, f)
+        os.replace(f"{path}.tmp", path)
+
+    def login(self, seen_generation=None):
+        """Log in through the /login form; a no-op if another thread already did since `seen_generation`."""
+        with self._login_lock:
+            if seen_generation is not None and seen_generation != self._login_generation:
+                return
+            if not (self.username and self.password):
+                raise DomjudgeLoginError("DOMjudge web login needs DOMJUDGE_USERNAME and DOMJUDGE_PASSWORD")
+            login_url = f"{self.base_url}/login"
+            self.cookies.clear()
+            # Straight to requests.Session: the login page must not be cached or retried as a normal call
+            page = requests.Session.request(self, "GET", login_url, timeout=self.timeout)
+            page.raise_for_status()
+            form = {"_username": self.username, "_password": self.password}
+            match = CSRF_RE.search(page.text)
+            if match:
+                form["_csrf_token"] = html.unescape(match.group(1))
+            with metrics.timed("http", "POST /login") as call:
+                resp = requests.Session.request(self, "POST", login_url, data=form, timeout=self.timeout)
+                call.status = resp.status_code
+            if resp.status_code >= 400 or is_login_page(resp):
+                raise DomjudgeLoginError(f"Login as '{self.username}' at {login_url} failed")
+            self._login_generation += 1
+            self.logins += 1
+            self._save_session()
+
+    # -- requests.Session ----------------------------------------------------
+
+    def _wait(self, attempt, method, url):
+        with self._lock:
+            self.retried += 1
+        metrics.retry("http", http_endpoint(method, url))
+        time.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    def request(self, method, url, retry=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = method.upper() in IDEMPOTENT if retry is None else retry
+        web_page = not urlparse(url).path.startswith(urlparse(self.base_url).path + "/api/")
+        if web_page and self.password and not self.cookies:
+            self.login(self._login_generation)
+
+        attempt = 0
+        logged_in_again = False
+        while True:
+            generation = self._login_generation
+            try:
+                resp = super().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries or not (idempotent or isinstance(e, requests.ConnectTimeout)):
+                    raise
+                self._wait(attempt, method, url)
+                attempt += 1
+                continue
+
+            if web_page and self.password and not logged_in_again and (resp.status_code == 401 or is_login_page(resp)):
+                # Expired or foreign session: the request was not carried out, so repeat it once
+                resp.close()
+                self.login(generation)
+                logged_in_again = True
+                continue
+            if resp.status_code >= 500 and idempotent and attempt < self.retries:
+                resp.close()
+                self._wait(attempt, method, url)
+                attempt += 1
+                continue
+            return resp
+
+    # -- helpers -------------------------------------------------------------
+
+    def api(self, path, **kwargs):
+        """GET /api/v4/<path> and return the decoded JSON."""
+        resp = self.get(f"{self.base_url}/api/v4/{path.lstrip('/')}", **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    def download(self, url, path, chunk_size=1 << 20):
+        """Stream `url` into `path` (via a .part file); returns the number of bytes written."""
+        size = 0
+        with self.get(url, stream=True) as resp:
+            resp.raise_for_status()
+            if is_login_page(resp):
+                raise DomjudgeLoginError(f"{url} redirected to the login page")
+            with open(f"{path}.part", "wb") as f:
+                for chunk in resp.iter_content(chunk_size):
+                    f.write(chunk)
+                    size += len(chunk)
+        os.replace(f"{path}.part", path)
+        return size
@@ -0,0 +1,220 @@
+"""requests.Session with a disk + memory cache for DOMjudge API reads.
+
+    session = CachedSession(ttls={"scoreboard": 10, "teams": 300})
+    session.get(f"{API}/api/v4/teams")   # 200, stored
+    session.get(f"{API}/api/v4/teams")   # served from memory while fresh
+
+Plain GETs (not stream=True) are cached under HTTP_CACHE_DIR, keyed by the
+full URL and the auth user, plus a small in-memory LRU in front of the disk.
+Within an endpoint's TTL a response is returned without touching the
+network; after that it is revalidated with If-None-Match / If-Modified-Since
+and a 304 reuses the stored body. The TTL is picked by the last non-numeric
+path segment ("teams" for /api/v4/contests/3/teams/17), 0 by default.
+
+Any successful POST/PUT/PATCH/DELETE to a host marks every cached response
+from that host stale, for other processes too, so a script never trusts a
+team list fetched before someone (including itself) created teams.
+Set HTTP_CACHE=0 to turn caching off. Every call is also timed into
+common/metrics.py, with cache hits counted under the status "hit".
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .metrics import http_endpoint, metrics
+
+CACHE_DIR = os.path.expanduser(os.environ.get("HTTP_CACHE_DIR", "~/.cache/domjudge-automation/http"))
+ENABLED = os.environ.get("HTTP_CACHE", "1") != "0"
+MEMORY_ITEMS = 256
+
+# The stored body is already decoded, so these no longer describe it
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+def parse_ttls(value):
+    """"scoreboard=10,teams=300" -> {"scoreboard": 10.0, "teams": 300.0}."""
+    ttls = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, seconds = item.partition("=")
+        ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+class CachedSession(requests.Session):
+    def __init__(self, ttls=None, cache_dir=CACHE_DIR, memory_items=MEMORY_ITEMS, enabled=ENABLED):
+        super().__init__()
+        # HTTP_CACHE_TTLS in the environment overrides what the script asks for
+        self.ttls = dict(ttls or {}, **parse_ttls(os.environ.get("HTTP_CACHE_TTLS")))
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self.enabled = enabled
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    # -- keys and freshness ----------------------------------------------
+
+    def ttl_for(self, url):
+        for segment in reversed(urlparse(url).path.strip("/").split("/")):
+            if segment and not segment.isdigit():
+                return self.ttls.get(segment, 0)
+        return 0
+
+    def _key(self, url, auth):
+        user = auth[0] if isinstance(auth, tuple) else ""
+        return hashlib.sha256(f"{user}\n{url}".encode()).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + ".json", base + ".body"
+
+    def _stamp_path(self, url):
+        return os.path.join(self.cache_dir, "hosts", urlparse(url).netloc.replace(":", "_"))
+
+    def _host_changed_at(self, url):
+        try:
+            return os.path.getmtime(self._stamp_path(url))
+        except OSError:
+            return 0
+
+    def invalidate_host(self, url):
+        path = self._stamp_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a"):
+            pass
+        os.utime(path)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    # -- storage -----------------------------------------------------------
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        entry = (meta, body)
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _store(self, key, meta, body):
+        meta_path, body_path = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(body_path + suffix, "wb") as f:
+            f.write(body)
+        os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, "w", encoding="utf8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+        self._remember(key, (meta, body))
+
+    @staticmethod
+    def _response(meta, body, request):
+        resp = requests.Response()
+        resp.status_code = meta["status"]
+        resp.reason = "OK"
+        resp.headers = CaseInsensitiveDict(meta["headers"])
+        resp._content = body
+        resp.encoding = meta.get("encoding")
+        resp.url = meta["url"]
+        resp.request = request
+        resp.from_cache = True
+        return resp
+
+    # -- requests.Session ----------------------------------------------------
+
+    def request(self, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = self._cached_request(method, url, **kwargs)
+        except requests.RequestException as e:
+            metrics.observe("http", http_endpoint(method, url), time.perf_counter() - start, type(e).__name__)
+            raise
+        if getattr(resp, "revalidated", False):
+            status, bytes_in = 304, 0
+        elif getattr(resp, "from_cache", False):
+            status, bytes_in = "hit", 0
+        else:
+            status = resp.status_code
+            # Streamed bodies are not read yet; their Content-Length is what will come in
+            bytes_in = int(resp.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(resp.content)
+        body = resp.request.body if resp.request is not None else None
+        bytes_out = len(body) if isinstance(body, (bytes, str)) else 0
+        metrics.observe("http", http_endpoint(method, url), time.perf_counter() - start, status, bytes_in, bytes_out)
+        return resp
+
+    def _cached_request(self, method, url, **kwargs):
+        if method.upper() != "GET" or kwargs.get("stream") or not self.enabled:
+            resp = super().request(method, url, **kwargs)
+            if method.upper() not in ("GET", "HEAD", "OPTIONS") and resp.status_code < 400 and self.enabled:
+                self.invalidate_host(url)
+            return resp
+
+        prepared = self.prepare_request(requests.Request(method, url, params=kwargs.get("params"),
+                                                         headers=kwargs.get("headers"), auth=kwargs.get("auth")))
+        key = self._key(prepared.url, kwargs.get("auth") or self.auth)
+        entry = self._load(key)
+        now = time.time()
+        if entry is not None:
+            meta, body = entry
+            fresh = now - meta["stored_at"] < self.ttl_for(prepared.url)
+            if fresh and meta["stored_at"] > self._host_changed_at(prepared.url):
+                self._count("hits")
+                return self._response(meta, body, prepared)
+            headers = dict(kwargs.get("headers") or {})
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            kwargs["headers"] = headers
+
+        resp = super().request(method, url, **kwargs)
+        if resp.status_code == 304 and entry is not None:
+            meta = dict(entry[0], stored_at=now)
+            self._store(key, meta, entry[1])
+            self._count("revalidated")
+            resp = self._response(meta, entry[1], prepared)
+            resp.revalidated = True
+            return resp
+
+        self._count("misses")
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if resp.status_code == 200 and (etag or last_modified or self.ttl_for(prepared.url) > 0):
+            self._store(key, {
+                "url": resp.url,
+                "status": resp.status_code,
+                "headers": {k: v for k, v in resp.headers.items() if k.lower() not in DROPPED_HEADERS},
+                "encoding": resp.encoding,
+                "etag": etag,
+                "last_modified": last_modified,
+                "stored_at": now,
+            }, resp.content)
+        resp.from_cache = False
+        return resp
@@ -0,0 +1,303 @@
+"""Per-call metrics for the HTTP, SMTP and SSH traffic of a run.
+
+    from common.metrics import metrics
+    with metrics.timed("smtp", "send") as call:
+        server.sendmail(...)
+        call.bytes_out = len(message)
+    metrics.retry("smtp", "send")
+
+Every call is recorded under (kind, endpoint): HTTP endpoints are
+"<METHOD> <path>" with numeric IDs folded into {id}, so
+/api/v4/contests/3/teams/17 and .../teams/18 share one series. A series
+keeps a latency histogram (plus a bounded sample for exact p50/p99),
+status counts, retries and bytes in/out.
+
+When the script exits, a p50/p99 table is printed and, unless METRICS=0,
+written to METRICS_DIR (default ./metrics) as <script>.json and as
+<script>.prom in the Prometheus textfile-collector format (point METRICS_DIR
+at node_exporter's --collector.textfile.directory to scrape it).
+METRICS_PROGRESS=1 shows a live tqdm line with the request rate and
+latencies while the run is going.
+"""
+import atexit
+import bisect
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS_DIR = os.environ.get("METRICS_DIR", "./metrics")
+PROGRESS = os.environ.get("METRICS_PROGRESS", "0") == "1"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MAX_SAMPLES = 20000
+ID_SEGMENT_RE = re.compile(r"/(?:\d+|[0-9a-f]{16,}|[0-9a-f-]{36})(?=/|$)")
+
+
+def http_endpoint(method, url):
+    """"GET https://host/api/v4/contests/3/teams?x=1" -> "GET /api/v4/contests/{id}/teams"."""
+    path = re.sub(r"^[a-z]+://[^/]+", "", url).split("?")[0]
+    return f"{method.upper()} {ID_SEGMENT_RE.sub('/{id}', path) or '/'}"
+
+
+def quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(q * len(sorted_values) + 0.5) - 1))]
+
+
+class Series:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.samples = []
+        self.statuses = {}
+        self.retries = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, seconds, status, bytes_in, bytes_out):
+        self.count += 1
+        self.total_seconds += seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        # Reservoir sample: exact quantiles for small runs, unbiased ones for huge runs
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = seconds
+        status = str(status)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "p50_ms": round(quantile(ordered, 0.50) * 1000, 1) if ordered else None,
+            "p90_ms": round(quantile(ordered, 0.90) * 1000, 1) if ordered else None,
+            "p99_ms": round(quantile(ordered, 0.99) * 1000, 1) if ordered else None,
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+            "mean_ms": round(self.total_seconds / self.count * 1000, 1) if self.count else None,
+            "statuses": dict(sorted(self.statuses.items())),
+            "retries": self.retries,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+
+class Call:
+    """What a `timed` block fills in; status defaults to "ok", or the exception's class name."""
+
+    def __init__(self):
+        self.status = "ok"
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class _Timed:
+    def __init__(self, registry, kind, endpoint):
+        self.registry = registry
+        self.kind = kind
+        self.endpoint = endpoint
+        self.call = Call()
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.call
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.call.status == "ok":
+            # SMTP errors carry the server's reply code, which says more than the class name
+            self.call.status = getattr(exc, "smtp_code", None) or exc_type.__name__
+        self.registry.observe(self.kind, self.endpoint, time.perf_counter() - self.start, self.call.status,
+                              self.call.bytes_in, self.call.bytes_out)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=ENABLED, directory=METRICS_DIR, progress=PROGRESS):
+        self.enabled = enabled
+        self.directory = directory
+        self.progress = progress
+        self.script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        self.started = time.time()
+        self.series = {}
+        self._lock = threading.Lock()
+        self._registered = False
+        self._bar = None
+        self._bar_updated = 0.0
+
+    def _series(self, kind, endpoint):
+        key = (kind, endpoint)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = Series()
+            if not self._registered:
+                self._registered = True
+                atexit.register(self.finish)
+        return series
+
+    def observe(self, kind, endpoint, seconds, status="ok", bytes_in=0, bytes_out=0):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._series(kind, endpoint).add(seconds, status, bytes_in, bytes_out)
+            if self.progress:
+                self._tick()
+
+    def retry(self, kind, endpoint):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._series(kind, endpoint).retries += 1
+
+    def timed(self, kind, endpoint):
+        return _Timed(self, kind, endpoint)
+
+    # -- live progress --------------------------------------------------------
+
+    def _tick(self):
+        if self._bar is None:
+            from tqdm import tqdm
+            self._bar = tqdm(desc=self.script, unit="req", dynamic_ncols=True)
+        self._bar.update(1)
+        now = time.monotonic()
+        if now - self._bar_updated >= 0.5:
+            self._bar_updated = now
+            totals = self.totals()
+            self._bar.set_postfix_str(f"p50 {totals['p50_ms']}ms p99 {totals['p99_ms']}ms "
+                                      f"err {totals['errors']} retry {totals['retries']} "
+                                      f"{totals['bytes_in'] / 1e6:.1f}MB", refresh=False)
+
+    # -- results ----------------------------------------------------------------
+
+    def totals(self):
+        samples = sorted(s for series in self.series.values() for s in series.samples)
+        elapsed = max(time.time() - self.started, 1e-9)
+        count = sum(series.count for series in self.series.values())
+        bytes_in = sum(series.bytes_in for series in self.series.values())
+        return {
+            "count": count,
+            "errors": sum(n for series in self.series.values() for status, n in series.statuses.items()
+                          if not is_success(status)),
+            "retries": sum(series.retries for series in self.series.values()),
+            "bytes_in": bytes_in,
+            "bytes_out": sum(series.bytes_out for series in self.series.values()),
+            "p50_ms": round(quantile(samples, 0.50) * 1000, 1) if samples else None,
+            "p99_ms": round(quantile(samples, 0.99) * 1000, 1) if samples else None,
+            "requests_per_second": round(count / elapsed, 2),
+            "bytes_in_per_second": round(bytes_in / elapsed, 1),
+        }
+
+    def summary(self):
+        with self._lock:
+            return {
+                "script": self.script,
+                "started_at": round(self.started, 3),
+                "duration_seconds": round(time.time() - self.started, 3),
+                "totals": self.totals(),
+                "endpoints": [dict(kind=kind, endpoint=endpoint, **series.summary())
+                              for (kind, endpoint), series in sorted(self.series.items())],
+            }
+
+    def prometheus(self):
+        """The run in the Prometheus text exposition format."""
+        def labels(**values):
+            escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                       for k, v in values.items())
+            return "{" + ",".join(escaped) + "}"
+
+        prefix = "domjudge_automation"
+        lines = [
+            f"# HELP {prefix}_call_duration_seconds Latency of HTTP/SMTP/SSH calls.",
+            f"# TYPE {prefix}_call_duration_seconds histogram",
+        ]
+        with self._lock:
+            items = sorted(self.series.items())
+            for (kind, endpoint), series in items:
+                base = dict(script=self.script, kind=kind, endpoint=endpoint)
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (float("inf"),), series.buckets):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{prefix}_call_duration_seconds_bucket{labels(**base, le=le)} {cumulative}")
+                lines.append(f"{prefix}_call_duration_seconds_sum{labels(**base)} {series.total_seconds:.6f}")
+                lines.append(f"{prefix}_call_duration_seconds_count{labels(**base)} {series.count}")
+            for name, help_text in (("calls_total", "Calls by status."), ("retries_total", "Retried calls."),
+                                    ("bytes_total", "Bytes transferred.")):
+                lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} counter"]
+                for (kind, endpoint), series in items:
+                    base = dict(script=self.script, kind=kind, endpoint=endpoint)
+                    if name == "calls_total":
+                        lines += [f"{prefix}_{name}{labels(**base, status=status)} {n}"
+                                  for status, n in sorted(series.statuses.items())]
+                    elif name == "retries_total":
+                        lines.append(f"{prefix}_{name}{labels(**base)} {series.retries}")
+                    else:
+                        lines.append(f"{prefix}_{name}{labels(**base, direction='in')} {series.bytes_in}")
+                        lines.append(f"{prefix}_{name}{labels(**base, direction='out')} {series.bytes_out}")
+        lines += [
+            f"# HELP {prefix}_run_duration_seconds Wall time of the last run.",
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f"{prefix}_run_duration_seconds{labels(script=self.script)} {time.time() - self.started:.3f}",
+            f"# HELP {prefix}_run_timestamp_seconds When the last run finished.",
+            f"# TYPE {prefix}_run_timestamp_seconds gauge",
+            f"{prefix}_run_timestamp_seconds{labels(script=self.script)} {time.time():.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory=None):
+        """Write <script>.json and <script>.prom atomically; returns their paths."""
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for extension, content in (("json", json.dumps(self.summary(), indent=2, ensure_ascii=False)),
+                                   ("prom", self.prometheus())):
+            path = os.path.join(directory, f"{self.script}.{extension}")
+            with open(f"{path}.tmp", "w", encoding="utf8") as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+            paths.append(path)
+        return paths
+
+    def print_table(self, file=sys.stderr):
+        summary = self.summary()
+        print(f"\n📊 {summary['script']}: {summary['totals']['count']} calls in {summary['duration_seconds']:.1f}s "
+              f"({summary['totals']['requests_per_second']}/s), {summary['totals']['retries']} retries, "
+              f"{summary['totals']['bytes_in'] / 1e6:.2f} MB in", file=file)
+        width = max([len(e["endpoint"]) for e in summary["endpoints"]] + [8])
+        print(f"   {'kind':<5} {'endpoint':<{width}} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'retry':>5}  statuses",
+              file=file)
+        for e in summary["endpoints"]:
+            statuses = " ".join(f"{k}:{v}" for k, v in e["statuses"].items())
+            print(f"   {e['kind']:<5} {e['endpoint']:<{width}} {e['count']:>7} {e['p50_ms'] or 0:>8} "
+                  f"{e['p99_ms'] or 0:>8} {e['retries']:>5}  {statuses}", file=file)
+
+    def finish(self):
+        """Print the table and write the files (registered with atexit on the first call)."""
+        if not self.enabled or not self.series:
+            return
+        if self._bar is not None:
+            self._bar.close()
+        self.print_table()
+        try:
+            paths = self.write()
+        except OSError as e:
+            print(f"⚠️ Could not write metrics to {self.directory}: {e}", file=sys.stderr)
+            return
+        print(f"💾 Metrics written to {', '.join(paths)}", file=sys.stderr)
+
+
+def is_success(status):
+    return status in ("ok", "hit", "exit") or (status.isdigit() and int(status) < 400)
+
+
+metrics = Metrics()
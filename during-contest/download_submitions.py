@@ -1,39 +1,186 @@
+"""Mirror contest submissions to disk as real source files.
+
+Lists /api/v4/contests/{cid}/submissions once, then fetches the source code
+of only the submissions that are not in the local index yet, in parallel.
+Sources go into the content-addressed store in submission_store.py
+(submitions/blobs + submitions/index.sqlite), so identical resubmissions are
+kept once, and hard-linked into the browsable
+submitions/<team>/<problem>/<submission id>/<filename> tree (--no-tree skips
+it). Running it
+again every minute during a contest costs one list call plus the new
+submissions. Needs an API account that can read sources (jury/admin).
+"""
+import argparse
+import base64
 import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from dotenv import load_dotenv
+
+from submission_store import SubmissionStore
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.domjudge_client import DomjudgeClient  # noqa: E402
+
+load_dotenv()
+
+BASE_URL = os.environ.get("DOMJUDGE_API_BASE", "https://bircpc.ir")
+CONTEST_ID = os.environ.get("DOMJUDGE_CONTEST_ID", 3)
+DOMJUDGE_USERNAME = os.environ["DOMJUDGE_USERNAME"]
+DOMJUDGE_PASSWORD = os.environ["DOMJUDGE_PASSWORD"]
+MAX_WORKERS = int(os.environ.get("DOMJUDGE_MAX_WORKERS", 8))
+OUTPUT_DIR = "submitions"
+
+# Team names and problem labels barely change; the submissions list is always revalidated
+session = DomjudgeClient(BASE_URL, DOMJUDGE_USERNAME, DOMJUDGE_PASSWORD, ttls={"teams": 300, "problems": 3600})
+
+UNSAFE_PATH_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def api_get(path, **kwargs):
+    return session.api(f"contests/{CONTEST_ID}/{path}", **kwargs)
+
+
+def safe_name(name):
+    """A single path component; keeps Persian names readable, drops separators."""
+    name = UNSAFE_PATH_CHARS.sub("_", str(name)).strip(" .")
+    return name or "_"
+
+
+class SubmissionMirror:
+    """A SubmissionStore plus the team/problem names used to label its rows."""
+
+    def __init__(self, output_dir, tree=True):
+        self.output_dir = output_dir
+        self.tree = tree
+        os.makedirs(output_dir, exist_ok=True)
+        self.store = SubmissionStore(output_dir)
+        self.stored = self.store.stored_ids()
+        # Names seen before need no teams/problems call unless a new team shows up
+        self.teams, self.problems = self.store.names()
+
+    def refresh_names(self, submissions):
+        """Fetch team names / problem labels only when a submission refers to one we don't know."""
+        if any(str(s["team_id"]) not in self.teams for s in submissions):
+            self.teams = {str(t["id"]): t.get("display_name") or t.get("name") for t in api_get("teams")}
+        if any(str(s["problem_id"]) not in self.problems for s in submissions):
+            self.problems = {str(p["id"]): p.get("label") or p.get("short_name") for p in api_get("problems")}
+
+    def directory_for(self, submission):
+        team_id = str(submission["team_id"])
+        problem_id = str(submission["problem_id"])
+        team = f"{team_id} - {safe_name(self.teams.get(team_id, team_id))}"
+        problem = safe_name(self.problems.get(problem_id) or problem_id)
+        return os.path.join(self.output_dir, team, problem, safe_name(submission["id"]))
+
+    def link_tree(self, submission, files, digests):
+        """Browsable <team>/<problem>/<id>/<file> view; hard links, so no extra disk."""
+        directory = self.directory_for(submission)
+        os.makedirs(directory, exist_ok=True)
+        for (filename, _), digest in zip(files, digests):
+            path = os.path.join(directory, filename)
+            if os.path.exists(path):
+                continue
+            try:
+                os.link(self.store.blob_path(digest), path)
+            except OSError:
+                shutil.copyfile(self.store.blob_path(digest), path)
+
+    def store_submission(self, submission, source_files):
+        files = [(safe_name(f.get("filename") or "source"), base64.b64decode(f["source"])) for f in source_files]
+        record = {
+            "id": str(submission["id"]),
+            "team_id": str(submission["team_id"]),
+            "problem_id": str(submission["problem_id"]),
+            "team": self.teams.get(str(submission["team_id"])),
+            "problem": self.problems.get(str(submission["problem_id"])),
+            "language_id": submission.get("language_id"),
+            "time": submission.get("time"),
+            "contest_time": submission.get("contest_time"),
+        }
+        digests = self.store.add(record, files)
+        self.stored.add(record["id"])
+        if self.tree:
+            self.link_tree(record, files, digests)
+
+    def close(self):
+        self.store.close()
+
+
+def fetch_source(submission_id):
+    return api_get(f"submissions/{submission_id}/source-code")
+
+
+def sync(mirror, workers):
+    """One mirroring pass; returns (new, stored, failed) counts."""
+    submissions = api_get("submissions")
+    new = [s for s in submissions if str(s["id"]) not in mirror.stored]
+    if not new:
+        return 0, 0, 0
+    mirror.refresh_names(new)
+
+    stored = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_source, s["id"]): s for s in new}
+        for future in as_completed(futures):
+            submission = futures[future]
+            try:
+                files = future.result()
+            except requests.RequestException as e:
+                # Not indexed, so the next pass tries it again
+                print(f"❌ Submission {submission['id']}: {e}")
+                failed += 1
+                continue
+            mirror.store_submission(submission, files)
+            stored += 1
+            print(f"Submissions {stored}/{len(new)} downloaded.", end="\r")
+    print()
+    return len(new), stored, failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download new contest submissions as source files.")
+    parser.add_argument("--output", default=OUTPUT_DIR, help=f"Mirror directory. Default: {OUTPUT_DIR}")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Parallel source downloads. Default: $DOMJUDGE_MAX_WORKERS or 8")
+    parser.add_argument("--no-tree", dest="tree", action="store_false",
+                        help="Don't hard-link sources into <output>/<team>/<problem>/<id>/")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Keep mirroring, polling every this many seconds. Default: run once")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    session.resize_pool(args.workers)
+    mirror = SubmissionMirror(args.output, tree=args.tree)
+    print(f"📂 {len(mirror.stored)} submissions already in {args.output}")
 
+    try:
+        while True:
+            start = time.time()
+            try:
+                new, stored, failed = sync(mirror, args.workers)
+            except requests.RequestException as e:
+                if not args.interval:
+                    raise
+                print(f"❌ Pass failed, retrying in {args.interval:g}s: {e}")
+                time.sleep(args.interval)
+                continue
+            print(f"✅ {stored}/{new} new submissions stored, {failed} failed, "
+                  f"{len(mirror.stored)} total ({time.time() - start:.1f}s)")
+            if not args.interval:
+                break
+            time.sleep(max(0.0, args.interval - (time.time() - start)))
+    except KeyboardInterrupt:
+        print()
 
-PHPSESSID = os.environ.get("snl2knsoq9crm4ir78cdvtudt5", "")
-
-cookies = {
-    "domjudge_refresh": "1",
-    "domjudge_scorefilter": "%5B%5D",
-    "domjudge_refresh": "1",
-    "PHPSESSID": PHPSESSID,
-}
-
-headers = {
-    "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-    "accept-language": "en-US,en;q=0.9,fa;q=0.8",
-    "cache-control": "no-cache",
-    "dnt": "1",
-    "origin": "https://bircpc.ir",
-    "pragma": "no-cache",
-    "priority": "u=0, i",
-    "referer": "https://bircpc.ir/jury/affiliations/add",
-    "sec-ch-ua": '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
-    "sec-ch-ua-mobile": "?0",
-    "sec-ch-ua-platform": '"Windows"',
-    "sec-fetch-dest": "document",
-    "sec-fetch-mode": "navigate",
-    "sec-fetch-site": "same-origin",
-    "sec-fetch-user": "?1",
-    "upgrade-insecure-requests": "1",
-    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-}
-
-for i in range(300):
-    url = f"https://bircpc.ir/jury/submissions/{i}/source?fetch=0"
-
-    response = requests.get(url, headers=headers, cookies=cookies)
-    with open(f"submitions/{i}.html", "wb") as f:
-        f.write(response.content)
+    stats = mirror.store.stats()
+    mirror.close()
+    print(f"💾 {stats['submissions']} submissions in {stats['blobs']} blobs "
+          f"({stats['blob_bytes']} of {stats['source_bytes']} source bytes kept)")
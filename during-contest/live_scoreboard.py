@@ -0,0 +1,402 @@
+"""Live scoreboard fed by the DOMjudge event feed, served to any number of local consumers.
+
+One long-lived connection follows /api/v4/contests/{cid}/event-feed. Each
+submission or judgement event recomputes only the affected team × problem
+cell and moves that team inside an always-sorted ranking; the standings are
+rendered on demand from memory. Projectors, the Telegram bot and the Excel
+exporters read from here instead of polling DOMjudge:
+
+    GET /scoreboard.json                   rows like the DOMjudge API scoreboard
+    GET /api/v4/contests/{cid}/scoreboard  same rows, so existing API clients work unchanged
+    GET /api/v4/teams                      teams seen in the feed (name + affiliation)
+    GET /scoreboard.csv                    the columns extract_excel_from_scoreboard_api.py writes
+
+With --public, judgements of submissions made after the scoreboard freeze
+are shown as pending, like the public DOMjudge scoreboard.
+"""
+import argparse
+import bisect
+import csv
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.domjudge_client import DomjudgeClient  # noqa: E402
+
+load_dotenv()
+
+CONTEST_ID = os.environ.get("DOMJUDGE_CONTEST_ID", 3)
+PORT = 8090
+
+# Used until the feed sends judgement-types; matches DOMjudge's defaults
+DEFAULT_JUDGEMENT_TYPES = {
+    "AC": {"solved": True, "penalty": False},
+    "CE": {"solved": False, "penalty": False},
+}
+
+RELTIME_RE = re.compile(r"(-)?(\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+
+def parse_reltime(value):
+    """Seconds from a contest-relative time like "1:23:45.678" (None stays None)."""
+    if value is None:
+        return None
+    match = RELTIME_RE.fullmatch(value)
+    if not match:
+        raise ValueError(f"Bad contest time: {value!r}")
+    sign, hours, minutes, seconds = match.groups()
+    total = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return -total if sign else total
+
+
+class LiveScoreboard:
+    """In-memory ICPC scoreboard built from feed events. All methods take the lock."""
+
+    def __init__(self, public=False):
+        self.public = public
+        self.lock = threading.Lock()
+        self.version = 0
+        self.penalty_minutes = 20
+        self.freeze_at = None
+        self.judgement_types = dict(DEFAULT_JUDGEMENT_TYPES)
+        self.problems = {}
+        self.organizations = {}
+        self.group_sortorder = {}
+        self.teams = {}
+        self.submissions = {}
+        self.judgements = {}
+        self.verdicts = {}
+        self.by_cell = {}
+        self.cells = {}
+        self.totals = {}
+        self.ranking = []
+        self._solves = {}
+        self._first = {}
+        self._rendered = {}
+
+    # -- events ----------------------------------------------------------
+
+    def apply(self, event):
+        """Apply one event-feed line (old "op" style or the newer "token" style)."""
+        kind = event.get("type")
+        data = event.get("data")
+        deleted = event.get("op") == "delete" or data is None
+        object_id = str((data or {}).get("id") or event.get("id"))
+        with self.lock:
+            handler = getattr(self, "_on_" + kind.replace("-", "_"), None)
+            if handler is not None:
+                handler(object_id, None if deleted else data)
+                self.version += 1
+
+    def _on_contest(self, object_id, data):
+        if data:
+            self.penalty_minutes = int(data.get("penalty_time", self.penalty_minutes))
+            duration = parse_reltime(data.get("duration"))
+            freeze = parse_reltime(data.get("scoreboard_freeze_duration"))
+            self.freeze_at = duration - freeze if duration is not None and freeze else None
+
+    _on_contests = _on_contest
+
+    def _on_judgement_types(self, object_id, data):
+        if data:
+            self.judgement_types[object_id] = {"solved": bool(data.get("solved")),
+                                               "penalty": bool(data.get("penalty"))}
+
+    def _on_problems(self, object_id, data):
+        if data:
+            self.problems[object_id] = {"id": object_id, "label": data.get("label") or data.get("short_name"),
+                                        "ordinal": data.get("ordinal", len(self.problems))}
+        else:
+            self.problems.pop(object_id, None)
+
+    def _on_organizations(self, object_id, data):
+        if data:
+            self.organizations[object_id] = data.get("formal_name") or data.get("name")
+
+    def _on_groups(self, object_id, data):
+        # The sort order is part of the sort key: take the group's teams out before changing it
+        members = [(team_id, self.totals.get(team_id, (0, 0, 0))) for team_id, team in self.teams.items()
+                   if object_id in team["group_ids"]]
+        for team_id, _ in members:
+            self._move(team_id, None)
+        if data:
+            self.group_sortorder[object_id] = int(data.get("sortorder") or 0)
+        else:
+            self.group_sortorder.pop(object_id, None)
+        for team_id, totals in members:
+            self._move(team_id, totals)
+
+    def _on_teams(self, object_id, data):
+        if data is None:
+            self._move(object_id, None)
+            self.teams.pop(object_id, None)
+            return
+        # The name is part of the sort key: take the team out before renaming it
+        totals = self.totals.get(object_id, (0, 0, 0))
+        self._move(object_id, None)
+        self.teams[object_id] = {
+            "id": object_id,
+            "name": data.get("display_name") or data.get("name"),
+            "organization_id": data.get("organization_id"),
+            "group_ids": [str(g) for g in data.get("group_ids") or []],
+            "hidden": bool(data.get("hidden")),
+        }
+        self._move(object_id, totals)
+
+    def _on_submissions(self, object_id, data):
+        submission = self.submissions.pop(object_id, None)
+        if submission:
+            self.by_cell[(submission["team_id"], submission["problem_id"])].discard(object_id)
+            self._rescore(submission["team_id"], submission["problem_id"])
+        if data is not None:
+            submission = {
+                "id": object_id,
+                "team_id": str(data["team_id"]),
+                "problem_id": str(data["problem_id"]),
+                "time": parse_reltime(data.get("contest_time")),
+            }
+            self.submissions[object_id] = submission
+            self.by_cell.setdefault((submission["team_id"], submission["problem_id"]), set()).add(object_id)
+            self._rescore(submission["team_id"], submission["problem_id"])
+
+    def _on_judgements(self, object_id, data):
+        if data is None or data.get("valid") is False:
+            judgement = self.judgements.pop(object_id, None)
+            submission_id = judgement and judgement["submission_id"]
+            if submission_id and self.verdicts.get(submission_id, (None, None))[1] == object_id:
+                self.verdicts.pop(submission_id)
+        else:
+            submission_id = str(data["submission_id"])
+            self.judgements[object_id] = {"submission_id": submission_id}
+            if not data.get("judgement_type_id"):
+                return  # Still judging: an update with the verdict follows
+            # The newest valid judgement wins, which is how rejudgings show up
+            self.verdicts[submission_id] = (data["judgement_type_id"], object_id)
+        submission = self.submissions.get(submission_id) if submission_id else None
+        if submission:
+            self._rescore(submission["team_id"], submission["problem_id"])
+
+    # -- scoring ---------------------------------------------------------
+
+    def _rescore(self, team_id, problem_id):
+        """Recompute one team × problem cell from its submissions, then the team's totals and position."""
+        submissions = sorted(
+            (self.submissions[i] for i in self.by_cell.get((team_id, problem_id), ())),
+            key=lambda s: (s["time"] or 0, len(s["id"]), s["id"]),
+        )
+        cell = {"num_judged": 0, "num_pending": 0, "solved": False, "time": 0, "exact_time": None, "wrong": 0}
+        for submission in submissions:
+            verdict = self.verdicts.get(submission["id"], (None, None))[0]
+            if verdict is None or (self.public and self.freeze_at is not None
+                                   and (submission["time"] or 0) >= self.freeze_at):
+                cell["num_pending"] += 1
+                continue
+            cell["num_judged"] += 1
+            flags = self.judgement_types.get(verdict, {"solved": False, "penalty": True})
+            if flags["solved"]:
+                cell["solved"] = True
+                cell["exact_time"] = submission["time"] or 0
+                cell["time"] = int(cell["exact_time"] // 60)
+                break
+            if flags["penalty"]:
+                cell["wrong"] += 1
+        self.cells.setdefault(team_id, {})[problem_id] = cell
+
+        solves = self._solves.setdefault(problem_id, {})
+        if cell["solved"]:
+            solves[team_id] = cell["exact_time"]
+        else:
+            solves.pop(team_id, None)
+        self._first[problem_id] = min(solves.items(), key=lambda item: item[1])[0] if solves else None
+
+        solved = penalty = last = 0
+        for c in self.cells[team_id].values():
+            if c["solved"]:
+                solved += 1
+                penalty += c["time"] + self.penalty_minutes * c["wrong"]
+                last = max(last, c["time"])
+        self._move(team_id, (solved, penalty, last))
+
+    def sortorder(self, team_id):
+        """The team's category sort order; DOMjudge ranks each sort order separately."""
+        groups = (self.teams.get(team_id) or {}).get("group_ids") or []
+        return min((self.group_sortorder.get(g, 0) for g in groups), default=0)
+
+    def _rank_key(self, team_id):
+        solved, penalty, last = self.totals[team_id]
+        return (self.sortorder(team_id), -solved, penalty, last, (self.teams.get(team_id) or {}).get("name") or "")
+
+    def _move(self, team_id, totals):
+        """Reposition a team in the sorted ranking: O(log n) search instead of a full re-sort."""
+        if team_id in self.totals:
+            old = (self._rank_key(team_id), team_id)
+            index = bisect.bisect_left(self.ranking, old)
+            if index < len(self.ranking) and self.ranking[index] == old:
+                self.ranking.pop(index)
+        if totals is None:
+            self.totals.pop(team_id, None)
+            return
+        self.totals[team_id] = totals
+        bisect.insort(self.ranking, (self._rank_key(team_id), team_id))
+
+    # -- output ----------------------------------------------------------
+
+    def rows(self):
+        """Scoreboard rows in the DOMjudge API format, ranked per category sort order, ties sharing a rank."""
+        with self.lock:
+            problems = sorted(self.problems.values(), key=lambda p: p["ordinal"])
+            rows = []
+            rank = position = 0
+            previous = None
+            for key, team_id in self.ranking:
+                if self.teams.get(team_id, {}).get("hidden"):
+                    continue
+                if previous is None or key[0] != previous[0]:
+                    position = 0  # a new sort order starts again from rank 1
+                position += 1
+                if key[:4] != previous:
+                    rank, previous = position, key[:4]
+                cells = self.cells.get(team_id, {})
+                row_problems = []
+                for problem in problems:
+                    cell = cells.get(problem["id"]) or {"num_judged": 0, "num_pending": 0, "solved": False, "time": 0}
+                    entry = {"label": problem["label"], "problem_id": problem["id"],
+                             "num_judged": cell["num_judged"], "num_pending": cell["num_pending"],
+                             "solved": cell["solved"]}
+                    if cell["solved"]:
+                        entry["time"] = cell["time"]
+                        entry["first_to_solve"] = self._first.get(problem["id"]) == team_id
+                    row_problems.append(entry)
+                solved, penalty, _ = self.totals[team_id]
+                rows.append({"rank": rank, "team_id": team_id,
+                             "score": {"num_solved": solved, "total_time": penalty},
+                             "problems": row_problems})
+            return rows
+
+    def team_list(self):
+        with self.lock:
+            return [
+                {"id": t["id"], "name": t["name"], "organization_id": t["organization_id"],
+                 "affiliation": self.organizations.get(t["organization_id"], "N/A")}
+                for t in self.teams.values()
+            ]
+
+    def render(self, fmt):
+        """Encoded JSON/CSV/teams payload, cached until the next event changes the board."""
+        cached = self._rendered.get(fmt)
+        version = self.version
+        if cached and cached[0] == version:
+            return cached[1]
+        if fmt == "json":
+            payload = json.dumps({"rows": self.rows()}, ensure_ascii=False).encode("utf-8")
+        elif fmt == "teams":
+            payload = json.dumps(self.team_list(), ensure_ascii=False).encode("utf-8")
+        else:
+            teams = {t["id"]: t for t in self.team_list()}
+            out = io.StringIO()
+            writer = csv.writer(out)
+            writer.writerow(["Team name", "University name", "Rank", "Count of correct answers",
+                             "Count of first answers", "Did they have any submissions"])
+            for row in self.rows():
+                team = teams.get(row["team_id"], {})
+                writer.writerow([
+                    team.get("name", "Unknown"), team.get("affiliation", "N/A"), row["rank"],
+                    row["score"]["num_solved"],
+                    sum(1 for p in row["problems"] if p.get("first_to_solve")),
+                    int(any(p["num_judged"] > 0 or p["num_pending"] > 0 for p in row["problems"])),
+                ])
+            payload = out.getvalue().encode("utf-8")
+        self._rendered[fmt] = (version, payload)
+        return payload
+
+
+def follow_event_feed(board, session, url, stop=None, retry_delay=2):
+    """Consume the event feed forever, resuming after the last token on reconnect."""
+    since = {}
+    while stop is None or not stop.is_set():
+        try:
+            with session.get(url, params=since, stream=True, timeout=(10, 300)) as resp:
+                resp.raise_for_status()
+                print(f"📡 Following {resp.url}")
+                for line in resp.iter_lines():
+                    if not line:
+                        continue  # keep-alive newline
+                    event = json.loads(line)
+                    board.apply(event)
+                    if "token" in event:
+                        since = {"since_token": event["token"]}
+                    elif "id" in event and "op" in event:
+                        since = {"since_id": event["id"]}
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ Event feed interrupted: {e}")
+        if stop is not None and stop.wait(retry_delay):
+            break
+        if stop is None:
+            time.sleep(retry_delay)
+
+
+class ScoreboardHandler(BaseHTTPRequestHandler):
+    board = None
+    routes = {}
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        fmt = self.routes.get(path)
+        if fmt is None:
+            self.send_error(404)
+            return
+        payload = self.board.render(fmt)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8" if fmt == "csv"
+                         else "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(board, port, contest_id):
+    routes = {
+        "/scoreboard.json": "json",
+        "/scoreboard.csv": "csv",
+        f"/api/v4/contests/{contest_id}/scoreboard": "json",
+        "/api/v4/teams": "teams",
+        f"/api/v4/contests/{contest_id}/teams": "teams",
+    }
+    handler = type("Handler", (ScoreboardHandler,), {"board": board, "routes": routes})
+    return ThreadingHTTPServer(("0.0.0.0", port), handler)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve live standings from the DOMjudge event feed.")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Local HTTP port. Default: {PORT}")
+    parser.add_argument("--public", action="store_true", help="Hide results of submissions after the freeze")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Basic auth from DOMJUDGE_USERNAME/PASSWORD; connection errors and 5xx are retried with backoff
+    session = DomjudgeClient.from_env()
+    board = LiveScoreboard(public=args.public)
+    feed_url = f"{session.base_url}/api/v4/contests/{CONTEST_ID}/event-feed"
+    threading.Thread(target=follow_event_feed, args=(board, session, feed_url), daemon=True).start()
+
+    server = serve(board, args.port, CONTEST_ID)
+    print(f"🏆 Live scoreboard on http://localhost:{args.port}/scoreboard.json (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,122 @@
+"""Content-addressed store for mirrored submission sources.
+
+    submitions/
+      blobs/ab/ab12...ef      one file per distinct source, named by its sha256
+      index.sqlite            submissions + files tables pointing at the blobs
+
+A resubmission of identical code adds a row, not a file. Analysis scripts
+query index.sqlite (by problem, team, language, ...) and read only the blobs
+they need instead of walking a directory of duplicates.
+"""
+import hashlib
+import os
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    team_id TEXT NOT NULL,
+    team TEXT,
+    problem_id TEXT NOT NULL,
+    problem TEXT,
+    language_id TEXT,
+    time TEXT,
+    contest_time TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    submission_id TEXT NOT NULL REFERENCES submissions(id),
+    filename TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (submission_id, filename)
+);
+CREATE INDEX IF NOT EXISTS submissions_problem ON submissions(problem_id);
+CREATE INDEX IF NOT EXISTS files_blob ON files(blob);
+"""
+
+SUBMISSION_COLUMNS = ("id", "team_id", "team", "problem_id", "problem", "language_id", "time", "contest_time")
+
+
+class SubmissionStore:
+    """Blob directory plus SQLite index under `root`. Use from a single thread."""
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def put_blob(self, data):
+        """Store `data` once under its sha256; returns the hex digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def read_blob(self, digest):
+        with open(self.blob_path(digest), "rb") as f:
+            return f.read()
+
+    def stored_ids(self):
+        return {row[0] for row in self.db.execute("SELECT id FROM submissions")}
+
+    def names(self):
+        """({team_id: team name}, {problem_id: problem label}) as last stored."""
+        teams = dict(self.db.execute("SELECT team_id, team FROM submissions GROUP BY team_id"))
+        problems = dict(self.db.execute("SELECT problem_id, problem FROM submissions GROUP BY problem_id"))
+        return teams, problems
+
+    def add(self, submission, files):
+        """Record a submission and its [(filename, bytes)]; blobs are written before the rows."""
+        rows = [(submission["id"], filename, self.put_blob(data), len(data)) for filename, data in files]
+        with self.db:
+            self.db.execute(
+                f"INSERT OR REPLACE INTO submissions ({', '.join(SUBMISSION_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(SUBMISSION_COLUMNS))})",
+                [submission.get(column) for column in SUBMISSION_COLUMNS],
+            )
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows)
+        return [digest for _, _, digest, _ in rows]
+
+    def submissions(self, problem_id=None):
+        """Submission dicts with a `files` list of (filename, blob), optionally for one problem."""
+        where, params = "", ()
+        if problem_id is not None:
+            where, params = " WHERE problem_id = ?", (str(problem_id),)
+        files = {}
+        for submission_id, filename, digest in self.db.execute(
+                "SELECT submission_id, filename, blob FROM files "
+                f"WHERE submission_id IN (SELECT id FROM submissions{where}) ORDER BY filename", params):
+            files.setdefault(submission_id, []).append((filename, digest))
+        query = f"SELECT {', '.join(SUBMISSION_COLUMNS)} FROM submissions{where}"
+        for row in self.db.execute(query + " ORDER BY CAST(id AS INTEGER), id", params):
+            submission = dict(zip(SUBMISSION_COLUMNS, row))
+            submission["files"] = files.get(submission["id"], [])
+            yield submission
+
+    def stats(self):
+        submissions, = self.db.execute("SELECT COUNT(*) FROM submissions").fetchone()
+        blobs, blob_bytes = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM (SELECT blob, MAX(size) AS size FROM files GROUP BY blob)"
+        ).fetchone()
+        total_bytes, = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()
+        return {"submissions": submissions, "blobs": blobs, "blob_bytes": blob_bytes, "source_bytes": total_bytes}
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,177 @@
+"""Time the automation scripts against the fake DOMjudge.
+
+Every scenario runs the real script in a subprocess, pointed at a fresh
+FakeDOMjudge seeded for the dataset size, and records wall time, requests
+served, requests per second and the child's peak RSS.
+
+    python tools/benchmark.py                            # 100, 1000, 10000 teams
+    python tools/benchmark.py --sizes 1000 --latency 0.02 --scenarios create_teams
+    python tools/benchmark.py --output bench.json
+    python tools/benchmark.py --baseline bench.json      # exit 1 on a slowdown
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_domjudge import FakeDOMjudge
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_create_teams(workdir, size, extra_args):
+    with open(os.path.join(workdir, "bench_credentials.tsv"), "w", encoding="utf8") as f:
+        f.write("TeamName\tUsername\tPassword\tUniName\n")
+        for t in range(1, size + 1):
+            f.write(f"Bench Team {t}\tB{t:06d}\tpass{t}\tBench University {t % max(1, size // 10)}\n")
+    argv = [os.path.join(REPO_DIR, "before-contest", "create_teams.py"), *extra_args]
+    return FakeDOMjudge(teams=0), argv, "y\n"
+
+
+def prepare_delete(workdir, size, extra_args):
+    argv = [os.path.join(REPO_DIR, "before-contest", "delete_all_users_teams_affiliations.py"), *extra_args]
+    return FakeDOMjudge(teams=size), argv, ""
+
+
+def prepare_download_submissions(workdir, size, extra_args):
+    os.makedirs(os.path.join(workdir, "submitions"), exist_ok=True)
+    argv = [os.path.join(REPO_DIR, "during-contest", "download_submitions.py"), *extra_args]
+    return FakeDOMjudge(teams=size), argv, ""
+
+
+def prepare_scoreboard_api(workdir, size, extra_args):
+    argv = [os.path.join(REPO_DIR, "after-contest", "extract_excel_from_scoreboard_api.py"), *extra_args]
+    return FakeDOMjudge(teams=size), argv, ""
+
+
+def prepare_scoreboard_html(workdir, size, extra_args):
+    argv = [os.path.join(REPO_DIR, "after-contest", "extract_excel_from_scoreboard_html.py"), *extra_args]
+    return FakeDOMjudge(teams=size), argv, ""
+
+
+SCENARIOS = {
+    "create_teams": prepare_create_teams,
+    "delete_all": prepare_delete,
+    "download_submissions": prepare_download_submissions,
+    "scoreboard_api": prepare_scoreboard_api,
+    "scoreboard_html": prepare_scoreboard_html,
+}
+
+
+def run_scenario(name, size, latency, error_rate, extra_args, timeout):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        fake, argv, stdin = SCENARIOS[name](workdir, size, extra_args)
+        fake.latency = latency
+        fake.error_rate = error_rate
+        with fake:
+            env = dict(
+                os.environ,
+                DOMJUDGE_API_BASE=fake.url,
+                DOMJUDGE_CONTEST_ID=fake.contest_id,
+                DOMJUDGE_USERNAME="admin",
+                DOMJUDGE_PASSWORD="admin",
+                PHPSESSID="benchmark",
+                CONTEST_BASE_DIR=workdir,
+                CONTEST_STATE_NAME="bench",
+                DOMJUDGE_LEAGUE="bench",
+                SCOREBOARD_HTML=f"{fake.url}/public",
+            )
+            log_path = os.path.join(workdir, "output.log")
+            with open(log_path, "w+b") as log:
+                start = time.perf_counter()
+                proc = subprocess.Popen([sys.executable, *argv], cwd=workdir, env=env,
+                                        stdin=subprocess.PIPE, stdout=log, stderr=subprocess.STDOUT)
+                proc.stdin.write(stdin.encode())
+                proc.stdin.close()
+                deadline = start + timeout
+                while True:
+                    pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                    if pid:
+                        break
+                    if time.perf_counter() > deadline:
+                        proc.kill()
+                        pid, status, usage = os.wait4(proc.pid, 0)
+                        break
+                    time.sleep(0.01)
+                wall = time.perf_counter() - start
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                log.seek(0)
+                tail = log.read().decode("utf-8", "replace").strip().splitlines()[-3:]
+
+            requests_served = sum(v for k, v in fake.stats.items() if k != "not_found")
+            return {
+                "scenario": name,
+                "size": size,
+                "exit_code": proc.returncode,
+                "wall_s": round(wall, 3),
+                "requests": requests_served,
+                "not_found": fake.stats.get("not_found", 0),
+                "rps": round(requests_served / wall, 1) if wall else 0.0,
+                "bytes": fake.bytes_sent,
+                "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+                "output_tail": tail,
+            }
+
+
+def compare(results, baseline, tolerance):
+    """Return the results whose wall time got worse than baseline by more than `tolerance`."""
+    previous = {(r["scenario"], r["size"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["size"]))
+        if before is None or result["exit_code"] != 0:
+            continue
+        if result["wall_s"] > before["wall_s"] * (1 + tolerance):
+            regressions.append((result, before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the automation scripts against a fake DOMjudge.")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma separated team counts")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated scenario names")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fake request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake requests answered with 500")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds before a run is killed")
+    parser.add_argument("--create-teams-args", default="", help="Extra arguments for create_teams.py")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON from a previous --output run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    scenarios = args.scenarios.split(",")
+    extra = {"create_teams": args.create_teams_args.split()}
+
+    results = []
+    print(f"{'scenario':<22}{'teams':>7}{'exit':>6}{'wall s':>10}{'requests':>10}{'req/s':>10}{'peak MB':>9}")
+    for name in scenarios:
+        for size in sizes:
+            result = run_scenario(name, size, args.latency, args.error_rate, extra.get(name, []), args.timeout)
+            results.append(result)
+            print(f"{name:<22}{size:>7}{result['exit_code']:>6}{result['wall_s']:>10.3f}"
+                  f"{result['requests']:>10}{result['rps']:>10.1f}{result['peak_rss_mb']:>9.1f}")
+            if result["exit_code"] != 0:
+                for line in result["output_tail"]:
+                    print(f"    | {line}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 Written {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for result, before in regressions:
+            print(f"❌ {result['scenario']} @ {result['size']}: {before['wall_s']}s -> {result['wall_s']}s")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
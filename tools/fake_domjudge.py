@@ -0,0 +1,465 @@
+"""In-process stand-in for the parts of the DOMjudge v4 API these scripts use.
+
+    fake = FakeDOMjudge(teams=1000, latency=0.02, error_rate=0.01).start()
+    ... point DOMJUDGE_API_BASE at fake.url ...
+    fake.stop()
+
+Or run it on its own:  python tools/fake_domjudge.py --teams 1000 --port 8080
+
+With web_login=True the /jury pages behave like DOMjudge's: without a
+session cookie they redirect to /login, which wants the CSRF token from its
+form; expire_web_sessions() logs everybody out.
+"""
+import argparse
+import base64
+import email.parser
+import email.policy
+import hashlib
+import html
+import io
+import json
+import random
+import re
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+LANGUAGES = ["cpp", "c", "java", "python3"]
+
+
+class FakeDOMjudge:
+    """Thread-safe in-memory DOMjudge with configurable latency and error rate.
+
+    `teams` pre-seeds that many organizations/teams/users, `submissions_per_team`
+    submissions each, and a matching scoreboard. Every handled request is counted
+    in `stats` under its route name.
+    """
+
+    def __init__(self, teams=0, problems=8, submissions_per_team=3, latency=0.0, error_rate=0.0,
+                 contest_id="1", seed=0, host="127.0.0.1", port=0, etags=False, web_login=False,
+                 web_password="admin", scoreboard_contests=None):
+        self.contest_id = str(contest_id)
+        self.etags = etags
+        self.web_login = web_login
+        self.web_password = web_password
+        self.web_sessions = set()
+        self.csrf_tokens = set()
+        self.scoreboard_contests = {str(c) for c in scoreboard_contests or [contest_id]}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+        self.stats = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+        self.organizations = {}
+        self.teams = {}
+        self.users = {}
+        self.problems = [{"id": str(p), "label": chr(ord("A") + p % 26), "name": f"Problem {p}"}
+                         for p in range(1, problems + 1)]
+        self.submissions = {}
+        self.sources = {}
+        self._seed(teams, submissions_per_team)
+
+    # -- dataset ---------------------------------------------------------
+
+    def _seed(self, teams, submissions_per_team):
+        orgs = max(1, teams // 10)
+        for o in range(1, orgs + 1):
+            name = f"University {o}"
+            self.organizations[name] = {"id": name, "name": name, "formal_name": name, "country": "IRN"}
+        submission_id = 0
+        for t in range(1, teams + 1):
+            team_id = str(t)
+            org = f"University {(t - 1) % orgs + 1}"
+            self.teams[team_id] = {"id": team_id, "name": f"Team {t}", "display_name": f"Team {t}",
+                                   "organization_id": org, "affiliation": org, "group_ids": ["3"]}
+            self.users[team_id] = {"id": team_id, "username": f"team{t:05d}", "name": f"Team {t}",
+                                   "team_id": team_id, "roles": ["team"], "enabled": True}
+            for _ in range(submissions_per_team):
+                submission_id += 1
+                problem = self._random.choice(self.problems)
+                minute = self._random.randint(0, 299)
+                self.submissions[str(submission_id)] = {
+                    "id": str(submission_id), "team_id": team_id, "problem_id": problem["id"],
+                    "language_id": self._random.choice(LANGUAGES),
+                    "time": f"2025-01-01T{8 + minute // 60:02d}:{minute % 60:02d}:00.000+03:30",
+                    "contest_time": f"{minute // 60}:{minute % 60:02d}:00.000",
+                    "verdict": self._random.choice(["AC", "WA", "WA", "TLE"]),
+                }
+                self.sources[str(submission_id)] = (
+                    f"// team {t} problem {problem['label']}\n"
+                    f"#include <bits/stdc++.h>\nint main() {{ return {submission_id % 7}; }}\n"
+                )
+
+    def scoreboard_rows(self):
+        by_team = {}
+        first_solve = {}
+        for sub in sorted(self.submissions.values(), key=lambda s: s["contest_time"]):
+            cell = by_team.setdefault(sub["team_id"], {}).setdefault(
+                sub["problem_id"], {"num_judged": 0, "num_pending": 0, "solved": False, "time": 0})
+            if cell["solved"]:
+                continue
+            cell["num_judged"] += 1
+            if sub["verdict"] == "AC":
+                cell["solved"] = True
+                hours, minutes, _ = sub["contest_time"].split(":")
+                cell["time"] = int(hours) * 60 + int(minutes)
+                first_solve.setdefault(sub["problem_id"], sub["team_id"])
+        rows = []
+        for team_id in self.teams:
+            cells = by_team.get(team_id, {})
+            problems = []
+            solved = total_time = 0
+            for problem in self.problems:
+                cell = cells.get(problem["id"], {"num_judged": 0, "num_pending": 0, "solved": False, "time": 0})
+                if cell["solved"]:
+                    solved += 1
+                    total_time += cell["time"] + 20 * (cell["num_judged"] - 1)
+                problems.append({"label": problem["label"], "problem_id": problem["id"], **cell,
+                                 "first_to_solve": first_solve.get(problem["id"]) == team_id})
+            rows.append({"team_id": team_id, "score": {"num_solved": solved, "total_time": total_time},
+                         "problems": problems})
+        rows.sort(key=lambda r: (-r["score"]["num_solved"], r["score"]["total_time"]))
+        for rank, row in enumerate(rows, start=1):
+            row["rank"] = rank
+        return rows
+
+    def scoreboard_html(self):
+        out = ['<html><body><table class="scoreboard"><tbody>']
+        for row in self.scoreboard_rows():
+            team = self.teams[row["team_id"]]
+            out.append(
+                f'<tr><td class="scorepl">{row["rank"]}</td><td class="scoreaf"></td>'
+                f'<td class="scoretn"><a><span class="forceWidth">{html.escape(team["name"])}</span>'
+                f'<span class="univ forceWidth">{html.escape(team["affiliation"])}</span></a></td>'
+                f'<td class="scorenc">{row["score"]["num_solved"]}</td>'
+                f'<td class="scorett">{row["score"]["total_time"]}</td>'
+            )
+            for cell in row["problems"]:
+                if cell["solved"]:
+                    cls = "score_correct score_first" if cell["first_to_solve"] else "score_correct"
+                elif cell["num_judged"]:
+                    cls = "score_incorrect"
+                else:
+                    cls = ""
+                out.append(f'<td class="score_cell"><a><div class="{cls}">{cell["num_judged"]}</div></a></td>')
+            out.append("</tr>")
+        out.append('<tr><td class="scoresummary">Summary</td></tr></tbody></table></body></html>')
+        return "".join(out)
+
+    # -- server lifecycle ------------------------------------------------
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    def start(self):
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def expire_web_sessions(self):
+        with self._lock:
+            self.web_sessions.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+            self.bytes_sent = 0
+
+    # -- request handling ------------------------------------------------
+
+    def dispatch(self, method, path, query, headers, body):
+        """Return (status, content_type, payload bytes) for one request."""
+        for route_method, pattern, name in ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.fullmatch(path)
+            if match:
+                with self._lock:
+                    self.stats[name] += 1
+                    if self.web_login and path.startswith("/jury") and not self._web_session(headers):
+                        self.stats["login_redirect"] += 1
+                        return 302, "text/html", b"", {"Location": "/login"}
+                if self.latency:
+                    time.sleep(self.latency)
+                if self.error_rate and self._random.random() < self.error_rate:
+                    return 500, "application/json", b'{"message": "injected error"}'
+                with self._lock:
+                    return getattr(self, "handle_" + name)(query, headers, body, **match.groupdict())
+        with self._lock:
+            self.stats["not_found"] += 1
+        return 404, "application/json", b'{"message": "not found"}'
+
+    def handle_list_organizations(self, query, headers, body, cid=None):
+        return _json(200, list(self.organizations.values()))
+
+    def handle_create_organization(self, query, headers, body, cid):
+        org = json.loads(body)
+        if org["id"] in self.organizations:
+            return _json(400, {"message": f"organization {org['id']} already exists"})
+        self.organizations[org["id"]] = org
+        return _json(201, org)
+
+    def handle_list_teams(self, query, headers, body, cid=None):
+        return _json(200, list(self.teams.values()))
+
+    def handle_get_team(self, query, headers, body, cid, team_id):
+        team = self.teams.get(team_id)
+        return _json(200, team) if team else _json(404, {"message": "not found"})
+
+    def handle_create_team(self, query, headers, body, cid):
+        team = json.loads(body)
+        team["id"] = str(team.get("id") or len(self.teams) + 1)
+        if team["id"] in self.teams:
+            return _json(400, {"message": f"team {team['id']} already exists"})
+        team.setdefault("affiliation", team.get("organization_id"))
+        self.teams[team["id"]] = team
+        return _json(201, team)
+
+    def handle_list_users(self, query, headers, body):
+        return _json(200, list(self.users.values()))
+
+    def handle_get_user(self, query, headers, body, user_id):
+        user = self.users.get(user_id)
+        return _json(200, user) if user else _json(404, {"message": "not found"})
+
+    def handle_create_user(self, query, headers, body):
+        user = json.loads(body)
+        user["id"] = str(user.get("id") or len(self.users) + 1)
+        if user["id"] in self.users or any(u["username"] == user["username"] for u in self.users.values()):
+            return _json(400, {"message": f"user {user['username']} already exists"})
+        user.pop("password", None)
+        self.users[user["id"]] = user
+        return _json(201, user)
+
+    def handle_import(self, query, headers, body, kind):
+        records = json.loads(_multipart_file(headers, body, "json"))
+        target = {"organizations": self.organizations, "teams": self.teams, "accounts": self.users}[kind]
+        for record in records:
+            record = dict(record, id=str(record["id"]))
+            record.pop("password", None)
+            if kind == "teams":
+                record.setdefault("affiliation", record.get("organization_id"))
+            target[record["id"]] = record
+        return _json(200, f"{len(records)} new {kind} successfully added.")
+
+    def handle_scoreboard(self, query, headers, body, cid):
+        return _json(200, {"rows": self.scoreboard_rows()})
+
+    def handle_scoreboard_html(self, query, headers, body):
+        return 200, "text/html; charset=utf-8", self.scoreboard_html().encode("utf-8")
+
+    def handle_info(self, query, headers, body):
+        return _json(200, {"api_version": 4, "domjudge": {"version": "8.2.0"}})
+
+    def handle_list_problems(self, query, headers, body, cid):
+        return _json(200, [dict(p, ordinal=i) for i, p in enumerate(self.problems)])
+
+    def handle_list_submissions(self, query, headers, body, cid):
+        public = [{k: v for k, v in s.items() if k != "verdict"} for s in self.submissions.values()]
+        return _json(200, public)
+
+    def events(self):
+        """The contest as event-feed lines (2023-06 style, with tokens)."""
+        events = [("contest", {"id": self.contest_id, "penalty_time": 20, "duration": "5:00:00.000",
+                               "scoreboard_freeze_duration": "1:00:00.000"})]
+        events += [("judgement-types", {"id": v, "solved": v == "AC", "penalty": v != "AC"})
+                   for v in ("AC", "WA", "TLE")]
+        events += [("problems", dict(p, ordinal=i)) for i, p in enumerate(self.problems)]
+        events += [("organizations", o) for o in self.organizations.values()]
+        events += [("teams", t) for t in self.teams.values()]
+        for sub in sorted(self.submissions.values(), key=lambda s: s["contest_time"]):
+            events.append(("submissions", {k: v for k, v in sub.items() if k != "verdict"}))
+            events.append(("judgements", {"id": sub["id"], "submission_id": sub["id"],
+                                          "judgement_type_id": sub["verdict"], "valid": True}))
+        return [{"type": kind, "id": data["id"], "data": data, "token": str(i)}
+                for i, (kind, data) in enumerate(events, 1)]
+
+    def handle_event_feed(self, query, headers, body, cid):
+        since = int(query.get("since_token", ["0"])[0])
+        lines = [json.dumps(e) + "\n" for e in self.events()[since:]]
+        return 200, "application/x-ndjson", "".join(lines).encode("utf-8")
+
+    def handle_source_code(self, query, headers, body, cid, submission_id):
+        source = self.sources.get(submission_id)
+        if source is None:
+            return _json(404, {"message": "not found"})
+        return _json(200, [{"id": submission_id, "submission_id": submission_id, "filename": "main.cpp",
+                            "source": base64.b64encode(source.encode()).decode()}])
+
+    def _web_session(self, headers):
+        morsel = SimpleCookie(headers.get("Cookie", "")).get("PHPSESSID")
+        return morsel is not None and morsel.value in self.web_sessions
+
+    def handle_login_page(self, query, headers, body):
+        token = hashlib.sha1(f"{time.time()}{self._random.random()}".encode()).hexdigest()
+        self.csrf_tokens.add(token)
+        page = (f'<html><body><form method="post"><input type="hidden" name="_csrf_token" value="{token}">'
+                f'<input name="_username"><input name="_password" type="password"></form></body></html>')
+        return 200, "text/html; charset=utf-8", page.encode("utf-8")
+
+    def handle_login(self, query, headers, body):
+        form = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+        if form.get("_csrf_token") not in self.csrf_tokens or form.get("_password") != self.web_password:
+            return 302, "text/html", b"", {"Location": "/login"}
+        self.csrf_tokens.discard(form["_csrf_token"])
+        session_id = hashlib.sha1(f"{form['_username']}{self._random.random()}".encode()).hexdigest()
+        self.web_sessions.add(session_id)
+        return 302, "text/html", b"", {"Location": "/jury", "Set-Cookie": f"PHPSESSID={session_id}; path=/"}
+
+    def handle_jury_home(self, query, headers, body):
+        return 200, "text/html", b"<html>Jury</html>"
+
+    def handle_scoreboard_zip(self, query, headers, body, cid):
+        if cid not in self.scoreboard_contests:
+            return 404, "text/html", b"<html>Contest not found</html>"
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("index.html", self.scoreboard_html())
+            archive.writestr("style.css", "table { border: 0 }")
+        return 200, "application/zip", buffer.getvalue()
+
+    def handle_jury_source(self, query, headers, body, submission_id):
+        source = self.sources.get(submission_id)
+        if source is None:
+            return 404, "text/html", b"<html>Submission not found</html>"
+        page = f"<html><body><pre>{html.escape(source)}</pre></body></html>"
+        return 200, "text/html; charset=utf-8", page.encode("utf-8")
+
+    def handle_jury_delete(self, query, headers, body, kind, entity_id):
+        target = {"users": self.users, "teams": self.teams}.get(kind)
+        if kind == "affiliations":
+            target = self.organizations
+            entity_id = next((k for k, v in self.organizations.items() if str(v["id"]) == entity_id), entity_id)
+        if target.pop(entity_id, None) is None:
+            return 404, "text/html", b"<html>Not found</html>"
+        return 302, "text/html", b""
+
+
+ROUTES = [(method, re.compile(pattern), name) for method, pattern, name in [
+    ("GET", r"/api/v4/info", "info"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/organizations", "list_organizations"),
+    ("GET", r"/api/v4/organizations", "list_organizations"),
+    ("POST", r"/api/v4/contests/(?P<cid>[^/]+)/organizations", "create_organization"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/teams", "list_teams"),
+    ("GET", r"/api/v4/teams", "list_teams"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/teams/(?P<team_id>[^/]+)", "get_team"),
+    ("POST", r"/api/v4/contests/(?P<cid>[^/]+)/teams", "create_team"),
+    ("GET", r"/api/v4/users", "list_users"),
+    ("GET", r"/api/v4/users/(?P<user_id>[^/]+)", "get_user"),
+    ("POST", r"/api/v4/users", "create_user"),
+    ("POST", r"/api/v4/users/(?P<kind>organizations|teams|accounts)", "import"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/scoreboard", "scoreboard"),
+    ("GET", r"/public", "scoreboard_html"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/problems", "list_problems"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/event-feed", "event_feed"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/submissions", "list_submissions"),
+    ("GET", r"/api/v4/contests/(?P<cid>[^/]+)/submissions/(?P<submission_id>[^/]+)/source-code", "source_code"),
+    ("GET", r"/login", "login_page"),
+    ("POST", r"/login", "login"),
+    ("GET", r"/jury", "jury_home"),
+    ("GET", r"/jury/contests/(?P<cid>[^/]+)/scoreboard-zip/unfrozen/contest.zip", "scoreboard_zip"),
+    ("GET", r"/jury/submissions/(?P<submission_id>[^/]+)/source", "jury_source"),
+    ("POST", r"/jury/(?P<kind>users|teams|affiliations)/(?P<entity_id>[^/]+)/delete", "jury_delete"),
+]]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self, method):
+        parsed = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, content_type, payload, *extra = self.fake.dispatch(
+            method, unquote(parsed.path).rstrip("/") or "/", parse_qs(parsed.query), self.headers, body)
+        etag = None
+        if self.fake.etags and method == "GET" and status == 200:
+            etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                status, payload = 304, b""
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        for name, value in (extra[0] if extra else {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        with self.fake._lock:
+            self.fake.bytes_sent += len(payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+def _json(status, obj):
+    return status, "application/json", json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _multipart_file(headers, body, field):
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + headers["Content-Type"].encode() + b"\r\n\r\n" + body)
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == field:
+            return part.get_payload(decode=True)
+    raise ValueError(f"multipart field '{field}' missing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake DOMjudge v4 API.")
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--problems", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--etags", action="store_true", help="Send ETags and answer If-None-Match with 304")
+    parser.add_argument("--web-login", action="store_true", help="Jury pages need a /login session (password admin)")
+    parser.add_argument("--contests", default="1", help="Comma separated contest IDs with a scoreboard zip")
+    args = parser.parse_args()
+
+    fake = FakeDOMjudge(teams=args.teams, problems=args.problems, latency=args.latency,
+                        error_rate=args.error_rate, port=args.port, etags=args.etags, web_login=args.web_login,
+                        scoreboard_contests=args.contests.split(",")).start()
+    print(f"🚀 Fake DOMjudge with {args.teams} teams on {fake.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,95 @@
+"""In-memory stand-in for the gspread Worksheet calls update_final_scoreboard_sheet.py makes.
+
+Keeps the grid as a list of rows (formulas stored as typed) and counts every
+call, so a sync can be checked for both the resulting sheet and how many
+Sheets API requests it would have cost:
+
+    sheet = FakeWorksheet([["Team name", "Total PTR"], ["A", 3]])
+    sync(sheet, df, contest_columns("7th"))
+    print(sheet.calls, sheet.grid)
+"""
+import re
+from collections import Counter
+
+A1_RE = re.compile(r"([A-Z]+)(\d+)")
+
+
+def parse_a1(cell):
+    letters, row = A1_RE.fullmatch(cell).groups()
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord("A") + 1
+    return int(row), col
+
+
+class FakeSpreadsheet:
+    def __init__(self, calls):
+        self.calls = calls
+        self.requests = []
+
+    def batch_update(self, body):
+        self.calls["spreadsheet.batch_update"] += 1
+        self.requests.extend(body["requests"])
+        return {}
+
+
+class FakeWorksheet:
+    def __init__(self, grid=None, sheet_id=0):
+        self.grid = [list(row) for row in grid or []]
+        self.calls = Counter()
+        self.spreadsheet = FakeSpreadsheet(self.calls)
+        self._properties = {"sheetId": sheet_id}
+
+    @property
+    def api_calls(self):
+        return sum(self.calls.values())
+
+    def _set(self, row, col, value):
+        while len(self.grid) < row:
+            self.grid.append([])
+        line = self.grid[row - 1]
+        while len(line) < col:
+            line.append("")
+        line[col - 1] = value
+
+    def get_all_values(self, value_render_option=None, **kwargs):
+        self.calls["get_all_values"] += 1
+        width = max((len(r) for r in self.grid), default=0)
+        # Like the API: formatted values are strings, FORMULA keeps numbers/formulas as stored
+        render = (lambda v: v) if value_render_option == "FORMULA" else (lambda v: "" if v is None else str(v))
+        return [[render(v) for v in r] + [""] * (width - len(r)) for r in self.grid]
+
+    def update_cell(self, row, col, value):
+        self.calls["update_cell"] += 1
+        self._set(row, col, value)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self.calls["update"] += 1
+        self._write(range_name or "A1", values)
+
+    def _write(self, range_name, values):
+        top, left = parse_a1(range_name.split(":")[0])
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                self._set(top + r, left + c, value)
+
+    def batch_update(self, data, value_input_option=None, **kwargs):
+        self.calls["batch_update"] += 1
+        for item in data:
+            self._write(item["range"], item["values"])
+
+    def insert_cols(self, values, col=1, value_input_option=None, **kwargs):
+        self.calls["insert_cols"] += 1
+        for r, line in enumerate(self.grid):
+            cells = [column[r] if r < len(column) else "" for column in values]
+            while len(line) < col - 1:
+                line.append("")
+            line[col - 1:col - 1] = cells
+
+    def append_row(self, values, value_input_option=None, **kwargs):
+        self.calls["append_row"] += 1
+        self.grid.append(list(values))
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        self.calls["append_rows"] += 1
+        self.grid.extend(list(row) for row in values)
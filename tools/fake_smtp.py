@@ -0,0 +1,169 @@
+"""Minimal local SMTP stand-in for exercising send_email.py.
+
+Speaks EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP and QUIT,
+keeps every accepted message in memory, and can inject the 421/451 replies
+Gmail uses for throttling, after DATA or (rcpt_fail_every) per recipient. No STARTTLS, so clients stay on plain text.
+
+    with FakeSMTP(fail_every=50) as smtp:
+        ... SMTP_SERVER=127.0.0.1 SMTP_PORT=smtp.port ...
+        print(len(smtp.messages), smtp.connections)
+
+Or run it on its own:  python tools/fake_smtp.py --port 2525
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class FakeSMTP:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_every=0, fail_code=421,
+                 rcpt_fail_every=0, rcpt_fail_code=450):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_code = fail_code
+        self.rcpt_fail_every = rcpt_fail_every
+        self.rcpt_fail_code = rcpt_fail_code
+        self._recipients = 0
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self._accepted = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        handler = type("Handler", (_Handler,), {"smtp": self})
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def accept(self, sender, recipients, data):
+        """Store a message, or return an error code when it is time for an injected failure."""
+        with self._lock:
+            self._accepted += 1
+            if self.fail_every and self._accepted % self.fail_every == 0:
+                return self.fail_code
+            self.messages.append({"from": sender, "to": recipients, "data": data})
+        return None
+
+
+    def refuse(self, recipient):
+        """An error code when it is time for an injected per-recipient failure, else None."""
+        with self._lock:
+            self._recipients += 1
+            if self.rcpt_fail_every and self._recipients % self.rcpt_fail_every == 0:
+                return self.rcpt_fail_code
+        return None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    smtp = None
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        with self.smtp._lock:
+            self.smtp.connections += 1
+        self.reply("220 fake-smtp ready")
+        sender, recipients = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-fake-smtp")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 fake-smtp")
+            elif verb == "AUTH":
+                parts = line.split()
+                if parts[1].upper() == "LOGIN" and len(parts) == 2:
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif parts[1].upper() == "LOGIN":
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                with self.smtp._lock:
+                    self.smtp.logins += 1
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = line[10:].strip("<> "), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                code = self.smtp.refuse(line[8:].strip("<> "))
+                if code:
+                    self.reply(f"{code} Recipient refused, injected failure")
+                    continue
+                recipients.append(line[8:].strip("<> "))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                chunks = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b".\n", b""):
+                        break
+                    chunks.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                if self.smtp.latency:
+                    time.sleep(self.smtp.latency)
+                code = self.smtp.accept(sender, recipients, b"".join(chunks))
+                if code:
+                    self.reply(f"{code} 4.7.0 Try again later, closing connection")
+                    return
+                self.reply("250 OK queued")
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake SMTP server that accepts everything.")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before accepting DATA")
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth message with --fail-code")
+    parser.add_argument("--fail-code", type=int, default=421)
+    parser.add_argument("--rcpt-fail-every", type=int, default=0,
+                        help="Refuse every Nth recipient with --rcpt-fail-code")
+    parser.add_argument("--rcpt-fail-code", type=int, default=450)
+    args = parser.parse_args()
+
+    smtp = FakeSMTP(port=args.port, latency=args.latency, fail_every=args.fail_every,
+                    fail_code=args.fail_code, rcpt_fail_every=args.rcpt_fail_every,
+                    rcpt_fail_code=args.rcpt_fail_code).start()
+    print(f"📮 Fake SMTP on {smtp.host}:{smtp.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"  {len(smtp.messages)} messages, {smtp.connections} connections, {smtp.logins} logins")
+    except KeyboardInterrupt:
+        smtp.stop()